@@ -1,12 +1,19 @@
 # -*- coding: utf-8 -*-
 import os
-import csv
-import io
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, make_response
 
 # --- módulos propios ---
+import migraciones
+import singleflight
 import storage
 import ideas  # generar_ideas_para_keyword, generar_articulo_para_keyword
+import jobs
+import llm_cache
+import llm_metrics
 from models import crear_usuario, buscar_usuario_por_email
 from utils import hashear_password, verificar_password
 
@@ -22,61 +29,72 @@ app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 
 ESTADOS_VALIDOS = {"borrador", "revisado", "publicado", "archivado"}
 
-# ------------------------------------------------------
-# HELPERS CONTADORES (persistentes con fallback)
-# ------------------------------------------------------
-def _total_ideas_persistente(email: str, ideas_list: list) -> int:
-    """Usa contador persistente si existe; si no, cae a len(ideas_list).
-       Si ambos existen, toma el mayor (para no 'bajar' al borrar)."""
-    total_json = len(ideas_list or [])
-    try:
-        persist = storage.obtener_ideas_generadas(email)  # puede no existir
-        if isinstance(persist, int):
-            return max(persist, total_json)
-    except Exception:
-        pass
-    return total_json
-
-
-def _total_articulos_persistente(email: str, ideas_list: list) -> int:
-    """Cuenta persistente de artículos con fallback a conteo por JSON."""
-    fallback = 0
-    try:
-        fallback = storage.contar_articulos_usuario(email)
-    except Exception:
-        pass
-
-    try:
-        persist = storage.obtener_articulos_generados(email)
-        if isinstance(persist, int):
-            return max(persist, fallback)
-    except Exception:
-        pass
-    return fallback
-
+# Ideas por página en el dashboard y en /api/ideas (el resto se carga con scroll)
+IDEAS_POR_PAGINA = int(os.environ.get("SCIDATA_IDEAS_POR_PAGINA", "20"))
+IDEAS_POR_PAGINA_MAX = 100
 
-def _merge_ideas(existing: list, nuevas: list) -> list:
-    """Fusiona por keyword (case-insensitive) sin duplicar."""
-    if not isinstance(existing, list):
-        existing = []
-    if not isinstance(nuevas, list):
-        nuevas = []
+# Generaciones de artículo iguales (mismo usuario + keyword) que llegan juntas
+# comparten una sola llamada al LLM; el resultado se reutiliza unos segundos
+# más para los reintentos (ver singleflight.py)
+GENERACION_VENTANA_S = float(os.environ.get("SCIDATA_GENERACION_VENTANA_S", "3"))
+_generaciones = singleflight.SingleFlight(GENERACION_VENTANA_S)
 
-    norm = lambda s: (s or "").strip().lower()
-    vistos = {norm(i.get("keyword")): idx for idx, i in enumerate(existing) if isinstance(i, dict)}
+# ------------------------------------------------------
+# ARRANQUE
+# ------------------------------------------------------
+# Importar este módulo no tiene efectos: las tareas de arranque corren en
+# iniciar_app(), una vez por proceso que atiende requests. `python app.py` la
+# llama antes de app.run (bajo el reloader de debug, solo en el proceso que
+# sirve, no en el que vigila archivos); con `flask run` o un servidor WSGI
+# corre antes del primer request de cada worker. Scripts y tooling que
+# importan app (bench_dashboard.py, los tests) no migran ni arrancan workers.
+_iniciada = False
+_iniciar_lock = threading.Lock()
+
+
+def iniciar_app() -> None:
+    """Migraciones de usuarios.db y del store de ideas, y el worker de jobs. Idempotente."""
+    global _iniciada
+    with _iniciar_lock:
+        if _iniciada:
+            return
+        # Schema de usuarios.db al día antes de atender requests (ver
+        # migraciones.py); si falla, no se atiende nada.
+        migraciones.aplicar_migraciones()
+
+        # Migración única del store de ideas (legacy 'articulo' -> 'articulos')
+        try:
+            mig = storage.migrar_store_ideas()
+            if mig["migrados"] or mig["errores"]:
+                print(f"[storage] migración de ideas: {mig}")
+        except Exception as e:
+            print("[WARN] migrar_store_ideas:", e)
+
+        # Worker de la cola de CSVs (uno por proceso; los jobs se reclaman en la base)
+        jobs.iniciar_worker()
+        _iniciada = True
+
+
+@app.before_request
+def _iniciar_antes_del_primer_request():
+    if not _iniciada:
+        iniciar_app()
 
-    for item in nuevas:
-        if not isinstance(item, dict):
-            continue
-        k = norm(item.get("keyword"))
-        if not k:
-            continue
-        if k in vistos:
-            existing[vistos[k]] = item
-        else:
-            existing.append(item)
-            vistos[k] = len(existing) - 1
-    return existing
+# ------------------------------------------------------
+# HELPERS CONTADORES (persistentes con fallback)
+# ------------------------------------------------------
+def _totales_usuario(email: str) -> dict:
+    """
+    Totales del resumen en una sola consulta (storage.obtener_resumen_usuario):
+    el contador persistente, sin bajar de lo que hay guardado hoy (para no
+    'bajar' al borrar), y los artículos por estado.
+    """
+    r = storage.obtener_resumen_usuario(email)
+    return {
+        "total_ideas": max(r["ideas_generadas"], r["ideas"]),
+        "total_articulos": max(r["articulos_generados"], r["articulos"]),
+        "articulos_por_estado": {e: r[e] for e in ("borrador", "revisado", "publicado", "archivado")},
+    }
 
 
 # ------------------------------------------------------
@@ -154,56 +172,27 @@ def dashboard():
         pais = (request.form.get("pais") or "").strip()
         keyword = (request.form.get("keyword") or "").strip()
 
-        # CSV?
+        # CSV? -> job en segundo plano (jobs.py); el dashboard muestra el avance.
+        # Un cliente que pide JSON recibe 202 con el job y Location a /api/jobs/<id>;
+        # el formulario vuelve al dashboard con ?job=<id>.
         if "csv" in request.files and request.files["csv"].filename:
             file = request.files["csv"]
             file.stream.seek(0)
-            raw = file.read()
-            try:
-                text = raw.decode("utf-8")
-            except UnicodeDecodeError:
-                text = raw.decode("latin-1", errors="ignore")
-            wrapper = io.StringIO(text)
-            reader = csv.DictReader(wrapper)
-            nuevas_ideas = []
-
-            for row in reader:
-                kw = (row.get("tendencia") or "").strip()
-                pa = (row.get("pais") or pais or "").strip()
-                if not kw:
-                    continue
-                try:
-                    nuevas_ideas.extend(
-                        ideas.generar_ideas_para_keyword(kw, pa or "Argentina")
-                    )
-                except Exception as e:
-                    print("[WARN] generar_ideas_para_keyword CSV:", e)
-
-            # merge + persistencia + contador (solo ideas NUEVAS)
+            quiere_json = request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json"
             try:
-                # ✅ merge + persistencia + contador acumulativo
-                actuales = storage.cargar_ideas_usuario(email) or []
-                fusionadas = _merge_ideas(actuales, nuevas_ideas)
-                storage.guardar_ideas_usuario(email, fusionadas)
-
-                # actualizar contador persistente con SOLO las nuevas
-                try:
-                    nuevas_unicas = len(fusionadas) - len(actuales)
-                    if nuevas_unicas > 0:
-                        storage.incrementar_ideas_generadas(email, inc=nuevas_unicas)
-                except Exception as e:
-                    print("[WARN contador ideas CSV]", e)
-            except AttributeError:
-                # compat si no existiera la función: merge manual y guardar
-                current = storage.cargar_ideas_usuario(email)
-                merged = _merge_ideas(current, nuevas_ideas)
-                storage.guardar_ideas_usuario(email, merged)
-                try:
-                    storage.incrementar_ideas_generadas(email, inc=len(nuevas_ideas))
-                except Exception:
-                    pass
-
-            return redirect(url_for("dashboard"))
+                job = jobs.encolar_csv(email, file.read(), pais, carpeta=app.config["UPLOAD_FOLDER"])
+            except Exception as e:
+                print("[ERROR] encolar CSV:", e)
+                if quiere_json:
+                    return jsonify(ok=False, error="encolar_csv"), 500
+                return redirect(url_for("dashboard"))
+
+            if quiere_json:
+                resp = jsonify(ok=True, job={k: job[k] for k in ("id", "estado", "total", "procesadas", "ideas", "progreso")})
+                resp.status_code = 202
+                resp.headers["Location"] = url_for("api_job", job_id=job["id"])
+                return resp
+            return redirect(url_for("dashboard", job=job["id"]))
 
         # Keyword simple
         if keyword:
@@ -213,42 +202,58 @@ def dashboard():
                 print("[WARN] generar_ideas_para_keyword form:", e)
                 nuevas_ideas = []
 
-            try:
-                actuales = storage.cargar_ideas_usuario(email) or []
-                fusionadas = _merge_ideas(actuales, nuevas_ideas)
-                storage.guardar_ideas_usuario(email, fusionadas)
-
-                try:
-                    nuevas_unicas = len(fusionadas) - len(actuales)
-                    if nuevas_unicas > 0:
-                        storage.incrementar_ideas_generadas(email, inc=nuevas_unicas)
-                except Exception as e:
-                    print("[WARN contador ideas keyword]", e)
-            except AttributeError:
-                current = storage.cargar_ideas_usuario(email)
-                merged = _merge_ideas(current, nuevas_ideas)
-                storage.guardar_ideas_usuario(email, merged)
-                try:
-                    storage.incrementar_ideas_generadas(email, inc=len(nuevas_ideas))
-                except Exception:
-                    pass
+            storage.agregar_ideas_usuario(email, nuevas_ideas)
 
             return redirect(url_for("dashboard"))
 
         # Sin keyword ni csv -> recargar
         return redirect(url_for("dashboard"))
 
-    # --- GET: render ---
-    ideas_list = storage.cargar_ideas_usuario(email)
-    total_ideas = _total_ideas_persistente(email, ideas_list)
-    total_articulos = _total_articulos_persistente(email, ideas_list)
+    # --- GET: render (solo la primera página; el resto lo pide el front a /api/ideas) ---
+    ideas_list, total_guardadas = storage.listar_ideas_usuario(email, 0, IDEAS_POR_PAGINA)
+    totales = _totales_usuario(email)
+    try:
+        jobs_en_curso = jobs.jobs_activos(email)
+    except Exception as e:
+        print("[WARN] jobs_activos:", e)
+        jobs_en_curso = []
 
     return render_template(
         "index.html",
         nombre_usuario=nombre,
-        total_ideas=total_ideas,
-        total_articulos=total_articulos,
-        ideas=ideas_list
+        total_ideas=totales["total_ideas"],
+        total_articulos=totales["total_articulos"],
+        ideas=ideas_list,
+        ideas_next=len(ideas_list) if len(ideas_list) < total_guardadas else None,
+        ideas_por_pagina=IDEAS_POR_PAGINA,
+        jobs=jobs_en_curso
+    )
+
+
+# ------------------------------------------------------
+# API: ideas paginadas (más recientes primero)
+#   GET /api/ideas?offset=0&limit=20
+#   response: { ideas: [...], total, offset, limit, next_offset }
+# ------------------------------------------------------
+@app.get("/api/ideas")
+def api_ideas():
+    if "email" not in session:
+        return jsonify(error="not_authenticated"), 401
+
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = min(IDEAS_POR_PAGINA_MAX, max(1, int(request.args.get("limit", IDEAS_POR_PAGINA))))
+    except ValueError:
+        return jsonify(error="bad_request"), 400
+
+    ideas_list, total = storage.listar_ideas_usuario(session["email"], offset, limit)
+    fin = offset + len(ideas_list)
+    return jsonify(
+        ideas=ideas_list,
+        total=total,
+        offset=offset,
+        limit=limit,
+        next_offset=fin if fin < total else None
     )
 
 
@@ -260,57 +265,249 @@ def api_counters():
     if "email" not in session:
         return jsonify(total_ideas=0, total_articulos=0)
 
-    email = session["email"]
-    ideas_list = storage.cargar_ideas_usuario(email)
+    return jsonify(_totales_usuario(session["email"]))
 
-    return jsonify(
-        total_ideas=_total_ideas_persistente(email, ideas_list),
-        total_articulos=_total_articulos_persistente(email, ideas_list)
-    )
+
+# ------------------------------------------------------
+# API: cuerpo de un artículo (se pide al abrirlo o exportarlo)
+#   GET /api/articulo/<id> -> text/html, con ETag (sha256 del HTML) y
+#   Last-Modified; 304 si el navegador ya lo tiene.
+# ------------------------------------------------------
+def _fecha_http(valor):
+    """ISO ('...Z' o con offset) -> datetime UTC para Last-Modified, o None."""
+    try:
+        d = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return d if d.tzinfo else d.replace(tzinfo=timezone.utc)
+
+
+@app.get("/api/articulo/<articulo_id>")
+def api_articulo(articulo_id):
+    if "email" not in session:
+        return jsonify(error="not_authenticated"), 401
+
+    art = storage.obtener_articulo_usuario(session["email"], articulo_id)
+    if art is None:
+        return jsonify(error="not_found"), 404
+
+    html = art.get("html") or ""
+    resp = make_response(html)
+    resp.mimetype = "text/html"
+    # el HTML de un artículo no cambia (el estado va aparte): el hash es un ETag fuerte
+    resp.set_etag(art.get("blob") or hashlib.sha256(html.encode("utf-8")).hexdigest())
+    modificado = _fecha_http(art.get("created_at"))
+    if modificado:
+        resp.last_modified = modificado
+    resp.headers["Cache-Control"] = "private, no-cache"
+    # Se inyecta con innerHTML; abierto directo en el navegador no ejecuta nada
+    resp.headers["Content-Security-Policy"] = "sandbox"
+    resp.headers["X-Content-Type-Options"] = "nosniff"
+    return resp.make_conditional(request)
 
 
 # ------------------------------------------------------
-# API: generar artículo (AJAX)
-#   request: { keyword: "..." }
-#   response: { id, html, estado, created_at }
+# API: métricas de las llamadas al LLM de este proceso (ver llm_metrics.py)
+#   response: { ventana_s, operaciones: { ideas: {...}, articulo: {...}, ... }, circuito, cache }
 # ------------------------------------------------------
-@app.post("/generar-articulo")
-def generar_articulo():
+@app.get("/api/llm-metrics")
+def api_llm_metrics():
     if "email" not in session:
         return jsonify(error="not_authenticated"), 401
+    datos = llm_metrics.resumen()
+    datos["circuito"] = ideas._circuito.estado()
+    datos["cache"] = llm_cache.estadisticas()
+    return jsonify(datos)
 
-    data = request.get_json(silent=True) or {}
-    keyword = (data.get("keyword") or "").strip()
-    # pais opcional; si querés pasarlo desde el front, ya queda listo
-    _pais = (data.get("pais") or "").strip()
 
-    if not keyword:
-        return jsonify(error="bad_request"), 400
+# ------------------------------------------------------
+# API: progreso de un job (CSV en segundo plano)
+#   response: { id, estado, total, procesadas, ideas, progreso, error }
+# ------------------------------------------------------
+@app.get("/api/jobs/<job_id>")
+def api_job(job_id):
+    if "email" not in session:
+        return jsonify(error="not_authenticated"), 401
+    job = jobs.obtener_job(job_id, email=session["email"])
+    if job is None:
+        return jsonify(error="not_found"), 404
+    return jsonify({k: job[k] for k in ("id", "estado", "total", "procesadas", "ideas", "progreso", "error")})
 
+
+# ------------------------------------------------------
+# API: generar artículo (AJAX)
+#   request: { keyword: "..." }  + header opcional Idempotency-Key
+#   response: { id, html, estado, created_at }
+# Un reintento con la misma Idempotency-Key devuelve el artículo ya creado
+# (header Idempotent-Replayed: true) en lugar de generar otro; si el primero
+# todavía está generando, 409 con Retry-After.
+# ------------------------------------------------------
+def _generar_y_guardar_articulo(email: str, keyword: str) -> dict:
     try:
         res = ideas.generar_articulo_para_keyword(keyword)
         html = (res or {}).get("html") or ""
     except Exception as e:
         print("[WARN] generar_articulo_para_keyword:", e)
         html = f"<article><h2>{keyword}</h2><p>Contenido generado para «{keyword}».</p></article>"
+    return _guardar_articulo(email, keyword, html)
 
-    email = session["email"]
+
+def _guardar_articulo(email: str, keyword: str, html: str) -> dict:
     articulo = storage.append_articulo_usuario(email, keyword, html, estado="borrador")
+    if not articulo:
+        raise RuntimeError("persist_error")
     # contador persistente de artículos +1 (no decrece)
     try:
         storage.incrementar_articulos_generados(email)
     except Exception:
         pass
 
-    if not articulo:
-        return jsonify(error="persist_error"), 500
-
-    return jsonify({
+    return {
         "id": articulo["id"],
         "html": articulo["html"],
         "estado": articulo.get("estado", "borrador"),
         "created_at": articulo.get("created_at")
-    })
+    }
+
+
+def _reclamar_idempotencia(email: str):
+    """
+    (clave, respuesta previa o None) según el header Idempotency-Key ("" si
+    no vino o falló). Deja pasar singleflight.ClaveEnCurso: otro pedido con
+    la misma clave sigue generando y este no tiene que generar otro artículo.
+    """
+    idem = (request.headers.get("Idempotency-Key") or "").strip()[:200]
+    if not idem:
+        return "", None
+    try:
+        return idem, singleflight.reclamar_idempotencia(email, idem)
+    except singleflight.ClaveEnCurso:
+        raise
+    except Exception as e:
+        print("[WARN] Idempotency-Key:", e)
+        return "", None
+
+
+def _clave_en_curso(e: "singleflight.ClaveEnCurso"):
+    resp = jsonify(error="in_progress")
+    resp.status_code = 409
+    resp.headers["Retry-After"] = str(e.retry_after_s)
+    return resp
+
+
+def _completar_idempotencia(email: str, idem: str, respuesta: dict) -> None:
+    if idem:
+        try:
+            singleflight.completar_idempotencia(email, idem, respuesta)
+        except Exception as e:
+            print("[WARN] Idempotency-Key:", e)
+
+
+def _liberar_idempotencia(email: str, idem: str) -> None:
+    if idem:
+        try:
+            singleflight.liberar_idempotencia(email, idem)
+        except Exception:
+            pass
+
+
+@app.post("/generar-articulo")
+def generar_articulo():
+    if "email" not in session:
+        return jsonify(error="not_authenticated"), 401
+
+    data = request.get_json(silent=True) or {}
+    keyword = (data.get("keyword") or "").strip()
+    # pais opcional; si querés pasarlo desde el front, ya queda listo
+    _pais = (data.get("pais") or "").strip()
+
+    if not keyword:
+        return jsonify(error="bad_request"), 400
+
+    email = session["email"]
+    try:
+        idem, previa = _reclamar_idempotencia(email)
+    except singleflight.ClaveEnCurso as e:
+        return _clave_en_curso(e)
+    if previa is not None:
+        resp = jsonify(previa)
+        resp.headers["Idempotent-Replayed"] = "true"
+        return resp
+
+    try:
+        respuesta, _compartida = _generaciones.hacer(
+            (email, storage._norm(keyword)),
+            lambda: _generar_y_guardar_articulo(email, keyword)
+        )
+    except Exception as e:
+        print("[ERROR] generar_articulo:", e)
+        _liberar_idempotencia(email, idem)
+        return jsonify(error="persist_error"), 500
+
+    _completar_idempotencia(email, idem, respuesta)
+    return jsonify(respuesta)
+
+
+# ------------------------------------------------------
+# API: generar artículo en streaming (Server-Sent Events)
+#   request: igual que /generar-articulo
+#   response: text/event-stream con
+#     event: delta  data: {"t": "<fragmento de HTML>"}   (a medida que llega)
+#     event: done   data: { id, html, estado, created_at } (ya guardado)
+#     event: error  data: { error }
+# El HTML final es el mismo que el de /generar-articulo (limpio y con
+# <article>); los delta son el texto crudo del modelo, para ir mostrándolo.
+# Comparte las Idempotency-Key con /generar-articulo: un reintento por
+# cualquiera de los dos devuelve el artículo ya creado.
+# ------------------------------------------------------
+def _sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@app.post("/generar-articulo/stream")
+def generar_articulo_stream():
+    if "email" not in session:
+        return jsonify(error="not_authenticated"), 401
+
+    data = request.get_json(silent=True) or {}
+    keyword = (data.get("keyword") or "").strip()
+    if not keyword:
+        return jsonify(error="bad_request"), 400
+
+    email = session["email"]
+    try:
+        idem, previa = _reclamar_idempotencia(email)
+    except singleflight.ClaveEnCurso as e:
+        return _clave_en_curso(e)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if previa is not None:
+        headers["Idempotent-Replayed"] = "true"
+        return Response(_sse("done", previa), mimetype="text/event-stream", headers=headers)
+
+    def eventos():
+        respuesta = None
+        try:
+            for tipo, texto in ideas.generar_articulo_stream(keyword):
+                if tipo == "delta":
+                    yield _sse("delta", {"t": texto})
+                else:
+                    respuesta = _guardar_articulo(email, keyword, texto)
+                    # ya guardado: la clave queda con él aunque el cliente corte acá
+                    _completar_idempotencia(email, idem, respuesta)
+            if respuesta is None:
+                print("[ERROR] generar_articulo_stream: terminó sin HTML")
+                yield _sse("error", {"error": "generation_error"})
+            else:
+                yield _sse("done", respuesta)
+        except Exception as e:
+            print("[ERROR] generar_articulo_stream:", e)
+            yield _sse("error", {"error": "persist_error"})
+        finally:
+            # sin artículo guardado (falla o el cliente cortó antes): la clave no queda tomada
+            if respuesta is None:
+                _liberar_idempotencia(email, idem)
+
+    return Response(eventos(), mimetype="text/event-stream", headers=headers)
 
 
 # ------------------------------------------------------
@@ -373,6 +570,10 @@ def api_eliminar_articulo():
 # RUN
 # ------------------------------------------------------
 if __name__ == "__main__":
+    # Con debug=True el reloader vuelve a ejecutar este archivo en un proceso
+    # hijo (WERKZEUG_RUN_MAIN=true); el padre solo vigila cambios
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_app()
     port = int(os.environ.get("PORT", 5000))
     # host 127.0.0.1 para no chocar con AirPlay y evitar rebind en :5000 externo
     app.run(host="127.0.0.1", port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,93 @@
+# bench_dashboard.py
+# Latencia del GET /dashboard y de /api/counters con y sin el pool de
+# conexiones SQLite de db.py (SCIDATA_DB_POOL=0 = una conexión por consulta,
+# como antes). Cada modo corre en su propio proceso porque el pool se
+# configura al importar db.
+# Uso:
+#   python bench_dashboard.py [--ideas 200] [--requests 300]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+EMAIL = "bench@scidata.test"
+
+
+def _percentil(valores: list, p: float) -> float:
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(len(orden) * p))]
+
+
+def _medir(cliente, url: str, n: int) -> list:
+    tiempos = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = cliente.get(url)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        if resp.status_code != 200:
+            print(f"[FAIL] {url} devolvió {resp.status_code}")
+            sys.exit(1)
+    return tiempos
+
+
+def _correr_modo(n_ideas: int, n_requests: int) -> None:
+    """Un modo (el que diga SCIDATA_DB_POOL del entorno) en un directorio temporal."""
+    with tempfile.TemporaryDirectory(prefix="scidata-bench-") as base_dir:
+        # storage y app usan rutas relativas a data/: importarlos recién después del chdir
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(base_dir)
+        os.makedirs(os.path.join("data", "ideas"), exist_ok=True)
+
+        import db
+        import migraciones
+        migraciones.aplicar_migraciones()
+        with db.conexion() as conn:
+            conn.execute("INSERT INTO usuarios (nombre, email, password_hash) VALUES (?, ?, ?)", ("Bench", EMAIL, "x"))
+
+        import storage
+        from app import app
+
+        storage.agregar_ideas_usuario(EMAIL, [
+            {"keyword": f"keyword {i}", "titulo": f"Título {i}", "palabras_clave": ["a", "b"]}
+            for i in range(n_ideas)
+        ])
+        for i in range(0, n_ideas, 4):
+            storage.append_articulo_usuario(EMAIL, f"keyword {i}", f"<article><h1>Artículo {i}</h1><p>texto</p></article>")
+
+        cliente = app.test_client()
+        with cliente.session_transaction() as sess:
+            sess["email"] = EMAIL
+            sess["usuario"] = "Bench"
+
+        _medir(cliente, "/dashboard", 10)   # calentamiento (templates, cache de ideas)
+        for url in ("/dashboard", "/api/counters"):
+            t = _medir(cliente, url, n_requests)
+            print(f"{url:<15} media={statistics.mean(t):7.2f}ms p50={_percentil(t, .5):7.2f}ms "
+                  f"p95={_percentil(t, .95):7.2f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ideas", type=int, default=200)
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--modo", choices=("antes", "despues"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.modo:
+        _correr_modo(args.ideas, args.requests)
+        return
+
+    for modo, pool in (("antes", "0"), ("despues", "1")):
+        print(f"--- {modo} (SCIDATA_DB_POOL={pool}) ---", flush=True)
+        env = dict(os.environ, SCIDATA_DB_POOL=pool)
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--modo", modo,
+                        "--ideas", str(args.ideas), "--requests", str(args.requests)],
+                       env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
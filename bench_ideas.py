@@ -0,0 +1,82 @@
+# bench_ideas.py
+# Mide ideas.py contra el stub local (stub_openai.py): mismo cliente OpenAI,
+# mismo parseo (_clean_json_block, lotes, fallbacks), con latencia y errores
+# controlados y repetibles. Sin red ni costo.
+#   - ideas de un CSV de N keywords con distintos tamaños de lote
+#   - artículo bloqueante vs streaming (tiempo al primer fragmento)
+#   - al final, el resumen de llm_metrics de todas esas llamadas
+# Uso:
+#   python bench_ideas.py [--keywords 40] [--lotes 1,5,10] [--latencia lognormal:0.3,0.3]
+#                         [--errores 0] [--rotas 0] [--semilla 1]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keywords", type=int, default=40)
+    ap.add_argument("--lotes", default="1,5,10", help="Tamaños de lote a comparar")
+    ap.add_argument("--latencia", default="lognormal:0.3,0.3")
+    ap.add_argument("--chunk-ms", type=float, default=20)
+    ap.add_argument("--errores", type=float, default=0.0)
+    ap.add_argument("--rotas", type=float, default=0.0)
+    ap.add_argument("--faltantes", type=float, default=0.0)
+    ap.add_argument("--articulos", type=int, default=5)
+    ap.add_argument("--semilla", type=int, default=1)
+    args = ap.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import stub_openai
+    server, base_url = stub_openai.iniciar(
+        latencia=args.latencia, chunk_ms=args.chunk_ms, errores=args.errores, rotas=args.rotas,
+        faltantes=args.faltantes, semilla=args.semilla
+    )
+    # ideas lee la configuración al importarse: sin cache (se mide la API) ni tope de RPM
+    os.environ.update(OPENAI_API_KEY="stub", OPENAI_BASE_URL=base_url,
+                      SCIDATA_LLM_CACHE="0", SCIDATA_LLM_RPM="0")
+    import ideas
+    print(f"[bench] stub en {base_url}, latencia {args.latencia}, errores {args.errores}, rotas {args.rotas}")
+
+    filas = [(f"keyword de prueba {i}", "Argentina") for i in range(args.keywords)]
+    for lote in [int(x) for x in args.lotes.split(",") if x.strip()]:
+        server.config.stats = stub_openai.ConfigStub._stats_cero()
+        t0 = time.perf_counter()
+        res = ideas.generar_ideas_lote(filas, lote=lote)
+        dt = time.perf_counter() - t0
+        st = server.config.stats
+        print(f"ideas lote={lote:<3} {dt:6.2f}s  {len(filas) / dt:6.1f} kw/s  pedidos={st['pedidos']:<4} "
+              f"tokens_prompt={st['tokens_prompt']:<6} filas_vacias={sum(1 for r in res if not r)}")
+
+    for modo in ("bloqueante", "stream"):
+        primeros, totales = [], []
+        for i in range(args.articulos):
+            t0 = time.perf_counter()
+            if modo == "bloqueante":
+                ideas.generar_articulo_para_keyword(f"artículo {i}")
+                primeros.append(time.perf_counter() - t0)
+            else:
+                primero = None
+                for tipo, _texto in ideas.generar_articulo_stream(f"artículo {i}"):
+                    if primero is None and tipo == "delta":
+                        primero = time.perf_counter() - t0
+                primeros.append(primero or 0.0)
+            totales.append(time.perf_counter() - t0)
+        print(f"artículo {modo:<10} primer contenido={statistics.mean(primeros) * 1000:7.1f}ms "
+              f"total={statistics.mean(totales) * 1000:7.1f}ms")
+
+    # Lo mismo visto desde llm_metrics (lo que se ve en producción en /api/llm-metrics)
+    import llm_metrics
+    for op, m in llm_metrics.resumen()["operaciones"].items():
+        lat = m["latencia_ms"]
+        print(f"metricas {op:<16} llamadas={m['llamadas']:<4} p50<={lat['p50']}ms p95<={lat['p95']}ms "
+              f"tokens/llamada={m['tokens']['por_llamada']} resultados={m['resultados']}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
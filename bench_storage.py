@@ -0,0 +1,76 @@
+# bench_storage.py
+# Compara los formatos del índice de ideas (SCIDATA_STORAGE_FORMAT):
+# tiempo de guardado, tiempo de carga y bytes en disco, para usuarios
+# chicos, medianos y grandes.
+# Uso:
+#   python bench_storage.py [--tamanios 10,1000,10000] [--repeticiones 5]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+
+def _ideas_de_prueba(n: int) -> list:
+    ideas = []
+    for i in range(n):
+        ideas.append({
+            "keyword": f"keyword de prueba {i}",
+            "titulo": f"Título SEO para la keyword {i}",
+            "meta_description": "Descripción de ejemplo con acentos: qué, cómo, cuándo. " * 2,
+            "h2": [f"Subtítulo {j}" for j in range(5)],
+            "faq": [f"¿Pregunta frecuente {j}?" for j in range(3)],
+            "articulos": [{
+                "id": f"{i:08x}-0000-0000-0000-000000000000",
+                "blob": f"{i:064x}",
+                "titulo": f"Artículo {i}",
+                "preview": "Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 3,
+                "estado": "borrador",
+                "created_at": "2025-01-01T00:00:00+00:00",
+            } for _ in range(i % 3)],
+        })
+    return ideas
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tamanios", default="10,1000,10000", help="Cantidad de ideas por usuario")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="scidata-bench-") as base_dir:
+        # storage usa rutas relativas a data/: importarlo recién después del chdir
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(base_dir)
+        import storage
+
+        print(f"{'ideas':>7} {'formato':>8} {'bytes':>12} {'guardar ms':>11} {'cargar ms':>10}")
+        for n in [int(x) for x in args.tamanios.split(",") if x.strip()]:
+            ideas = _ideas_de_prueba(n)
+            base = None
+            for formato in storage.FORMATOS_STORE:
+                ruta = os.path.join(storage.IDEAS_DIR, f"bench_{formato}.json")
+
+                t0 = time.perf_counter()
+                for _ in range(args.repeticiones):
+                    storage._guardar_store(ruta, ideas, 1, formato=formato)
+                t_guardar = (time.perf_counter() - t0) / args.repeticiones * 1000
+
+                t0 = time.perf_counter()
+                for _ in range(args.repeticiones):
+                    _, cargadas, _ = storage._cargar_store(ruta)
+                t_cargar = (time.perf_counter() - t0) / args.repeticiones * 1000
+
+                if cargadas != ideas:
+                    print(f"[FAIL] {formato}: lo cargado no coincide con lo guardado")
+                    sys.exit(1)
+
+                tam = os.path.getsize(ruta)
+                base = base or tam
+                print(f"{n:>7} {formato:>8} {tam:>12,} {t_guardar:>11.2f} {t_cargar:>10.2f}"
+                      f"   ({tam / base:.0%} del json indentado)")
+
+
+if __name__ == "__main__":
+    main()
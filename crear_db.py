@@ -1,27 +1,9 @@
 # crear_db.py
-import sqlite3
-import os
+# Crea data/usuarios.db (o la pone al día) aplicando las migraciones de
+# migraciones.py. Es lo mismo que corre app.py al arrancar.
+import migraciones
 
-# Asegurar que el directorio exista
-os.makedirs("data", exist_ok=True)
+aplicadas = migraciones.aplicar_migraciones()
 
-# Ruta donde se guardará la base de datos
-conn = sqlite3.connect('data/usuarios.db')
-cursor = conn.cursor()
-
-# Crear tabla de usuarios
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS usuarios (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  nombre TEXT NOT NULL,
-  email TEXT UNIQUE NOT NULL,
-  password_hash TEXT NOT NULL,
-  articulos_generados INTEGER DEFAULT 0,
-  fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-''')
-
-conn.commit()
-conn.close()
-
-print("✅ Base de datos creada correctamente.")
+print(f"✅ Base de datos creada correctamente (schema v{migraciones.version_actual()}, "
+      f"{len(aplicadas)} migraciones aplicadas).")
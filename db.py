@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Conexiones SQLite compartidas (usuarios.db): las usan models.py, storage.py
+y storage_sqlite.py en lugar de abrir y cerrar una conexión por consulta.
+
+- Una conexión por (proceso, thread, archivo), reutilizada entre requests.
+  Después de un fork se abren nuevas (una conexión no se comparte entre procesos).
+- WAL + synchronous=NORMAL: los lectores no bloquean al writer y cada commit
+  no hace fsync del archivo principal.
+- busy_timeout: si otro proceso tiene el lock de escritura se espera en lugar
+  de fallar con 'database is locked'.
+- cached_statements: sqlite3 guarda las sentencias ya preparadas por texto SQL,
+  así las consultas repetidas (contadores, login) no se vuelven a compilar.
+- Modo autocommit (isolation_level=None): las transacciones se abren
+  explícitamente con transaccion().
+
+SCIDATA_DB_POOL=0 vuelve al comportamiento anterior (una conexión nueva por uso).
+
+Uso:
+    with db.conexion() as conn:
+        conn.execute("SELECT ...")
+
+    with db.transaccion() as conn:   # BEGIN IMMEDIATE ... COMMIT / ROLLBACK
+        conn.execute("UPDATE ...")
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DB_PATH = os.path.join("data", "usuarios.db")
+
+POOL_ENABLED = os.environ.get("SCIDATA_DB_POOL", "1").strip() not in ("0", "false", "no")
+BUSY_TIMEOUT_MS = int(os.environ.get("SCIDATA_DB_BUSY_TIMEOUT_MS", "5000"))
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+
+
+def _abrir(ruta: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    conn = sqlite3.connect(ruta, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    if POOL_ENABLED:
+        # journal_mode queda guardado en el archivo; synchronous es por conexión
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def _pool() -> Dict[str, sqlite3.Connection]:
+    """Conexiones de este thread; se descartan si el proceso cambió (fork)."""
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.pid = pid
+        _local.conexiones = {}
+    return _local.conexiones
+
+
+@contextmanager
+def conexion(ruta: Optional[str] = None):
+    """
+    Conexión a 'ruta' (default usuarios.db) del pool del thread. No cerrarla:
+    queda abierta para el próximo uso. Con SCIDATA_DB_POOL=0 se abre y se
+    cierra en cada uso.
+    """
+    ruta = os.path.abspath(ruta or DB_PATH)
+    if not POOL_ENABLED:
+        conn = _abrir(ruta)
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
+    pool = _pool()
+    conn = pool.get(ruta)
+    if conn is None:
+        conn = pool[ruta] = _abrir(ruta)
+    yield conn
+
+
+@contextmanager
+def transaccion(ruta: Optional[str] = None, immediate: bool = True):
+    """BEGIN [IMMEDIATE] ... COMMIT sobre la conexión del pool; ROLLBACK si el bloque falla."""
+    with conexion(ruta) as conn:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # la conexión vuelve al pool: nunca dejarla con una transacción abierta
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+
+def cerrar_conexiones() -> None:
+    """Cierra las conexiones del thread actual (tests, scripts, fin de un worker)."""
+    for conn in _pool().values():
+        try:
+            conn.close()
+        except Exception:
+            pass
+    _local.conexiones = {}
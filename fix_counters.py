@@ -1,40 +1,91 @@
-# scripts/fix_counters.py
+# fix_counters.py
 # Uso:
-#   python scripts/fix_counters.py --email usuario@dominio
-#   python scripts/fix_counters.py --all   (si tenés una forma de listar usuarios)
+#   python fix_counters.py --email usuario@dominio
+#   python fix_counters.py --all [--workers N]
+#
+# --all recorre los usuarios de la tabla 'usuarios' y los que tienen ideas en
+# data/ideas, cuenta en paralelo (un pool de procesos) y escribe todo al final
+# en una sola pasada: data/counters.json una vez y los agregados en una
+# transacción. Pensado para correr de noche sobre miles de usuarios.
 
 import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import migraciones
 import storage
 
 def recalcular_para_email(email: str):
-    # Lee ideas reales del JSON del usuario
-    ideas = storage.cargar_ideas_usuario(email) or []
-    total_ideas_reales = len(ideas)
-
-    # Cuenta artículos reales (tu storage ya tiene esta función)
-    total_articulos_reales = storage.contar_articulos_usuario(email)
+    # Recalcula los agregados (ideas y artículos reales) desde el índice del usuario
+    agg = storage.reconstruir_agregados(email)
+    total_ideas_reales = agg["ideas"]
+    total_articulos_reales = agg["articulos"]
 
-    # Setea contadores históricos exactamente a esos valores
-    storage.set_ideas_generadas(email, total_ideas_reales)
-    storage.set_articulos_generados(email, total_articulos_reales)
+    # Setea contadores históricos exactamente a esos valores (una sola escritura)
+    storage.set_contadores_lote({email: {
+        "ideas_generadas": total_ideas_reales,
+        "articulos_generados": total_articulos_reales,
+    }})
 
     print(f"[OK] {email}: ideas={total_ideas_reales} artículos={total_articulos_reales}")
 
+def _contar(email: str):
+    # Corre en los procesos del pool: solo lee, no escribe nada
+    try:
+        return email, storage.contar_agregados_usuario(email), None
+    except Exception as e:
+        return email, None, str(e)
+
+def recalcular_todos(workers=None):
+    t0 = time.perf_counter()
+    emails = storage.listar_emails_usuarios()
+    total = len(emails)
+    print(f"[fix_counters] {total} usuarios a recalcular")
+    if not total:
+        return
+
+    aggs, errores = {}, 0
+    ultimo_reporte = t0
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, min(256, total // (workers * 8) or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for n, (email, agg, error) in enumerate(pool.map(_contar, emails, chunksize=chunk), 1):
+            if error:
+                errores += 1
+                print(f"[ERROR] {email}: {error}")
+            else:
+                aggs[email] = agg
+            ahora = time.perf_counter()
+            if ahora - ultimo_reporte >= 1 or n == total:
+                ultimo_reporte = ahora
+                print(f"[fix_counters] {n}/{total} contados ({n / (ahora - t0):.0f} usuarios/s)")
+    t_conteo = time.perf_counter() - t0
+
+    # Una sola escritura para todos: agregados en una transacción y counters.json una vez
+    storage.guardar_agregados_lote(aggs)
+    storage.set_contadores_lote({
+        email: {"ideas_generadas": agg["ideas"], "articulos_generados": agg["articulos"]}
+        for email, agg in aggs.items()
+    })
+    dt = time.perf_counter() - t0
+    print(f"[OK] {len(aggs)} usuarios recalculados, {errores} errores, en {dt:.2f}s "
+          f"(conteo {t_conteo:.2f}s, escritura {dt - t_conteo:.2f}s; {total / dt:.0f} usuarios/s)")
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--email", help="Email del usuario a recalcular")
-    ap.add_argument("--all", action="store_true", help="Recalcular para todos los usuarios (si podés listarlos)")
+    ap.add_argument("--all", action="store_true", help="Recalcular para todos los usuarios")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos para contar (default: CPUs)")
     args = ap.parse_args()
 
+    migraciones.aplicar_migraciones()
     if args.email:
         recalcular_para_email(args.email)
     elif args.all:
-        # Si tenés una forma de listar usuarios, llamala aquí. Ejemplo:
-        # for email in storage.listar_emails_usuarios():
-        #     recalcular_para_email(email)
-        print("Implementá un listado de usuarios o usá --email.")
+        recalcular_todos(args.workers)
     else:
         print("Usá --email usuario@dominio o --all.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
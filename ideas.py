@@ -1,23 +1,354 @@
 # -*- coding: utf-8 -*-
 import os
 import json
+import queue
+import random
 import re
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple, TypeVar
 from dotenv import load_dotenv
 
+import llm_cache
+import llm_metrics
+
 # ============= Carga de .env y cliente OpenAI opcional ============
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini").strip()  # podés cambiarlo por gpt-4o o gpt-4
+# Otra API compatible con chat.completions, p.ej. el stub local para pruebas de
+# carga: OPENAI_BASE_URL=http://127.0.0.1:8765/v1 (ver stub_openai.py)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "").strip()
 client = None
 if OPENAI_API_KEY:
     try:
         from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        # los reintentos los maneja _llamar (con backoff y circuit breaker), no el cliente
+        client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None, max_retries=0)
     except Exception as _e:
         client = None
 
+# Generación en lote (CSV): llamadas en paralelo, como mucho LLM_CONCURRENCIA
+# a la vez, y nunca más de LLM_RPM pedidos por minuto a la API (0 = sin límite)
+LLM_CONCURRENCIA = int(os.getenv("SCIDATA_LLM_CONCURRENCIA", "8"))
+LLM_RPM = int(os.getenv("SCIDATA_LLM_RPM", "60"))
+# Keywords por pedido al generar ideas en lote (1 = un pedido por keyword)
+LLM_LOTE_KEYWORDS = max(1, int(os.getenv("SCIDATA_LLM_LOTE_KEYWORDS", "5")))
+
+# Resiliencia de las llamadas (ver _llamar):
+# - timeout por intento (ideas / artículo), reintentos con backoff exponencial
+#   y jitter para errores de red, 429 y 5xx
+LLM_TIMEOUT_S = float(os.getenv("SCIDATA_LLM_TIMEOUT_S", "20"))
+LLM_TIMEOUT_ARTICULO_S = float(os.getenv("SCIDATA_LLM_TIMEOUT_ARTICULO_S", "90"))
+LLM_REINTENTOS = int(os.getenv("SCIDATA_LLM_REINTENTOS", "2"))
+LLM_BACKOFF_S = float(os.getenv("SCIDATA_LLM_BACKOFF_S", "0.5"))
+LLM_BACKOFF_MAX_S = float(os.getenv("SCIDATA_LLM_BACKOFF_MAX_S", "8"))
+# - circuit breaker: con al menos CB_MINIMO llamadas en CB_VENTANA_S y una
+#   proporción de errores >= CB_UMBRAL se deja de llamar a la API por
+#   CB_ABIERTO_S (fallback inmediato); después pasa una llamada de prueba
+LLM_CB_UMBRAL = float(os.getenv("SCIDATA_LLM_CB_UMBRAL", "0.5"))
+LLM_CB_MINIMO = int(os.getenv("SCIDATA_LLM_CB_MINIMO", "10"))
+LLM_CB_VENTANA_S = float(os.getenv("SCIDATA_LLM_CB_VENTANA_S", "60"))
+LLM_CB_ABIERTO_S = float(os.getenv("SCIDATA_LLM_CB_ABIERTO_S", "30"))
+# - pedidos cubiertos (hedging) para ideas: si no hubo respuesta en HEDGE_MS se
+#   lanza un segundo pedido igual y se usa el primero que vuelva (0 = apagado)
+LLM_HEDGE_MS = float(os.getenv("SCIDATA_LLM_HEDGE_MS", "0"))
+
+# ===================== Límite de pedidos por minuto ===============
+class _TokenBucket:
+    """
+    Token bucket compartido por todos los threads del proceso: se recarga a
+    rpm/60 tokens por segundo, con una ráfaga de hasta 'rafaga' pedidos
+    seguidos. tomar() bloquea hasta que haya un token.
+    """
+
+    def __init__(self, rpm: int, rafaga: int):
+        self.por_segundo = rpm / 60.0
+        self.capacidad = max(1, rafaga)
+        self.tokens = float(self.capacidad)
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def tomar(self) -> None:
+        if self.por_segundo <= 0:
+            return
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.por_segundo)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.por_segundo
+            time.sleep(espera)
+
+
+_limite_rpm = _TokenBucket(LLM_RPM, rafaga=min(LLM_CONCURRENCIA, LLM_RPM) if LLM_RPM > 0 else 1)
+
+# ============ Timeouts, reintentos y circuit breaker ==============
+T = TypeVar("T")
+
+class CircuitoAbierto(RuntimeError):
+    """La API viene fallando: no se la llama y se usa el fallback enseguida."""
+
+
+class _Circuito:
+    """
+    Circuit breaker compartido por todos los threads del proceso. Cuenta
+    solo las llamadas que salieron bien y las fallas del proveedor (red,
+    timeouts, 429, 5xx); los errores de nuestro pedido (400, auth) no
+    cuentan para ningún lado. Abierto: permitir() lanza CircuitoAbierto. Pasado
+    'abierto_s' deja pasar una sola llamada de prueba: si sale bien se
+    cierra, si no vuelve a abrirse.
+    """
+
+    def __init__(self, umbral: float, minimo: int, ventana_s: float, abierto_s: float):
+        self.umbral = umbral
+        self.minimo = max(1, minimo)
+        self.ventana_s = ventana_s
+        self.abierto_s = abierto_s
+        self.resultados: deque = deque()   # (instante, ok)
+        self.abierto_hasta: Optional[float] = None
+        self.sondeando = False
+        self.lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        """Lanza CircuitoAbierto si no se puede llamar. Devuelve True si esta llamada es la de prueba."""
+        if self.umbral <= 0:
+            return False
+        with self.lock:
+            if self.abierto_hasta is None:
+                return False
+            if time.monotonic() < self.abierto_hasta or self.sondeando:
+                raise CircuitoAbierto("circuito abierto: la API de OpenAI viene fallando")
+            self.sondeando = True
+            return True
+
+    def soltar_sonda(self) -> None:
+        """La llamada de prueba terminó sin resultado (se cortó): queda semiabierto para la próxima."""
+        with self.lock:
+            self.sondeando = False
+
+    def registrar(self, ok: bool, sonda: bool = False) -> None:
+        if self.umbral <= 0:
+            return
+        with self.lock:
+            ahora = time.monotonic()
+            if sonda:
+                self.sondeando = False
+                if ok:
+                    print("[OK] circuito LLM cerrado: la API volvió a responder")
+                    self.abierto_hasta = None
+                else:
+                    self.abierto_hasta = ahora + self.abierto_s
+                return
+            if self.abierto_hasta is not None:
+                return   # llamadas que ya estaban en curso cuando se abrió
+            self.resultados.append((ahora, ok))
+            while self.resultados and ahora - self.resultados[0][0] > self.ventana_s:
+                self.resultados.popleft()
+            fallas = sum(1 for _, r in self.resultados if not r)
+            if len(self.resultados) >= self.minimo and fallas / len(self.resultados) >= self.umbral:
+                print(f"[WARN] circuito LLM abierto por {self.abierto_s:.0f}s: "
+                      f"{fallas}/{len(self.resultados)} llamadas fallidas en {self.ventana_s:.0f}s")
+                self.abierto_hasta = ahora + self.abierto_s
+                self.resultados.clear()
+
+    def estado(self) -> str:
+        with self.lock:
+            if self.abierto_hasta is None:
+                return "cerrado"
+            return "semiabierto" if time.monotonic() >= self.abierto_hasta else "abierto"
+
+
+_circuito = _Circuito(LLM_CB_UMBRAL, LLM_CB_MINIMO, LLM_CB_VENTANA_S, LLM_CB_ABIERTO_S)
+
+# openai.APIConnectionError/APITimeoutError y, a mitad de un stream, los de httpx
+_ERRORES_RED = ("APITimeoutError", "APIConnectionError", "TransportError")
+
+def _es_reintentable(e: BaseException) -> bool:
+    """Falla del proveedor o de la red (vale reintentar), no de nuestro pedido."""
+    if isinstance(e, CircuitoAbierto):
+        return False
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(e, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    return any(c.__name__ in _ERRORES_RED for c in type(e).__mro__)
+
+def _espera_reintento(intento: int, e: BaseException) -> float:
+    """Backoff exponencial con jitter completo; respeta Retry-After (acotado) si vino."""
+    espera = random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_S * (2 ** intento)))
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        espera = max(espera, min(LLM_BACKOFF_MAX_S, float(headers.get("retry-after"))))
+    except (TypeError, ValueError):
+        pass
+    return espera
+
+def _llamar(fn: Callable[[float], T], timeout_s: float) -> T:
+    """
+    fn(timeout_s) pasando por el circuit breaker, con hasta LLM_REINTENTOS
+    reintentos para los errores reintentables. Los demás errores (y el
+    último) se propagan: el que llama usa su fallback.
+    """
+    for intento in range(max(0, LLM_REINTENTOS) + 1):
+        sonda = _circuito.permitir()
+        registrado = False
+        try:
+            try:
+                res = fn(timeout_s)
+            except Exception as e:
+                if not _es_reintentable(e):
+                    raise   # error de nuestro pedido: no dice nada de la API
+                _circuito.registrar(False, sonda)
+                registrado = True
+                if intento >= LLM_REINTENTOS:
+                    raise
+                espera = _espera_reintento(intento, e)
+                print(f"[WARN] LLM {type(e).__name__}: reintento {intento + 1}/{LLM_REINTENTOS} en {espera:.1f}s")
+                time.sleep(espera)
+            else:
+                _circuito.registrar(True, sonda)
+                registrado = True
+                return res
+        finally:
+            # sonda sin resultado (error de nuestro pedido, KeyboardInterrupt,
+            # cierre del generador...): si no, el circuito no se cierra nunca
+            if sonda and not registrado:
+                _circuito.soltar_sonda()
+
+_pool_cobertura: Optional[ThreadPoolExecutor] = None
+_pool_cobertura_lock = threading.Lock()
+
+def _con_cobertura(fn: Callable[[float], T], timeout_s: float) -> T:
+    """
+    fn(timeout_s); si no terminó en LLM_HEDGE_MS, lanza una segunda igual y
+    devuelve la primera que termine bien (la otra se descarta al volver).
+    """
+    global _pool_cobertura
+    with _pool_cobertura_lock:
+        if _pool_cobertura is None:
+            _pool_cobertura = ThreadPoolExecutor(max_workers=max(2, LLM_CONCURRENCIA * 2),
+                                                 thread_name_prefix="scidata-hedge")
+    primero = _pool_cobertura.submit(fn, timeout_s)
+    listos, _ = wait([primero], timeout=LLM_HEDGE_MS / 1000)
+    if listos:
+        return primero.result()
+
+    pendientes = {primero, _pool_cobertura.submit(fn, timeout_s)}
+    error: Optional[BaseException] = None
+    while pendientes:
+        listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for f in listos:
+            if f.exception() is None:
+                return f.result()
+            error = f.exception()
+    raise error
+
+def _crear(system: str, prompt: str, temperature: float, timeout_s: float, stream: bool = False):
+    """Un pedido a chat.completions respetando el límite de RPM."""
+    _limite_rpm.tomar()
+    return client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=temperature,
+        timeout=timeout_s,
+        stream=stream,
+        # en streaming, el último fragmento trae resp.usage (para llm_metrics)
+        **({"stream_options": {"include_usage": True}} if stream else {}),
+    )
+
+def _chat(system: str, prompt: str, temperature: float, timeout_s: Optional[float] = None,
+          cubrir: bool = False, medicion: Optional[llm_metrics.Medicion] = None) -> str:
+    """
+    Una llamada a chat.completions (timeout, reintentos, circuit breaker y
+    límite de RPM). cubrir=True la hace con hedging si LLM_HEDGE_MS > 0.
+    Los tokens de cada respuesta se suman a 'medicion'. Devuelve el texto.
+    """
+    def _una(t: float) -> str:
+        resp = _crear(system, prompt, temperature, t)
+        if medicion is not None:
+            medicion.sumar_uso(getattr(resp, "usage", None))
+        return resp.choices[0].message.content.strip()
+
+    if cubrir and LLM_HEDGE_MS > 0:
+        return _llamar(lambda t: _con_cobertura(_una, t), timeout_s or LLM_TIMEOUT_S)
+    return _llamar(_una, timeout_s or LLM_TIMEOUT_S)
+
+_FIN_STREAM = object()
+
+def _leer_con_limite(stream, limite: float, timeout_s: float) -> Iterator[Any]:
+    """
+    Los chunks de 'stream', leídos en un thread aparte: si no llega nada
+    antes de 'limite' (monotonic) se lanza TimeoutError aunque el stream
+    esté colgado esperando el próximo chunk (el timeout de httpx es por
+    lectura, no del stream completo).
+    """
+    cola: "queue.Queue" = queue.Queue()
+    parar = threading.Event()
+
+    def _leer() -> None:
+        try:
+            for chunk in stream:
+                if parar.is_set():
+                    return
+                cola.put((chunk, None))
+            cola.put((_FIN_STREAM, None))
+        except BaseException as e:
+            cola.put((None, e))
+
+    threading.Thread(target=_leer, name="scidata-llm-stream", daemon=True).start()
+    try:
+        while True:
+            try:
+                chunk, error = cola.get(timeout=max(0.0, limite - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"el stream pasó los {timeout_s:.0f}s") from None
+            if error is not None:
+                raise error
+            if chunk is _FIN_STREAM:
+                return
+            yield chunk
+    finally:
+        parar.set()
+
+def _chat_stream(system: str, prompt: str, temperature: float, timeout_s: Optional[float] = None,
+                 medicion: Optional[llm_metrics.Medicion] = None) -> Iterator[str]:
+    """
+    Como _chat, pero con stream=True: va devolviendo los fragmentos de texto
+    a medida que llegan. Se reintenta solo el arranque; timeout_s es el
+    tiempo máximo del stream completo, lleguen chunks o no.
+    """
+    timeout_s = timeout_s or LLM_TIMEOUT_ARTICULO_S
+    limite = time.monotonic() + timeout_s
+    stream = _llamar(lambda t: _crear(system, prompt, temperature, t, stream=True), timeout_s)
+    try:
+        for chunk in _leer_con_limite(stream, limite, timeout_s):
+            if medicion is not None and getattr(chunk, "usage", None):
+                medicion.sumar_uso(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        if _es_reintentable(e):
+            _circuito.registrar(False)
+        raise
+    finally:
+        cerrar = getattr(stream, "close", None)
+        if cerrar:
+            try:
+                cerrar()
+            except Exception:
+                pass   # el thread lector puede seguir adentro del stream
+
 # ======================= Helpers internos =========================
 _CODE_FENCE_RE = re.compile(r"^```[\w-]*\s*([\s\S]*?)\s*```$", re.I | re.M)
 
@@ -60,6 +391,17 @@ def _clean_json_block(s: str) -> str:
         return s[start:end+1].strip()
     return "[]"
 
+def _clean_json_object(s: str) -> str:
+    """Como _clean_json_block, pero para un objeto JSON ({...})."""
+    if not s:
+        return "{}"
+    s = _strip_code_fences(s)
+    start = s.find("{")
+    end = s.rfind("}")
+    if start != -1 and end != -1 and end > start:
+        return s[start:end+1].strip()
+    return "{}"
+
 def _md_to_html_minimal(md: str) -> str:
     """
     Conversión mínima de Markdown a HTML para casos en los que el modelo no
@@ -188,8 +530,92 @@ def _fallback_article(keyword: str) -> str:
 """
     return _ensure_article_wrapper(cuerpo.strip())
 
+# ======================= Prompts ==================================
+# Si cambia el texto de un prompt cambia su versión, y con ella la clave de
+# llm_cache: las respuestas viejas no se reutilizan.
+_SYSTEM_IDEAS = "Sos un generador de ideas SEO experto."
+_TEMPERATURA_IDEAS = 0.5
+_PROMPT_IDEAS = """
+Generá 3 ideas de contenido SEO en español para la keyword "{keyword}" orientadas a {pais}.
+Devolvé EXCLUSIVAMENTE un array JSON válido con la forma:
+
+[
+  {{
+    "keyword": "...",
+    "titulo": "...",
+    "palabras_clave": ["...", "..."],
+    "h2_sugeridos": ["...", "..."],
+    "tips_seo": ["...", "..."],
+    "articulo": ""
+  }},
+  ...
+]
+
+- No agregues texto fuera del array JSON.
+- "articulo" debe venir SIEMPRE como cadena vacía.
+"""
+_PROMPT_IDEAS_LOTE = """
+Para CADA una de estas keywords, generá 3 ideas de contenido SEO en español
+orientadas a su país:
+
+{keywords}
+
+Devolvé EXCLUSIVAMENTE un objeto JSON válido cuyas claves sean las keywords
+exactamente como aparecen arriba, y cada valor un array con la forma:
+
+{{
+  "<keyword>": [
+    {{
+      "keyword": "...",
+      "titulo": "...",
+      "palabras_clave": ["...", "..."],
+      "h2_sugeridos": ["...", "..."],
+      "tips_seo": ["...", "..."],
+      "articulo": ""
+    }},
+    ...
+  ],
+  ...
+}}
+
+- No agregues texto fuera del objeto JSON.
+- "articulo" debe venir SIEMPRE como cadena vacía.
+"""
+# Una sola versión para los dos prompts: las ideas de una keyword se cachean
+# igual vengan de un pedido individual o de uno en lote
+_VERSION_PROMPT_IDEAS = llm_cache.version_prompt(_SYSTEM_IDEAS, _PROMPT_IDEAS, _PROMPT_IDEAS_LOTE)
+
+def _normalizar_ideas(ideas: Any, keyword: str) -> List[Dict[str, Any]]:
+    """Validación mínima + normalización de las ideas del modelo para una keyword (hasta 3)."""
+    fixed = []
+    for it in ideas if isinstance(ideas, list) else []:
+        if not isinstance(it, dict):
+            continue
+        fixed.append({
+            "keyword": str(it.get("keyword", keyword)),
+            "titulo": str(it.get("titulo", keyword)).strip() or keyword,
+            "palabras_clave": list(it.get("palabras_clave", [])) if isinstance(it.get("palabras_clave"), list) else [],
+            "h2_sugeridos": list(it.get("h2_sugeridos", [])) if isinstance(it.get("h2_sugeridos"), list) else [],
+            "tips_seo": list(it.get("tips_seo", [])) if isinstance(it.get("tips_seo"), list) else [],
+            "articulo": ""  # siempre vacío acá
+        })
+    # --- asegurar keywords únicos dentro del batch ---
+    _seen = set()
+    for i, it in enumerate(fixed):
+        k = (it.get("keyword") or "").strip().lower()
+        if not k:
+            k = f"{keyword.strip()} idea {i+1}"
+            it["keyword"] = k
+        if k in _seen:
+            # usa parte del título para diferenciar
+            t = (it.get("titulo") or "").strip()
+            t_slug = re.sub(r"[^a-z0-9]+", "-", t.lower()).strip("-")[:40] or f"idea-{i+1}"
+            it["keyword"] = f"{it['keyword']} — {t_slug}"
+        _seen.add((it.get("keyword") or "").strip().lower())
+    return fixed[:3]
+
 # ================== API principal expuesta =======================
-def generar_ideas_para_keyword(keyword: str, pais: Optional[str]) -> List[Dict[str, Any]]:
+def generar_ideas_para_keyword(keyword: str, pais: Optional[str], sin_cache: bool = False) -> List[Dict[str, Any]]:
     """
     Devuelve una lista de ideas:
     [
@@ -202,94 +628,216 @@ def generar_ideas_para_keyword(keyword: str, pais: Optional[str]) -> List[Dict[s
         "articulo": ""   # siempre string vacío acá
       }, ...
     ]
+    Las respuestas buenas del modelo quedan en llm_cache (data/llm_cache.db):
+    la misma keyword/país no vuelve a llamar a la API. sin_cache=True fuerza
+    una respuesta nueva (y la guarda).
     """
     if not keyword:
         return []
 
+    with llm_metrics.medir("ideas", OPENAI_MODEL) as m:
+        return _generar_ideas(keyword, pais, sin_cache, m)
+
+def _generar_ideas(keyword: str, pais: Optional[str], sin_cache: bool,
+                   m: llm_metrics.Medicion) -> List[Dict[str, Any]]:
     # Si no hay cliente OpenAI, modo offline
     if client is None:
+        m.resultado = "offline"
         return _fallback_ideas(keyword, pais, n=3)
 
-    prompt = f"""
-Generá 3 ideas de contenido SEO en español para la keyword "{keyword}" orientadas a {pais or "Hispanoamérica"}.
-Devolvé EXCLUSIVAMENTE un array JSON válido con la forma:
+    ck = llm_cache.clave("ideas", keyword, pais, OPENAI_MODEL, _TEMPERATURA_IDEAS, _VERSION_PROMPT_IDEAS)
+    cacheadas = llm_cache.obtener(ck, sin_cache=sin_cache)
+    if cacheadas:
+        m.cache_hit = True
+        return cacheadas
 
-[
-  {{
-    "keyword": "...",
-    "titulo": "...",
-    "palabras_clave": ["...", "..."],
-    "h2_sugeridos": ["...", "..."],
-    "tips_seo": ["...", "..."],
-    "articulo": ""
-  }},
-  ...
-]
-
-- No agregues texto fuera del array JSON.
-- "articulo" debe venir SIEMPRE como cadena vacía.
-"""
+    prompt = _PROMPT_IDEAS.format(keyword=keyword, pais=pais or "Hispanoamérica")
 
     try:
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "Sos un generador de ideas SEO experto."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.5,
-        )
-        raw = resp.choices[0].message.content.strip()
+        raw = _chat(_SYSTEM_IDEAS, prompt, _TEMPERATURA_IDEAS, cubrir=True, medicion=m)
         cleaned = _clean_json_block(raw)
         ideas = json.loads(cleaned)
 
-        # Validación mínima + normalización
-        fixed = []
-        for it in ideas if isinstance(ideas, list) else []:
-            fixed.append({
-                "keyword": str(it.get("keyword", keyword)),
-                "titulo": str(it.get("titulo", keyword)).strip() or keyword,
-                "palabras_clave": list(it.get("palabras_clave", [])) if isinstance(it.get("palabras_clave"), list) else [],
-                "h2_sugeridos": list(it.get("h2_sugeridos", [])) if isinstance(it.get("h2_sugeridos"), list) else [],
-                "tips_seo": list(it.get("tips_seo", [])) if isinstance(it.get("tips_seo"), list) else [],
-                "articulo": ""  # siempre vacío acá
-            })
-            # --- asegurar keywords únicos dentro del batch ---
-        _seen = set()
-        for i, it in enumerate(fixed):
-            k = (it.get("keyword") or "").strip().lower()
-            if not k:
-                k = f"{keyword.strip()} idea {i+1}"
-                it["keyword"] = k
-            if k in _seen:
-                # usa parte del título para diferenciar
-                t = (it.get("titulo") or "").strip()
-                t_slug = re.sub(r"[^a-z0-9]+", "-", t.lower()).strip("-")[:40] or f"idea-{i+1}"
-                it["keyword"] = f"{it['keyword']} — {t_slug}"
-            _seen.add((it.get("keyword") or "").strip().lower())
-        return fixed[:3] if fixed else _fallback_ideas(keyword, pais, n=3)
+        fixed = _normalizar_ideas(ideas, keyword)
+        if not fixed:
+            m.resultado = "parse_fallback"
+            return _fallback_ideas(keyword, pais, n=3)
+        llm_cache.guardar(ck, "ideas", fixed)
+        return fixed
+    except json.JSONDecodeError as e:
+        print("❌ Error en generar_ideas_para_keyword:", e)
+        m.resultado = "parse_fallback"
+        return _fallback_ideas(keyword, pais, n=3)
     except Exception as e:
         print("❌ Error en generar_ideas_para_keyword:", e)
+        m.resultado = "error_fallback"
+        m.extra["error"] = type(e).__name__
         return _fallback_ideas(keyword, pais, n=3)
 
-def generar_articulo_para_keyword(keyword: str, h2_sugeridos: Optional[List[str]] = None, tono: str = "informativo") -> Dict[str, str]:
+def _ideas_lote_llm(filas: Sequence[Tuple[str, Optional[str]]],
+                    m: Optional[llm_metrics.Medicion] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Un solo pedido al modelo para varias keywords. {keyword normalizada: ideas} con las que vinieron bien."""
+    listado = "\n".join(f"- {json.dumps(kw, ensure_ascii=False)} (país: {pais or 'Hispanoamérica'})" for kw, pais in filas)
+    raw = _chat(_SYSTEM_IDEAS, _PROMPT_IDEAS_LOTE.format(keywords=listado), _TEMPERATURA_IDEAS,
+                timeout_s=min(LLM_TIMEOUT_S * len(filas), LLM_TIMEOUT_ARTICULO_S), cubrir=True, medicion=m)
+    datos = json.loads(_clean_json_object(raw))
+    if not isinstance(datos, dict):
+        return {}
+    por_kw = {llm_cache._norm(k): v for k, v in datos.items() if isinstance(k, str)}
+    res = {}
+    for kw, _pais in filas:
+        fixed = _normalizar_ideas(por_kw.get(llm_cache._norm(kw)), kw)
+        if fixed:
+            res[llm_cache._norm(kw)] = fixed
+    return res
+
+def generar_ideas_para_keywords(filas: Sequence[Tuple[str, Optional[str]]], lote: Optional[int] = None,
+                                sin_cache: bool = False) -> List[List[Dict[str, Any]]]:
     """
-    Devuelve {"html": "<article>...</article>"} con contenido SEO completo.
+    Como generar_ideas_para_keyword, para varias (keyword, pais): junta de a
+    'lote' keywords (default LLM_LOTE_KEYWORDS) en un mismo prompt, que pide
+    un objeto JSON por keyword, y reparte la respuesta. Las instrucciones
+    fijas del prompt se mandan una vez por lote en lugar de una por keyword.
+
+    - Devuelve una lista de ideas por fila, en el orden de entrada.
+    - Primero se mira llm_cache keyword por keyword; solo van al modelo las
+      que faltan, y lo que vuelve bien se guarda con la misma clave que un
+      pedido individual.
+    - Las keywords que no vienen (o vienen mal) en la respuesta, o todo el
+      lote si el pedido falla, se piden de a una con generar_ideas_para_keyword.
     """
-    if not keyword:
-        return {"html": _fallback_article("contenido")}
-
-    if client is None:
-        return {"html": _fallback_article(keyword)}
-
-    # Construcción de prompt
+    filas = list(filas)
+    lote = max(1, lote or LLM_LOTE_KEYWORDS)
+    resultado: List[Optional[List[Dict[str, Any]]]] = [None] * len(filas)
+
+    pendientes: List[int] = []
+    for i, (kw, pais) in enumerate(filas):
+        if not kw:
+            resultado[i] = []
+        elif client is None:
+            resultado[i] = _fallback_ideas(kw, pais, n=3)
+            llm_metrics.registrar({"operacion": "ideas", "modelo": OPENAI_MODEL, "resultado": "offline",
+                                   "duracion_ms": 0.0})
+        else:
+            ck = llm_cache.clave("ideas", kw, pais, OPENAI_MODEL, _TEMPERATURA_IDEAS, _VERSION_PROMPT_IDEAS)
+            resultado[i] = llm_cache.obtener(ck, sin_cache=sin_cache) or None
+            if resultado[i] is None:
+                pendientes.append(i)
+            else:
+                llm_metrics.registrar({"operacion": "ideas", "modelo": OPENAI_MODEL, "resultado": "ok",
+                                       "cache_hit": True, "duracion_ms": 0.0})
+
+    # Lotes sin keywords repetidas (la respuesta viene indexada por keyword);
+    # una repetida con otro país va en el lote siguiente
+    while pendientes:
+        grupo, vistas, resto = [], set(), []
+        for i in pendientes:
+            k = llm_cache._norm(filas[i][0])
+            if len(grupo) < lote and k not in vistas:
+                grupo.append(i)
+                vistas.add(k)
+            else:
+                resto.append(i)
+        pendientes = resto
+
+        obtenidas: Dict[str, List[Dict[str, Any]]] = {}
+        if len(grupo) > 1:
+            with llm_metrics.medir("ideas_lote", OPENAI_MODEL) as m:
+                m.extra["keywords"] = len(grupo)
+                try:
+                    obtenidas = _ideas_lote_llm([filas[i] for i in grupo], m)
+                except json.JSONDecodeError as e:
+                    print(f"❌ Error en generar_ideas_para_keywords ({len(grupo)} keywords):", e)
+                    m.resultado = "parse_fallback"
+                except Exception as e:
+                    print(f"❌ Error en generar_ideas_para_keywords ({len(grupo)} keywords):", e)
+                    m.resultado = "error_fallback"
+                    m.extra["error"] = type(e).__name__
+                # las que faltan se piden de a una (abajo)
+                m.extra["faltantes"] = len(grupo) - len(obtenidas)
+                if m.extra["faltantes"] and m.resultado == "ok":
+                    m.resultado = "parse_fallback"
+        for i in grupo:
+            kw, pais = filas[i]
+            ideas = obtenidas.get(llm_cache._norm(kw))
+            if ideas:
+                ck = llm_cache.clave("ideas", kw, pais, OPENAI_MODEL, _TEMPERATURA_IDEAS, _VERSION_PROMPT_IDEAS)
+                llm_cache.guardar(ck, "ideas", ideas)
+                resultado[i] = ideas
+            else:
+                resultado[i] = generar_ideas_para_keyword(kw, pais, sin_cache=sin_cache)
+
+    return [r if r is not None else [] for r in resultado]
+
+def iterar_ideas_lote(filas: Sequence[Tuple[str, Optional[str]]],
+                      concurrencia: Optional[int] = None,
+                      lote: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Ideas para muchas (keyword, pais) a la vez: de a 'lote' keywords por
+    pedido (generar_ideas_para_keywords) y con un pool de 'concurrencia'
+    threads (default LLM_CONCURRENCIA) para los pedidos, bajo el límite de
+    RPM compartido. Va devolviendo las ideas de cada fila en el mismo orden
+    de entrada, a medida que están (así se puede ir guardando fila por fila);
+    si un lote falla, sus filas quedan vacías y el resto sigue.
+
+    Los lotes se encolan de a poco (a lo sumo 2 * concurrencia pendientes),
+    no todos de entrada: si el que consume deja de iterar (p.ej. un job que
+    pasó a otro worker), al cerrar el generador se cancelan los que no
+    empezaron y no se gastan más pedidos.
+    """
+    filas = list(filas)
+    if not filas:
+        return
+    lote = max(1, lote or LLM_LOTE_KEYWORDS)
+    grupos = [filas[i:i + lote] for i in range(0, len(filas), lote)]
+
+    def _uno(grupo: List[Tuple[str, Optional[str]]]) -> List[List[Dict[str, Any]]]:
+        try:
+            return generar_ideas_para_keywords(grupo, lote)
+        except Exception as e:
+            print(f"[WARN] generar_ideas_lote {[kw for kw, _ in grupo]!r}:", e)
+            return [[] for _ in grupo]
+
+    workers = max(1, min(concurrencia or LLM_CONCURRENCIA, len(grupos)))
+    if workers == 1:
+        for g in grupos:
+            yield from _uno(g)
+        return
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scidata-llm")
+    pendientes: deque = deque()
+    siguientes = iter(grupos)
+    try:
+        for g in siguientes:
+            pendientes.append(pool.submit(_uno, g))
+            if len(pendientes) >= workers * 2:
+                break
+        while pendientes:
+            ideas_grupo = pendientes.popleft().result()
+            g = next(siguientes, None)
+            if g is not None:
+                pendientes.append(pool.submit(_uno, g))
+            yield from ideas_grupo
+    finally:
+        # sin esperar a los que están en curso (su respuesta queda en llm_cache)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def generar_ideas_lote(filas: Sequence[Tuple[str, Optional[str]]],
+                       concurrencia: Optional[int] = None,
+                       lote: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """Como iterar_ideas_lote, pero todas juntas: una lista de ideas por fila."""
+    return list(iterar_ideas_lote(filas, concurrencia, lote))
+
+_SYSTEM_ARTICULO = "Sos un redactor SEO profesional especializado en español neutro."
+_TEMPERATURA_ARTICULO = 0.6
+
+def _prompt_articulo(keyword: str, h2_sugeridos: Optional[List[str]], tono: str) -> str:
     extra_h2 = ""
     if h2_sugeridos:
         joined = "; ".join([h for h in h2_sugeridos if isinstance(h, str) and h.strip()])
         if joined:
             extra_h2 = f"\nRespetá estos H2 (si aplica): {joined}\n"
 
-    prompt = f"""
+    return f"""
 Escribí un ARTÍCULO SEO completo en español, con tono {tono}, optimizado para la keyword "{keyword}".
 Requisitos:
 - Estructura HTML semántica dentro de <article>...</article>.
@@ -302,29 +850,77 @@ Requisitos:
 Devolvé SOLO el HTML.
 """
 
-    try:
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "Sos un redactor SEO profesional especializado en español neutro."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.6,
-        )
-        contenido = resp.choices[0].message.content.strip()
-        # 👇 Quitar siempre code fences tipo ```html ... ```
-        contenido = _strip_code_fences(contenido)
-
-        # Si no parece HTML, aplicar conversión mínima desde Markdown
-        if "<article" not in contenido.lower():
-            contenido = _md_to_html_minimal(contenido)
-        else:
-            contenido = _ensure_article_wrapper(contenido)
+def _html_articulo(contenido: str) -> str:
+    """Texto crudo del modelo -> HTML final del artículo."""
+    # 👇 Quitar siempre code fences tipo ```html ... ```
+    contenido = _strip_code_fences(contenido)
 
-        return {"html": contenido}
-    except Exception as e:
-        print("❌ Error en generar_articulo_para_keyword:", e)
-        return {"html": _fallback_article(keyword)}
+    # Si no parece HTML, aplicar conversión mínima desde Markdown
+    if "<article" not in contenido.lower():
+        return _md_to_html_minimal(contenido)
+    return _ensure_article_wrapper(contenido)
+
+def generar_articulo_para_keyword(keyword: str, h2_sugeridos: Optional[List[str]] = None, tono: str = "informativo") -> Dict[str, str]:
+    """
+    Devuelve {"html": "<article>...</article>"} con contenido SEO completo.
+    """
+    if not keyword:
+        return {"html": _fallback_article("contenido")}
+
+    with llm_metrics.medir("articulo", OPENAI_MODEL) as m:
+        if client is None:
+            m.resultado = "offline"
+            return {"html": _fallback_article(keyword)}
+
+        prompt = _prompt_articulo(keyword, h2_sugeridos, tono)
+        try:
+            contenido = _chat(_SYSTEM_ARTICULO, prompt, _TEMPERATURA_ARTICULO,
+                              timeout_s=LLM_TIMEOUT_ARTICULO_S, medicion=m)
+            return {"html": _html_articulo(contenido)}
+        except Exception as e:
+            print("❌ Error en generar_articulo_para_keyword:", e)
+            m.resultado = "error_fallback"
+            m.extra["error"] = type(e).__name__
+            return {"html": _fallback_article(keyword)}
+
+def generar_articulo_stream(keyword: str, h2_sugeridos: Optional[List[str]] = None,
+                            tono: str = "informativo") -> Iterator[Tuple[str, str]]:
+    """
+    Versión en streaming de generar_articulo_para_keyword. Va devolviendo
+    ("delta", texto) con cada fragmento del modelo y al final ("html", html)
+    con el artículo completo ya limpio (mismo resultado que la versión
+    bloqueante). Si el modelo falla, a mitad o antes de empezar, el "html"
+    final es el artículo de fallback.
+    """
+    if not keyword:
+        html = _fallback_article("contenido")
+        yield "delta", html
+        yield "html", html
+        return
+
+    with llm_metrics.medir("articulo_stream", OPENAI_MODEL) as m:
+        if client is None:
+            m.resultado = "offline"
+            html = _fallback_article(keyword)
+            yield "delta", html
+            yield "html", html
+            return
+
+        partes: List[str] = []
+        try:
+            for texto in _chat_stream(_SYSTEM_ARTICULO, _prompt_articulo(keyword, h2_sugeridos, tono),
+                                      _TEMPERATURA_ARTICULO, medicion=m):
+                if not partes:
+                    m.extra["primer_fragmento_ms"] = round((time.perf_counter() - m.t0) * 1000, 1)
+                partes.append(texto)
+                yield "delta", texto
+            html = _html_articulo("".join(partes))
+        except Exception as e:
+            print("❌ Error en generar_articulo_stream:", e)
+            m.resultado = "error_fallback"
+            m.extra["error"] = type(e).__name__
+            html = _fallback_article(keyword)
+        yield "html", html
 
 # ======================= Aliases de compat =======================
 def generar_ideas_desde_keyword(keyword: str, pais: Optional[str] = None, n: int = 3) -> List[Dict[str, Any]]:
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Cola de trabajos en segundo plano (tabla jobs de usuarios.db, sin broker).
+
+Un CSV subido al dashboard no se procesa dentro del request: se guarda en
+UPLOAD_FOLDER, se encola un job y el request vuelve enseguida con su id. Un
+worker local (un thread por proceso de la app, o `python jobs.py --worker`)
+toma los jobs de a uno y genera las ideas fila por fila:
+
+- Checkpoint por fila: después de guardar las ideas de una fila se anota
+  'procesadas'. Si el proceso muere, otro worker (o el mismo al reiniciar)
+  retoma el job desde ahí cuando su heartbeat tiene más de JOBS_VENCIDO_S.
+  Rehacer una fila no duplica nada: agregar_ideas_usuario fusiona por
+  keyword (y 'ideas' suma solo las que agregó de verdad) y la respuesta del
+  LLM ya quedó en llm_cache.
+- Heartbeat: mientras el job corre, un thread lo renueva cada
+  JOBS_VENCIDO_S / 3 (un lote puede tardar más que JOBS_VENCIDO_S entre
+  timeouts, reintentos y fallbacks por keyword).
+- Reclamar un job es un UPDATE dentro de BEGIN IMMEDIATE, así que con varios
+  procesos cada job lo toma uno solo. Heartbeat, checkpoint y cierre solo
+  escriben si el job sigue siendo de ese worker (AND worker = ?); si otro lo
+  retomó, el primero deja de procesarlo.
+- Progreso: obtener_job(id) / GET /api/jobs/<id>.
+
+La tabla la crea migraciones.py (migración 7).
+"""
+import argparse
+import csv
+import io
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+import ideas
+import storage
+
+DB_PATH = os.path.join("data", "usuarios.db")
+UPLOAD_FOLDER = os.path.join("data", "uploads")
+
+JOBS_POLL_S = float(os.environ.get("SCIDATA_JOBS_POLL_S", "1"))
+# Un job 'en_curso' sin heartbeat por este tiempo se da por abandonado y se retoma
+JOBS_VENCIDO_S = int(os.environ.get("SCIDATA_JOBS_VENCIDO_S", "300"))
+
+ESTADOS_JOB = ("pendiente", "en_curso", "terminado", "error")
+
+_CAMPOS_JOB = ("id", "email", "tipo", "estado", "total", "procesadas", "ideas", "error", "creado", "actualizado")
+
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+_hay_trabajo = threading.Event()
+
+
+# ------------------------------------------------------
+# CSV
+# ------------------------------------------------------
+def leer_filas_csv(raw: bytes, pais_defecto: str = "") -> List[Tuple[str, str]]:
+    """(keyword, pais) de un CSV con columnas tendencia,pais (utf-8 o latin-1)."""
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1", errors="ignore")
+    filas = []
+    for row in csv.DictReader(io.StringIO(text)):
+        kw = (row.get("tendencia") or "").strip()
+        pa = (row.get("pais") or pais_defecto or "").strip()
+        if kw:
+            filas.append((kw, pa or "Argentina"))
+    return filas
+
+
+# ------------------------------------------------------
+# COLA
+# ------------------------------------------------------
+def _fila_a_dict(row) -> Dict[str, Any]:
+    job = dict(zip(_CAMPOS_JOB, row))
+    job["progreso"] = round(job["procesadas"] / job["total"], 4) if job["total"] else 1.0
+    return job
+
+
+def encolar_csv(email: str, raw: bytes, pais: str = "", carpeta: Optional[str] = None) -> Dict[str, Any]:
+    """Guarda el CSV en 'carpeta' (default UPLOAD_FOLDER) y encola el job. Devuelve el job (sin procesar)."""
+    job_id = uuid.uuid4().hex
+    carpeta = carpeta or UPLOAD_FOLDER
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, f"{job_id}.csv")
+    storage._escribir_atomico(ruta, raw)
+    total = len(leer_filas_csv(raw, pais))
+    ahora = time.time()
+    with db.conexion(DB_PATH) as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, email, tipo, estado, archivo, pais, total, procesadas, ideas, creado, actualizado) "
+            "VALUES (?, ?, 'csv_ideas', 'pendiente', ?, ?, ?, 0, 0, ?, ?)",
+            (job_id, email, ruta, pais, total, ahora, ahora)
+        )
+    _hay_trabajo.set()
+    return obtener_job(job_id)
+
+
+def obtener_job(job_id: str, email: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """El job (solo si es de 'email', cuando se pasa), o None."""
+    with db.conexion(DB_PATH) as conn:
+        row = conn.execute(f"SELECT {', '.join(_CAMPOS_JOB)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = _fila_a_dict(row)
+    if email is not None and job["email"] != email:
+        return None
+    return job
+
+
+def jobs_activos(email: str) -> List[Dict[str, Any]]:
+    """Jobs pendientes o en curso del usuario, del más viejo al más nuevo."""
+    with db.conexion(DB_PATH) as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(_CAMPOS_JOB)} FROM jobs WHERE email = ? AND estado IN ('pendiente', 'en_curso') "
+            "ORDER BY creado", (email,)
+        ).fetchall()
+    return [_fila_a_dict(r) for r in rows]
+
+
+def _reclamar(worker_id: str) -> Optional[Tuple[str, str, str, str, int]]:
+    """Toma el job pendiente más viejo (o uno abandonado). None si no hay."""
+    ahora = time.time()
+    with db.transaccion(DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT id, email, archivo, pais, procesadas FROM jobs "
+            "WHERE estado = 'pendiente' OR (estado = 'en_curso' AND heartbeat < ?) "
+            "ORDER BY creado LIMIT 1", (ahora - JOBS_VENCIDO_S,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET estado = 'en_curso', worker = ?, heartbeat = ?, actualizado = ? WHERE id = ?",
+            (worker_id, ahora, ahora, row[0])
+        )
+    return row
+
+
+def _checkpoint(job_id: str, worker_id: str, procesadas: int, ideas_nuevas: int) -> bool:
+    """Anota el avance. False si el job ya no es de este worker (no escribe nada)."""
+    ahora = time.time()
+    with db.conexion(DB_PATH) as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET procesadas = ?, ideas = ideas + ?, heartbeat = ?, actualizado = ? "
+            "WHERE id = ? AND worker = ? AND estado = 'en_curso'",
+            (procesadas, ideas_nuevas, ahora, ahora, job_id, worker_id)
+        )
+    return cur.rowcount > 0
+
+
+def _terminar(job_id: str, worker_id: str, estado: str, error: Optional[str] = None) -> bool:
+    """Cierra el job. False si ya no es de este worker."""
+    with db.conexion(DB_PATH) as conn:
+        cur = conn.execute(
+            "UPDATE jobs SET estado = ?, error = ?, actualizado = ? "
+            "WHERE id = ? AND worker = ? AND estado = 'en_curso'",
+            (estado, error, time.time(), job_id, worker_id)
+        )
+    return cur.rowcount > 0
+
+
+class _Latido:
+    """Renueva el heartbeat del job cada 'intervalo_s' en un thread aparte mientras se procesa."""
+
+    def __init__(self, job_id: str, worker_id: str, intervalo_s: Optional[float] = None):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.intervalo_s = intervalo_s or max(1.0, JOBS_VENCIDO_S / 3)
+        self.perdido = threading.Event()   # otro worker tomó el job
+        self._fin = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"scidata-job-{job_id[:8]}", daemon=True)
+
+    def _loop(self) -> None:
+        while not self._fin.wait(self.intervalo_s):
+            try:
+                ahora = time.time()
+                with db.conexion(DB_PATH) as conn:
+                    cur = conn.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND estado = 'en_curso'",
+                        (ahora, self.job_id, self.worker_id)
+                    )
+                if cur.rowcount == 0:
+                    self.perdido.set()
+                    return
+            except Exception as e:
+                print(f"[WARN] heartbeat job {self.job_id}: {e}")
+
+    def __enter__(self) -> "_Latido":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._fin.set()
+        self._thread.join()
+
+
+def procesar_job(job: Tuple[str, str, str, str, int], worker_id: str) -> None:
+    """Genera las ideas de las filas que faltan, guardando y anotando el avance fila por fila."""
+    job_id, email, archivo, pais, desde = job
+    try:
+        with open(archivo, "rb") as f:
+            filas = leer_filas_csv(f.read(), pais)
+    except OSError as e:
+        print(f"[ERROR] job {job_id}: no se pudo leer {archivo}: {e}")
+        _terminar(job_id, worker_id, "error", f"archivo: {e}")
+        return
+
+    if desde:
+        print(f"[jobs] retomando {job_id} en la fila {desde}/{len(filas)}")
+    procesadas = desde
+    with _Latido(job_id, worker_id) as latido:
+        for lote in ideas.iterar_ideas_lote(filas[desde:]):
+            if latido.perdido.is_set():
+                print(f"[WARN] job {job_id}: lo retomó otro worker; se deja en la fila {procesadas}")
+                return
+            nuevas = storage.agregar_ideas_usuario(email, lote) if lote else 0
+            if nuevas is None:
+                raise RuntimeError("no se pudieron guardar las ideas")
+            procesadas += 1
+            if not _checkpoint(job_id, worker_id, procesadas, nuevas):
+                print(f"[WARN] job {job_id}: lo retomó otro worker; se deja en la fila {procesadas}")
+                return
+
+    if not _terminar(job_id, worker_id, "terminado"):
+        return
+    try:
+        os.remove(archivo)
+    except OSError:
+        pass
+
+
+def procesar_pendientes(worker_id: Optional[str] = None) -> int:
+    """Procesa jobs hasta vaciar la cola. Devuelve cuántos tomó."""
+    # Con un sufijo al azar: un pid reciclado (o dos llamadas en el mismo proceso) no se confunde con otro worker
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    n = 0
+    while True:
+        job = _reclamar(worker_id)
+        if job is None:
+            return n
+        n += 1
+        try:
+            procesar_job(job, worker_id)
+        except Exception as e:
+            print(f"[ERROR] job {job[0]}: {e}")
+            _terminar(job[0], worker_id, "error", str(e))
+
+
+def _loop_worker() -> None:
+    while True:
+        try:
+            procesar_pendientes()
+        except Exception as e:
+            print(f"[WARN] worker de jobs: {e}")
+        _hay_trabajo.wait(JOBS_POLL_S)
+        _hay_trabajo.clear()
+
+
+def iniciar_worker() -> None:
+    """Arranca el thread worker de este proceso (una vez; se recrea si murió o tras un fork)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_loop_worker, name="scidata-jobs", daemon=True)
+            _worker.start()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cola de jobs (CSV de tendencias)")
+    ap.add_argument("--worker", action="store_true", help="Quedarse procesando jobs (Ctrl+C para salir)")
+    args = ap.parse_args()
+
+    import migraciones
+    migraciones.aplicar_migraciones()
+    if args.worker:
+        print("[jobs] worker corriendo; Ctrl+C para salir")
+        _loop_worker()
+    else:
+        print(f"[OK] {procesar_pendientes()} jobs procesados")
+
+
+if __name__ == "__main__":
+    main()
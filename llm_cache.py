@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistente de respuestas del LLM (data/llm_cache.db).
+
+La misma (keyword, país) se pide muchas veces (tendencias.csv, varios
+usuarios con el mismo tema): con la cache, la segunda vez no se llama a la
+API y la respuesta sale en milisegundos.
+
+- Clave: sha256 de las partes que cambian la respuesta (tipo de pedido,
+  keyword normalizada, país, modelo, temperatura y versión del prompt). Si se
+  edita el prompt cambia la versión y las entradas viejas dejan de usarse
+  (las termina sacando el LRU).
+- TTL: una entrada más vieja que SCIDATA_LLM_CACHE_TTL_S es un miss.
+- LRU: como mucho SCIDATA_LLM_CACHE_MAX entradas; al pasarse se borran las
+  usadas hace más tiempo. Un hit solo escribe 'usado' (y hits) si la marca
+  tiene más de SCIDATA_LLM_CACHE_TOUCH_S: las lecturas seguidas de la misma
+  clave no escriben, así que el orden del LRU y los hits son aproximados.
+- SCIDATA_LLM_CACHE=0 la desactiva. Por llamada, sin_cache=True no lee pero
+  guarda la respuesta nueva (sirve para refrescar).
+- Solo se guardan respuestas buenas del modelo, nunca los fallbacks.
+
+Es un archivo aparte de usuarios.db: se puede borrar en cualquier momento.
+
+Uso:
+    python llm_cache.py             # tamaño y configuración
+    python llm_cache.py --limpiar   # vaciarla
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import db
+
+CACHE_PATH = os.path.join("data", "llm_cache.db")
+CACHE_ENABLED = os.environ.get("SCIDATA_LLM_CACHE", "1").strip() not in ("0", "false", "no")
+CACHE_TTL_S = int(os.environ.get("SCIDATA_LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+CACHE_MAX = int(os.environ.get("SCIDATA_LLM_CACHE_MAX", "5000"))
+CACHE_TOUCH_S = float(os.environ.get("SCIDATA_LLM_CACHE_TOUCH_S", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS respuestas (
+  clave TEXT PRIMARY KEY,
+  tipo TEXT NOT NULL,
+  valor TEXT NOT NULL,
+  creado REAL NOT NULL,
+  usado REAL NOT NULL,
+  hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_respuestas_usado ON respuestas(usado);
+"""
+
+_schema_ok = False
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expirados": 0, "bypass": 0, "guardados": 0, "evictions": 0}
+
+
+def _norm(s: Optional[str]) -> str:
+    return " ".join((s or "").lower().split())
+
+
+def _sumar(campo: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[campo] += n
+
+
+@contextmanager
+def _conexion():
+    """Conexión del pool a data/llm_cache.db; la tabla se crea la primera vez en el proceso."""
+    global _schema_ok
+    with db.conexion(CACHE_PATH) as conn:
+        if not _schema_ok:
+            conn.executescript(_SCHEMA)
+            _schema_ok = True
+        yield conn
+
+
+def version_prompt(*textos: str) -> str:
+    """Hash corto de los textos de un prompt (system + plantilla) para versionar la cache."""
+    h = hashlib.sha256()
+    for t in textos:
+        h.update(t.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:12]
+
+
+def clave(tipo: str, keyword: str, pais: Optional[str], modelo: str,
+          temperatura: float, version: str) -> str:
+    partes = [tipo, _norm(keyword), _norm(pais), modelo, f"{float(temperatura):.3f}", version]
+    return hashlib.sha256(json.dumps(partes, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def obtener(k: str, sin_cache: bool = False) -> Optional[Any]:
+    """Valor guardado para la clave, o None si no está, venció o se pidió saltear la cache."""
+    if not CACHE_ENABLED:
+        return None
+    if sin_cache:
+        _sumar("bypass")
+        return None
+    try:
+        with _conexion() as conn:
+            row = conn.execute("SELECT valor, creado, usado FROM respuestas WHERE clave = ?", (k,)).fetchone()
+            ahora = time.time()
+            if row is None:
+                _sumar("misses")
+                return None
+            if CACHE_TTL_S > 0 and ahora - row[1] > CACHE_TTL_S:
+                conn.execute("DELETE FROM respuestas WHERE clave = ?", (k,))
+                _sumar("expirados")
+                return None
+            if ahora - row[2] >= CACHE_TOUCH_S:
+                conn.execute("UPDATE respuestas SET usado = ?, hits = hits + 1 WHERE clave = ?", (ahora, k))
+        _sumar("hits")
+        return json.loads(row[0])
+    except Exception as e:
+        print(f"[WARN] llm_cache.obtener: {e}")
+        return None
+
+
+def guardar(k: str, tipo: str, valor: Any) -> None:
+    """Guarda (o reemplaza) la respuesta y recorta las menos usadas si se pasa de CACHE_MAX."""
+    if not CACHE_ENABLED:
+        return
+    try:
+        ahora = time.time()
+        with _conexion() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, tipo, valor, creado, usado, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                (k, tipo, json.dumps(valor, ensure_ascii=False), ahora, ahora)
+            )
+            sobran = conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - CACHE_MAX
+            if CACHE_MAX > 0 and sobran > 0:
+                cur = conn.execute(
+                    "DELETE FROM respuestas WHERE clave IN "
+                    "(SELECT clave FROM respuestas ORDER BY usado ASC LIMIT ?)", (sobran,)
+                )
+                _sumar("evictions", cur.rowcount)
+        _sumar("guardados")
+    except Exception as e:
+        print(f"[WARN] llm_cache.guardar: {e}")
+
+
+def limpiar() -> int:
+    """Borra todas las entradas. Devuelve cuántas había."""
+    with _conexion() as conn:
+        return conn.execute("DELETE FROM respuestas").rowcount
+
+
+def estadisticas() -> Dict[str, Any]:
+    """Hits/misses/expirados/bypass de este proceso, más el tamaño actual de la cache."""
+    with _stats_lock:
+        stats = dict(_stats)
+    try:
+        with _conexion() as conn:
+            stats["size"] = conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+    except Exception:
+        stats["size"] = None
+    stats["max"] = CACHE_MAX
+    stats["ttl_s"] = CACHE_TTL_S
+    stats["touch_s"] = CACHE_TOUCH_S
+    stats["enabled"] = CACHE_ENABLED
+    total = stats["hits"] + stats["misses"] + stats["expirados"]
+    stats["hit_rate"] = round(stats["hits"] / total, 4) if total else 0.0
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cache de respuestas del LLM")
+    ap.add_argument("--limpiar", action="store_true", help="Borrar todas las entradas")
+    args = ap.parse_args()
+
+    if args.limpiar:
+        print(f"[OK] {limpiar()} entradas borradas de {CACHE_PATH}")
+    print(json.dumps(estadisticas(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
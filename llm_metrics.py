@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de las llamadas al LLM (ideas.py): cuánto tardan, cuántos tokens
+usan y cuántas terminan en un fallback.
+
+Cada generación (ideas de una keyword, ideas en lote, artículo, artículo en
+streaming) registra un evento:
+
+    {"operacion": "ideas", "modelo": "gpt-4o-mini", "resultado": "ok",
+     "cache_hit": false, "duracion_ms": 812.4, "tokens_prompt": 210,
+     "tokens_respuesta": 480, "ts": 1733000000.0, ...}
+
+resultado: ok | parse_fallback (la respuesta no se pudo parsear y se usó el
+fallback) | error_fallback (la llamada falló: red, timeout, circuito
+abierto...) | offline (sin cliente OpenAI) | cancelado (el cliente cortó un
+stream antes del final).
+
+- En memoria: histogramas por operación de la última SCIDATA_LLM_METRICS_VENTANA_S
+  (en ranuras de un minuto), con latencia (solo llamadas que fueron a la API),
+  tokens y conteo por resultado. resumen() los devuelve con percentiles
+  estimados; la app los expone en GET /api/llm-metrics.
+- Sinks: cada evento se pasa además a los sinks registrados
+  (agregar_sink(fn)). SCIDATA_LLM_METRICS_SINK configura uno al arrancar:
+  "log" (una línea por evento) o "jsonl:<ruta>" (un JSON por línea).
+
+Uso:
+    python llm_metrics.py --jsonl data/llm_metrics.jsonl   # resumen de un archivo del sink jsonl
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+VENTANA_S = int(os.environ.get("SCIDATA_LLM_METRICS_VENTANA_S", "3600"))
+SINK = os.environ.get("SCIDATA_LLM_METRICS_SINK", "").strip()
+
+RESULTADOS = ("ok", "parse_fallback", "error_fallback", "offline", "cancelado")
+
+# Límites superiores de los buckets (el último es "más que eso")
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 60000)
+BUCKETS_TOKENS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+_RANURA_S = 60
+
+Sink = Callable[[Dict[str, Any]], None]
+
+
+# ------------------------------------------------------
+# AGREGADOS EN MEMORIA
+# ------------------------------------------------------
+class _Agregado:
+    __slots__ = ("llamadas", "resultados", "cache_hits", "tokens_prompt", "tokens_respuesta",
+                 "hist_ms", "hist_tokens", "suma_ms", "max_ms")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.resultados = dict.fromkeys(RESULTADOS, 0)
+        self.cache_hits = 0
+        self.tokens_prompt = 0
+        self.tokens_respuesta = 0
+        self.hist_ms = [0] * (len(BUCKETS_MS) + 1)
+        self.hist_tokens = [0] * (len(BUCKETS_TOKENS) + 1)
+        self.suma_ms = 0.0   # solo llamadas que fueron a la API
+        self.max_ms = 0.0
+
+    def sumar(self, ev: Dict[str, Any]) -> None:
+        self.llamadas += 1
+        self.resultados[ev["resultado"]] = self.resultados.get(ev["resultado"], 0) + 1
+        if ev.get("cache_hit"):
+            self.cache_hits += 1
+            return
+        if ev["resultado"] == "offline":
+            return
+        ms = ev["duracion_ms"]
+        self.hist_ms[bisect_left(BUCKETS_MS, ms)] += 1
+        self.suma_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        tp, tr = ev.get("tokens_prompt") or 0, ev.get("tokens_respuesta") or 0
+        self.tokens_prompt += tp
+        self.tokens_respuesta += tr
+        if tp or tr:
+            self.hist_tokens[bisect_left(BUCKETS_TOKENS, tp + tr)] += 1
+
+    def fusionar(self, otro: "_Agregado") -> None:
+        self.llamadas += otro.llamadas
+        for k, v in otro.resultados.items():
+            self.resultados[k] = self.resultados.get(k, 0) + v
+        self.cache_hits += otro.cache_hits
+        self.tokens_prompt += otro.tokens_prompt
+        self.tokens_respuesta += otro.tokens_respuesta
+        self.hist_ms = [a + b for a, b in zip(self.hist_ms, otro.hist_ms)]
+        self.hist_tokens = [a + b for a, b in zip(self.hist_tokens, otro.hist_tokens)]
+        self.suma_ms += otro.suma_ms
+        self.max_ms = max(self.max_ms, otro.max_ms)
+
+
+def _percentil(hist: List[int], limites: Iterable[float], p: float, maximo: float) -> Optional[float]:
+    """Límite superior del bucket donde cae el percentil p, sin pasar de 'maximo' (None sin datos)."""
+    total = sum(hist)
+    if not total:
+        return None
+    objetivo = p * total
+    acumulado = 0
+    for n, limite in zip(hist, limites):
+        acumulado += n
+        if acumulado >= objetivo:
+            return min(limite, maximo)
+    return maximo
+
+
+def _etiquetas(limites: Iterable[float], unidad: str) -> List[str]:
+    limites = list(limites)
+    return [f"<={x}{unidad}" for x in limites] + [f">{limites[-1]}{unidad}"]
+
+
+def _a_dict(agg: _Agregado) -> Dict[str, Any]:
+    api = agg.llamadas - agg.cache_hits - agg.resultados.get("offline", 0)
+    return {
+        "llamadas": agg.llamadas,
+        "resultados": dict(agg.resultados),
+        "cache_hits": agg.cache_hits,
+        "cache_hit_rate": round(agg.cache_hits / agg.llamadas, 4) if agg.llamadas else 0.0,
+        "fallback_rate": round((agg.resultados.get("parse_fallback", 0) + agg.resultados.get("error_fallback", 0))
+                               / agg.llamadas, 4) if agg.llamadas else 0.0,
+        "latencia_ms": {
+            "media": round(agg.suma_ms / api, 1) if api else None,
+            "p50": _percentil(agg.hist_ms, BUCKETS_MS, 0.50, round(agg.max_ms, 1)),
+            "p95": _percentil(agg.hist_ms, BUCKETS_MS, 0.95, round(agg.max_ms, 1)),
+            "p99": _percentil(agg.hist_ms, BUCKETS_MS, 0.99, round(agg.max_ms, 1)),
+            "max": round(agg.max_ms, 1),
+            "histograma": dict(zip(_etiquetas(BUCKETS_MS, "ms"), agg.hist_ms)),
+        },
+        "tokens": {
+            "prompt": agg.tokens_prompt,
+            "respuesta": agg.tokens_respuesta,
+            "por_llamada": round((agg.tokens_prompt + agg.tokens_respuesta) / api, 1) if api else None,
+            "histograma": dict(zip(_etiquetas(BUCKETS_TOKENS, ""), agg.hist_tokens)),
+        },
+    }
+
+
+class _Ventana:
+    """Agregados por operación en ranuras de un minuto; se descartan las más viejas que 'ventana_s'."""
+
+    def __init__(self, ventana_s: int):
+        self.ventana_s = max(_RANURA_S, ventana_s)
+        self.ranuras: Dict[int, Dict[str, _Agregado]] = {}
+        self.lock = threading.Lock()
+
+    def _purgar(self, ranura_actual: int) -> None:
+        minima = ranura_actual - self.ventana_s // _RANURA_S
+        for r in [r for r in self.ranuras if r <= minima]:
+            del self.ranuras[r]
+
+    def sumar(self, ev: Dict[str, Any]) -> None:
+        ranura = int(ev["ts"] // _RANURA_S)
+        with self.lock:
+            self._purgar(int(time.time() // _RANURA_S))
+            por_op = self.ranuras.setdefault(ranura, {})
+            por_op.setdefault(ev["operacion"], _Agregado()).sumar(ev)
+
+    def resumen(self) -> Dict[str, Dict[str, Any]]:
+        total: Dict[str, _Agregado] = {}
+        with self.lock:
+            self._purgar(int(time.time() // _RANURA_S))
+            for por_op in self.ranuras.values():
+                for op, agg in por_op.items():
+                    total.setdefault(op, _Agregado()).fusionar(agg)
+        return {op: _a_dict(agg) for op, agg in sorted(total.items())}
+
+    def reiniciar(self) -> None:
+        with self.lock:
+            self.ranuras.clear()
+
+
+_ventana = _Ventana(VENTANA_S)
+
+
+# ------------------------------------------------------
+# SINKS
+# ------------------------------------------------------
+_sinks: List[Sink] = []
+_sinks_lock = threading.Lock()
+
+
+def agregar_sink(sink: Sink) -> None:
+    """Registra una función que recibe cada evento (dict). Sus errores se loguean y no cortan nada."""
+    with _sinks_lock:
+        _sinks.append(sink)
+
+
+def quitar_sink(sink: Sink) -> None:
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+
+def sink_log(ev: Dict[str, Any]) -> None:
+    """Una línea por evento en stdout."""
+    extra = " cache" if ev.get("cache_hit") else f" tokens={ev.get('tokens_prompt', 0)}+{ev.get('tokens_respuesta', 0)}"
+    print(f"[llm] {ev['operacion']} {ev['resultado']} {ev['duracion_ms']:.0f}ms{extra} ({ev['modelo']})")
+
+
+def sink_jsonl(ruta: str) -> Sink:
+    """Sink que agrega un JSON por línea a 'ruta' (para analizar después o mandar a otro sistema)."""
+    lock = threading.Lock()
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+
+    def _sink(ev: Dict[str, Any]) -> None:
+        linea = json.dumps(ev, ensure_ascii=False) + "\n"
+        with lock, open(ruta, "a", encoding="utf-8") as f:
+            f.write(linea)
+    return _sink
+
+
+def _sink_configurado(spec: str) -> Optional[Sink]:
+    if not spec:
+        return None
+    if spec == "log":
+        return sink_log
+    if spec.startswith("jsonl:") and spec[6:].strip():
+        return sink_jsonl(spec[6:].strip())
+    print(f"[WARN] SCIDATA_LLM_METRICS_SINK desconocido: {spec!r}")
+    return None
+
+
+_sink_env = _sink_configurado(SINK)
+if _sink_env is not None:
+    agregar_sink(_sink_env)
+
+
+# ------------------------------------------------------
+# API
+# ------------------------------------------------------
+def registrar(ev: Dict[str, Any]) -> None:
+    """Suma un evento a los histogramas y lo pasa a los sinks."""
+    ev.setdefault("ts", time.time())
+    ev.setdefault("cache_hit", False)
+    _ventana.sumar(ev)
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink(ev)
+        except Exception as e:
+            print(f"[WARN] llm_metrics sink {getattr(sink, '__name__', sink)!r}: {e}")
+
+
+class Medicion:
+    """Lo que se va sabiendo de una generación mientras corre (ver medir)."""
+
+    def __init__(self, operacion: str, modelo: str):
+        self.operacion = operacion
+        self.modelo = modelo
+        self.resultado = "ok"
+        self.cache_hit = False
+        self.tokens_prompt = 0
+        self.tokens_respuesta = 0
+        self.extra: Dict[str, Any] = {}
+        self.t0 = time.perf_counter()
+
+    def sumar_uso(self, usage: Any) -> None:
+        """Suma los tokens de resp.usage (objeto del cliente OpenAI o dict)."""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda k: getattr(usage, k, None)
+        self.tokens_prompt += int(get("prompt_tokens") or 0)
+        self.tokens_respuesta += int(get("completion_tokens") or 0)
+
+
+@contextmanager
+def medir(operacion: str, modelo: str) -> Iterator[Medicion]:
+    """
+    Mide el bloque y registra el evento al salir. Adentro se marca
+    m.resultado / m.cache_hit / m.sumar_uso(...); si el bloque lanza una
+    excepción queda como error_fallback (y la excepción sigue).
+    """
+    m = Medicion(operacion, modelo)
+    try:
+        yield m
+    except GeneratorExit:
+        m.resultado = "cancelado"
+        raise
+    except BaseException as e:
+        m.resultado = "error_fallback"
+        m.extra.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        ev = {
+            "operacion": m.operacion,
+            "modelo": m.modelo,
+            "resultado": m.resultado,
+            "cache_hit": m.cache_hit,
+            "duracion_ms": round((time.perf_counter() - m.t0) * 1000, 1),
+            "tokens_prompt": m.tokens_prompt,
+            "tokens_respuesta": m.tokens_respuesta,
+        }
+        ev.update(m.extra)
+        try:
+            registrar(ev)
+        except Exception as e:
+            print(f"[WARN] llm_metrics.registrar: {e}")
+
+
+def resumen() -> Dict[str, Any]:
+    """Histogramas por operación de la ventana actual."""
+    return {"ventana_s": _ventana.ventana_s, "operaciones": _ventana.resumen()}
+
+
+def reiniciar() -> None:
+    _ventana.reiniciar()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumen de métricas del LLM")
+    ap.add_argument("--jsonl", required=True, help="Archivo escrito por el sink jsonl")
+    args = ap.parse_args()
+
+    total: Dict[str, _Agregado] = {}
+    with open(args.jsonl, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                ev = json.loads(linea)
+                total.setdefault(ev["operacion"], _Agregado()).sumar(ev)
+    print(json.dumps({op: _a_dict(agg) for op, agg in sorted(total.items())}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Migraciones numeradas del schema de usuarios.db.
+
+La tabla schema_version guarda cuáles ya se aplicaron; aplicar_migraciones()
+corre las pendientes en orden, todas en una transacción (BEGIN IMMEDIATE, así
+dos procesos que arrancan a la vez no las aplican dos veces). La llama app.py
+al arrancar y los scripts que tocan la base (crear_db.py, migrar_db.py, ...):
+en el camino de un request no hay DDL.
+
+Cada migración es idempotente sobre bases creadas antes de que existiera
+schema_version (por crear_db.py viejo o por los ALTER que se hacían en cada
+consulta): revisa qué hay antes de crear o agregar.
+
+Para agregar una: escribir _mNNN_<nombre>(conn) y sumarla al final de
+MIGRACIONES con el número siguiente. No editar las ya publicadas.
+
+Uso:
+    python migraciones.py            # aplica las pendientes
+    python migraciones.py --estado   # muestra la versión actual
+"""
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+import db
+
+
+def _columnas(conn: sqlite3.Connection, tabla: str) -> set:
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({tabla})")}
+
+
+# ------------------------------------------------------
+# MIGRACIONES
+# ------------------------------------------------------
+def _m001_usuarios(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          nombre TEXT NOT NULL,
+          email TEXT UNIQUE NOT NULL,
+          password_hash TEXT NOT NULL,
+          articulos_generados INTEGER DEFAULT 0,
+          fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _m002_contadores(conn: sqlite3.Connection) -> None:
+    """Contadores históricos (antes storage._ensure_counter_columns y migrar_db.py)."""
+    columnas = _columnas(conn, "usuarios")
+    for col in ("ideas_generadas", "articulos_generados"):
+        if col not in columnas:
+            conn.execute(f"ALTER TABLE usuarios ADD COLUMN {col} INTEGER DEFAULT 0")
+
+
+def _m003_consolidar_totales(conn: sqlite3.Connection) -> None:
+    """
+    total_ideas/total_articulos (models.ensure_counter_columns) contaban lo
+    mismo que ideas_generadas/articulos_generados: se pasa el mayor de los dos
+    a las columnas que quedan y se borran las duplicadas.
+    """
+    columnas = _columnas(conn, "usuarios")
+    for viejo, nuevo in (("total_ideas", "ideas_generadas"), ("total_articulos", "articulos_generados")):
+        if viejo not in columnas:
+            continue
+        conn.execute(f"UPDATE usuarios SET {nuevo} = MAX(COALESCE({nuevo}, 0), COALESCE({viejo}, 0))")
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute(f"ALTER TABLE usuarios DROP COLUMN {viejo}")
+        else:
+            print(f"[WARN] SQLite {sqlite3.sqlite_version} no soporta DROP COLUMN: "
+                  f"'{viejo}' queda en la tabla pero ya no se usa")
+
+
+def _m004_agregados_usuario(conn: sqlite3.Connection) -> None:
+    """Agregados por usuario que mantiene storage.py (ver AGREGADOS POR USUARIO)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS agregados_usuario (
+          email TEXT PRIMARY KEY,
+          ideas INTEGER NOT NULL DEFAULT 0,
+          articulos INTEGER NOT NULL DEFAULT 0,
+          borrador INTEGER NOT NULL DEFAULT 0,
+          revisado INTEGER NOT NULL DEFAULT 0,
+          publicado INTEGER NOT NULL DEFAULT 0,
+          archivado INTEGER NOT NULL DEFAULT 0,
+          updated_at TEXT
+        )
+    """)
+
+
+def _m005_backend_sqlite(conn: sqlite3.Connection) -> None:
+    """Tablas de ideas/artículos de storage_sqlite.py (vacías si el backend es json)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ideas (
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          email TEXT NOT NULL,
+          keyword TEXT NOT NULL,
+          keyword_norm TEXT NOT NULL,
+          posicion INTEGER NOT NULL,
+          titulo TEXT NOT NULL DEFAULT '',
+          palabras_clave TEXT NOT NULL DEFAULT '[]',
+          h2_sugeridos TEXT NOT NULL DEFAULT '[]',
+          tips_seo TEXT NOT NULL DEFAULT '[]',
+          extra TEXT NOT NULL DEFAULT '{}'
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_ideas_email_kw ON ideas(email, keyword_norm)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS articulos (
+          pk INTEGER PRIMARY KEY AUTOINCREMENT,
+          id TEXT NOT NULL,
+          email TEXT NOT NULL,
+          idea_id INTEGER NOT NULL REFERENCES ideas(id) ON DELETE CASCADE,
+          orden INTEGER NOT NULL,
+          titulo TEXT,
+          preview TEXT,
+          html TEXT NOT NULL DEFAULT '',
+          estado TEXT NOT NULL DEFAULT 'borrador',
+          created_at TEXT,
+          updated_at TEXT,
+          extra TEXT NOT NULL DEFAULT '{}'
+        )
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_articulos_id ON articulos(id, email)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_articulos_email_idea ON articulos(email, idea_id, orden)")
+
+
+def _m006_idempotencia(conn: sqlite3.Connection) -> None:
+    """Idempotency-Key de POST /generar-articulo (ver singleflight.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS idempotencia (
+          email TEXT NOT NULL,
+          clave TEXT NOT NULL,
+          respuesta TEXT,
+          creado REAL NOT NULL,
+          PRIMARY KEY (email, clave)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotencia_creado ON idempotencia(creado)")
+
+
+def _m007_jobs(conn: sqlite3.Connection) -> None:
+    """Cola de trabajos en segundo plano (ver jobs.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+          id TEXT PRIMARY KEY,
+          email TEXT NOT NULL,
+          tipo TEXT NOT NULL,
+          estado TEXT NOT NULL DEFAULT 'pendiente',
+          archivo TEXT,
+          pais TEXT,
+          total INTEGER NOT NULL DEFAULT 0,
+          procesadas INTEGER NOT NULL DEFAULT 0,
+          ideas INTEGER NOT NULL DEFAULT 0,
+          error TEXT,
+          worker TEXT,
+          heartbeat REAL,
+          creado REAL NOT NULL,
+          actualizado REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_estado ON jobs(estado, creado)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_email ON jobs(email, estado)")
+
+
+MIGRACIONES: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "tabla usuarios", _m001_usuarios),
+    (2, "columnas ideas_generadas / articulos_generados", _m002_contadores),
+    (3, "total_ideas / total_articulos consolidados en *_generadas", _m003_consolidar_totales),
+    (4, "tabla agregados_usuario", _m004_agregados_usuario),
+    (5, "tablas ideas / articulos del backend sqlite", _m005_backend_sqlite),
+    (6, "tabla idempotencia", _m006_idempotencia),
+    (7, "tabla jobs", _m007_jobs),
+]
+
+
+# ------------------------------------------------------
+# RUNNER
+# ------------------------------------------------------
+_SCHEMA_VERSION = """
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INTEGER PRIMARY KEY,
+  descripcion TEXT NOT NULL,
+  aplicada_en TEXT NOT NULL
+)
+"""
+
+
+def version_actual(ruta: Optional[str] = None) -> int:
+    """Última migración aplicada (0 si la base es nueva o anterior a schema_version)."""
+    with db.conexion(ruta) as conn:
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+        ).fetchone()
+        if not existe:
+            return 0
+        return int(conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0])
+
+
+def aplicar_migraciones(ruta: Optional[str] = None) -> List[int]:
+    """
+    Aplica en orden las migraciones pendientes sobre 'ruta' (default
+    usuarios.db) y devuelve los números aplicados. Si una falla no queda
+    ninguna a medias: se revierte la transacción entera y se propaga el error.
+    """
+    aplicadas = []
+    with db.transaccion(ruta) as conn:
+        conn.execute(_SCHEMA_VERSION)
+        actual = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+        for version, descripcion, migrar in MIGRACIONES:
+            if version <= actual:
+                continue
+            migrar(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, descripcion, aplicada_en) VALUES (?, ?, ?)",
+                (version, descripcion, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+            )
+            aplicadas.append((version, descripcion))
+    for version, descripcion in aplicadas:
+        print(f"[OK] migración {version:03d} aplicada: {descripcion}")
+    return [v for v, _ in aplicadas]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Migraciones del schema de usuarios.db")
+    ap.add_argument("--estado", action="store_true", help="Solo mostrar la versión actual")
+    args = ap.parse_args()
+
+    if not args.estado:
+        aplicar_migraciones()
+    print(f"Schema en versión {version_actual()} (última disponible: {MIGRACIONES[-1][0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# migrar_ideas.py
+# Migra (una sola vez) los JSON de data/ideas al schema actual:
+# ideas con solo 'articulo' legacy pasan a la lista 'articulos' y el HTML de
+# cada artículo se mueve a data/blobs (el JSON queda como índice liviano).
+# Uso:
+#   python migrar_ideas.py [--workers N] [--reformatear] [--compactar] [--gc-blobs]
+
+import argparse
+import time
+import storage
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (default: CPUs)")
+    ap.add_argument("--reformatear", action="store_true",
+                    help="Reescribir en SCIDATA_STORAGE_FORMAT los archivos que estén en otro formato")
+    ap.add_argument("--compactar", action="store_true", help="Plegar los journals pendientes en sus snapshots")
+    ap.add_argument("--gc-blobs", action="store_true", help="Borrar blobs de HTML que ya nadie referencia")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    res = storage.migrar_store_ideas(max_workers=args.workers, reformatear=args.reformatear)
+    dt = time.perf_counter() - t0
+
+    print(f"[OK] {res['total']} archivos: {res['migrados']} migrados, "
+          f"{res['al_dia']} ya al día, {res['errores']} con error ({dt:.2f}s)")
+
+    if args.compactar:
+        print(f"[OK] {storage.compactar_todos()} journals compactados")
+
+    if args.gc_blobs:
+        print(f"[OK] {storage.limpiar_blobs_huerfanos()} blobs huérfanos borrados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Deduplicación de generaciones de artículos (POST /generar-articulo).
+
+Dos capas:
+
+- SingleFlight (en proceso): pedidos iguales que llegan mientras uno está en
+  curso (doble click, varias pestañas con la misma keyword) esperan a ese y
+  reciben su mismo resultado: una sola llamada al LLM y un solo artículo
+  guardado. El resultado se sigue compartiendo durante 'ventana_s' después
+  de terminar, para los reintentos que llegan justo detrás.
+
+- Idempotency-Key (entre procesos, en usuarios.db): la primera vez que llega
+  una clave se reclama una fila en 'idempotencia'; al terminar se guarda la
+  respuesta. Otro pedido con la misma clave (un reintento del front, aunque
+  caiga en otro worker) recibe esa respuesta sin generar nada; si la primera
+  todavía está en curso, espera hasta IDEMPOTENCIA_ESPERA_S y si no terminó
+  levanta ClaveEnCurso (la app responde 409 con Retry-After). Nunca genera
+  sin tener el reclamo. Las claves viven IDEMPOTENCIA_TTL_S. La tabla la crea
+  migraciones.py (migración 6).
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import db
+
+DB_PATH = os.path.join("data", "usuarios.db")
+IDEMPOTENCIA_TTL_S = 24 * 3600
+# Cuánto espera un pedido a que termine el que tiene la clave antes de devolver 409
+IDEMPOTENCIA_ESPERA_S = float(os.environ.get("SCIDATA_IDEMPOTENCIA_ESPERA_S", "10"))
+# Una fila reclamada y sin respuesta después de esto se da por abandonada
+# (el worker que la tenía murió) y la puede tomar otro pedido. Tiene que
+# superar la peor generación de un artículo (ideas.py: 3 intentos de 90s
+# más los backoff), si no un reintento la toma mientras la primera sigue viva.
+_RECLAMO_VENCIDO_S = int(os.environ.get("SCIDATA_IDEMPOTENCIA_RECLAMO_S", "360"))
+_ESPERA_POLL_S = 0.2
+
+
+class ClaveEnCurso(Exception):
+    """Otro pedido tiene la Idempotency-Key y todavía no terminó."""
+
+    def __init__(self, clave: str, retry_after_s: int):
+        super().__init__(f"Idempotency-Key {clave!r} en curso")
+        self.clave = clave
+        self.retry_after_s = retry_after_s
+
+
+# ------------------------------------------------------
+# SINGLE-FLIGHT EN PROCESO
+# ------------------------------------------------------
+class _Vuelo:
+    __slots__ = ("evento", "resultado", "error", "fin")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error: Optional[BaseException] = None
+        self.fin: Optional[float] = None
+
+
+class SingleFlight:
+    """Una ejecución por clave a la vez; los pedidos concurrentes comparten el resultado."""
+
+    def __init__(self, ventana_s: float = 0.0):
+        self.ventana_s = ventana_s
+        self._lock = threading.Lock()
+        self._vuelos: Dict[Hashable, _Vuelo] = {}
+
+    def _purgar(self, ahora: float) -> None:
+        vencidos = [k for k, v in self._vuelos.items()
+                    if v.fin is not None and ahora - v.fin > self.ventana_s]
+        for k in vencidos:
+            del self._vuelos[k]
+
+    def hacer(self, clave: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Corre fn() para 'clave', o espera la ejecución en curso (o reciente)
+        y devuelve su resultado. Devuelve (resultado, compartido); si fn()
+        falla, el error les llega a todos los que esperaban.
+        """
+        with self._lock:
+            self._purgar(time.monotonic())
+            vuelo = self._vuelos.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self._vuelos[clave] = _Vuelo()
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado, True
+
+        try:
+            vuelo.resultado = fn()
+        except BaseException as e:
+            vuelo.error = e
+            with self._lock:   # un error no se comparte con los que lleguen después
+                self._vuelos.pop(clave, None)
+            raise
+        finally:
+            vuelo.fin = time.monotonic()
+            vuelo.evento.set()
+        return vuelo.resultado, False
+
+
+# ------------------------------------------------------
+# IDEMPOTENCY-KEY PERSISTENTE
+# ------------------------------------------------------
+def reclamar_idempotencia(email: str, clave: str, timeout_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve la respuesta guardada para (email, clave), esperando hasta
+    'timeout_s' (default IDEMPOTENCIA_ESPERA_S) si otro pedido la está
+    generando. None = este pedido reclamó la clave y tiene que generar (y
+    después llamar a completar_idempotencia o liberar_idempotencia).
+    Levanta ClaveEnCurso si la espera vence y el otro pedido sigue.
+    """
+    timeout_s = IDEMPOTENCIA_ESPERA_S if timeout_s is None else timeout_s
+    limite = time.monotonic() + timeout_s
+    while True:
+        ahora = time.time()
+        with db.transaccion(DB_PATH) as conn:
+            row = conn.execute(
+                "SELECT respuesta, creado FROM idempotencia WHERE email = ? AND clave = ?", (email, clave)
+            ).fetchone()
+            if row is not None and row[0] is not None and ahora - row[1] <= IDEMPOTENCIA_TTL_S:
+                return json.loads(row[0])
+            libre = (row is None or row[0] is not None              # no existe o la respuesta venció
+                     or ahora - row[1] > _RECLAMO_VENCIDO_S)         # reclamo abandonado
+            if libre:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotencia (email, clave, respuesta, creado) VALUES (?, ?, NULL, ?)",
+                    (email, clave, ahora)
+                )
+                return None
+        if time.monotonic() > limite:
+            # a lo sumo hasta que el reclamo se dé por abandonado
+            restante = _RECLAMO_VENCIDO_S - (ahora - row[1])
+            raise ClaveEnCurso(clave, max(1, min(5, int(restante) + 1)))
+        time.sleep(_ESPERA_POLL_S)
+
+
+def completar_idempotencia(email: str, clave: str, respuesta: Dict[str, Any]) -> None:
+    """Guarda la respuesta de la clave (y de paso borra las vencidas)."""
+    ahora = time.time()
+    with db.transaccion(DB_PATH) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO idempotencia (email, clave, respuesta, creado) VALUES (?, ?, ?, ?)",
+            (email, clave, json.dumps(respuesta, ensure_ascii=False), ahora)
+        )
+        conn.execute("DELETE FROM idempotencia WHERE creado < ?", (ahora - IDEMPOTENCIA_TTL_S,))
+
+
+def liberar_idempotencia(email: str, clave: str) -> None:
+    """Suelta un reclamo sin respuesta (la generación falló): el próximo reintento genera."""
+    with db.conexion(DB_PATH) as conn:
+        conn.execute("DELETE FROM idempotencia WHERE email = ? AND clave = ? AND respuesta IS NULL", (email, clave))
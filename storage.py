@@ -1,21 +1,68 @@
 # -*- coding: utf-8 -*-
 import os
+import atexit
+import gzip
+import hashlib
 import json
 import re
+import struct
 import time
 import sqlite3
+import tempfile
+import threading
 import uuid
-from typing import Optional, List, Dict, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Optional, List, Dict, Any, Tuple
 from html import unescape
 from datetime import datetime, timezone
 
+try:
+    import fcntl  # POSIX: lock advisory entre procesos
+except ImportError:  # Windows: queda solo el lock entre threads del proceso
+    fcntl = None
+
+import db
+
 # ------------------------------------------------------
 # RUTAS / CONSTANTES
 # ------------------------------------------------------
 IDEAS_DIR = os.path.join("data", "ideas")
 DB_PATH = os.path.join("data", "usuarios.db")
 
+# Versión del formato de los JSON por usuario:
+#   1 = lista de ideas "pelada" (legacy, puede tener solo 'articulo')
+#   2 = {"schema_version": 2, "ideas": [...]} con 'articulos' ya normalizado
+#   3 = índice liviano: cada artículo guarda solo metadata + 'blob' (hash del
+#       HTML en BLOBS_DIR) y ya no existe el 'articulo' duplicado
+IDEAS_SCHEMA_VERSION = 3
+
+# HTML de los artículos, direccionado por contenido (sha256). Un mismo HTML
+# se guarda una sola vez, aunque esté en varias ideas o usuarios.
+BLOBS_DIR = os.path.join("data", "blobs")
+BLOBS_GZIP = os.environ.get("SCIDATA_BLOBS_GZIP", "1").strip() not in ("0", "false", "no")
+BLOB_CACHE_BYTES = int(os.environ.get("SCIDATA_BLOB_CACHE_MB", "32")) * 1024 * 1024
+
+# Formato en disco del índice por usuario (se detecta al leer por la cabecera,
+# así que un directorio con archivos en formatos mezclados sigue funcionando):
+#   "json"    -> JSON con indent=2 (legible, el más lento y pesado)
+#   "compact" -> JSON sin espacios
+#   "gzip"    -> JSON compacto comprimido con gzip
+#   "binary"  -> cabecera fija + un frame con prefijo de largo por idea
+STORAGE_FORMAT = os.environ.get("SCIDATA_STORAGE_FORMAT", "compact").strip().lower()
+FORMATOS_STORE = ("json", "compact", "gzip", "binary")
+
+# Backend de ideas/artículos: "json" (un archivo por usuario en IDEAS_DIR)
+# o "sqlite" (tablas en DB_PATH, ver storage_sqlite.py)
+STORAGE_BACKEND = os.environ.get("SCIDATA_STORAGE_BACKEND", "json").strip().lower()
+
+# Máximo de usuarios con ideas cacheadas en memoria (por proceso)
+IDEAS_CACHE_MAX = int(os.environ.get("SCIDATA_IDEAS_CACHE_MAX", "256"))
+
 os.makedirs(IDEAS_DIR, exist_ok=True)
+os.makedirs(BLOBS_DIR, exist_ok=True)
 
 # ------------------------------------------------------
 # HELPERS
@@ -26,6 +73,14 @@ def _ruta_json_usuario(email: str) -> str:
     return os.path.join(IDEAS_DIR, f"{safe}.json")
 
 
+def _email_desde_ruta(ruta: str) -> str:
+    """Inversa de _ruta_json_usuario (a partir del nombre del archivo)."""
+    nombre = os.path.basename(ruta)
+    if nombre.endswith(".json"):
+        nombre = nombre[:-len(".json")]
+    return nombre.replace("_at_", "@")
+
+
 def _norm(s: Optional[str]) -> str:
     return (s or "").strip().lower()
 
@@ -64,17 +119,370 @@ def _cargar_json_seguro(ruta: str):
         return []
 
 
+def _escribir_atomico(ruta: str, contenido: bytes) -> None:
+    """
+    Escribe de forma atómica: temporal en el mismo directorio, fsync y
+    os.replace sobre el destino. Un lector nunca ve el archivo truncado.
+    Lanza la excepción si falla (y no deja el temporal).
+    """
+    directorio = os.path.dirname(ruta) or "."
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=directorio)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, ruta)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(directorio)
+
+
 def _guardar_json_seguro(ruta: str, data) -> bool:
-    """Guarda JSON a disco con identación y UTF-8."""
+    """Guarda JSON a disco con identación y UTF-8, de forma atómica."""
+    try:
+        _escribir_atomico(ruta, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+        return True
+    except Exception as e:
+        print(f"[ERROR] No se pudo guardar JSON {ruta}: {e}")
+        return False
+
+
+def _fsync_dir(directorio: str) -> None:
+    """fsync del directorio para que el rename sobreviva a un corte (solo POSIX)."""
+    if os.name != "posix":
+        return
+    try:
+        dfd = os.open(directorio, os.O_RDONLY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+    except OSError:
+        pass
+
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _lock_archivo(ruta: str):
+    """
+    Lock exclusivo sobre '<ruta>.lock' mientras dura el bloque.
+    Con fcntl es un flock advisory, válido entre procesos (varios workers)
+    y entre threads (cada uno abre su propio descriptor). Sin fcntl, cae a
+    un threading.Lock por ruta.
+    """
+    if fcntl is None:
+        with _thread_locks_guard:
+            lk = _thread_locks.setdefault(ruta, threading.Lock())
+        with lk:
+            yield
+        return
+
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    fd = os.open(ruta + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+# ------------------------------------------------------
+# FORMATOS DEL STORE (json / compact / gzip / binary)
+# ------------------------------------------------------
+_GZIP_MAGIC = b"\x1f\x8b"
+_BIN_MAGIC = b"SCIB"
+# magic, versión del formato binario, schema_version, gen, cantidad de ideas
+_BIN_HEADER = struct.Struct(">4sBIII")
+_BIN_LEN = struct.Struct(">I")
+
+
+def _codificar_store(envelope: Dict[str, Any], formato: str) -> bytes:
+    """Serializa {"schema_version", "gen", "ideas"} en el formato pedido."""
+    if formato == "json":
+        return json.dumps(envelope, ensure_ascii=False, indent=2).encode("utf-8")
+    if formato == "binary":
+        ideas = envelope.get("ideas") or []
+        partes = [_BIN_HEADER.pack(_BIN_MAGIC, 1, int(envelope.get("schema_version") or 0),
+                                   int(envelope.get("gen") or 0), len(ideas))]
+        for idea in ideas:
+            frame = json.dumps(idea, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            partes.append(_BIN_LEN.pack(len(frame)))
+            partes.append(frame)
+        return b"".join(partes)
+    compacto = json.dumps(envelope, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if formato == "gzip":
+        return gzip.compress(compacto, compresslevel=6, mtime=0)
+    return compacto
+
+
+def _decodificar_store(raw: bytes) -> Any:
+    """Inversa de _codificar_store; detecta el formato por la cabecera."""
+    if raw[:2] == _GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    if raw[:4] == _BIN_MAGIC:
+        _, _, version, gen, n = _BIN_HEADER.unpack_from(raw, 0)
+        pos, frames = _BIN_HEADER.size, []
+        for _ in range(n):
+            (largo,) = _BIN_LEN.unpack_from(raw, pos)
+            pos += _BIN_LEN.size
+            frames.append(raw[pos:pos + largo])
+            pos += largo
+        # Un solo json.loads para todas las ideas: los frames ya están delimitados
+        return {"schema_version": version, "gen": gen,
+                "ideas": json.loads(b"[" + b",".join(frames) + b"]")}
+    return json.loads(raw)
+
+
+def _formato_archivo(ruta: str) -> Optional[str]:
+    """Formato de un archivo existente según su cabecera (None si no se puede leer)."""
+    try:
+        with open(ruta, "rb") as f:
+            head = f.read(16)
+    except OSError:
+        return None
+    if head[:2] == _GZIP_MAGIC:
+        return "gzip"
+    if head[:4] == _BIN_MAGIC:
+        return "binary"
+    return "compact" if head[:2] == b'{"' else "json"
+
+
+def _cargar_store(ruta: str) -> Tuple[int, list, int]:
+    """
+    Lee el índice de ideas de un usuario (en cualquier formato) y devuelve
+    (schema_version, ideas, gen). Un archivo que es una lista pelada es
+    versión 1 (legacy). 'gen' identifica el snapshot: el journal solo aplica
+    sobre la generación en la que se escribió.
+    """
+    if not os.path.exists(ruta):
+        return IDEAS_SCHEMA_VERSION, [], 0
+    try:
+        with open(ruta, "rb") as f:
+            data = _decodificar_store(f.read())
+    except Exception as e:
+        print(f"[WARN] No se pudo cargar JSON {ruta}: {e}")
+        return IDEAS_SCHEMA_VERSION, [], 0
+    if isinstance(data, list):
+        return 1, data, 0
+    if isinstance(data, dict) and isinstance(data.get("ideas"), list):
+        return int(data.get("schema_version") or 1), data["ideas"], int(data.get("gen") or 0)
+    return IDEAS_SCHEMA_VERSION, [], 0
+
+
+def _guardar_store(ruta: str, ideas: list, gen: int = 0, formato: Optional[str] = None) -> bool:
+    """Guarda las ideas con el marcador de versión actual, en STORAGE_FORMAT (o 'formato')."""
+    formato = formato or STORAGE_FORMAT
+    if formato not in FORMATOS_STORE:
+        formato = "compact"
+    envelope = {"schema_version": IDEAS_SCHEMA_VERSION, "gen": gen, "ideas": ideas}
     try:
-        with open(ruta, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        _escribir_atomico(ruta, _codificar_store(envelope, formato))
         return True
     except Exception as e:
         print(f"[ERROR] No se pudo guardar JSON {ruta}: {e}")
         return False
 
 
+def _compat_ideas(ideas: list) -> list:
+    """Aplica _ensure_article_compat a cada idea de una lista v1/v2 (in place)."""
+    for i in ideas:
+        if isinstance(i, dict):
+            _ensure_article_compat(i)
+    return ideas
+
+
+def _ideas_completas_archivo(ruta: str) -> list:
+    """Ideas de un archivo (cualquier versión, con su journal) con el HTML de cada artículo."""
+    version, ideas, _ = _cargar_store(ruta)
+    if version < 3:
+        return _compat_ideas(ideas)
+    return _hidratar(_cargar_estado(ruta).ideas)
+
+
+# ------------------------------------------------------
+# BLOBS DE HTML (direccionados por contenido)
+# ------------------------------------------------------
+_blob_cache: "OrderedDict[str, str]" = OrderedDict()
+_blob_cache_bytes = 0
+_blob_cache_lock = threading.Lock()
+
+
+def _ruta_blob(ref: str, comprimido: bool) -> str:
+    return os.path.join(BLOBS_DIR, ref[:2], ref + (".html.gz" if comprimido else ".html"))
+
+
+def _ref_blob(html: str) -> str:
+    """Ref (sha256 hex) que tiene o tendría el blob de este HTML, sin escribir nada."""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def _guardar_blob(html: str) -> Optional[str]:
+    """
+    Guarda el HTML (si no estaba ya) y devuelve su ref (sha256 hex).
+    HTML vacío no genera blob: devuelve None.
+    """
+    if not (html or "").strip():
+        return None
+    data = html.encode("utf-8")
+    ref = _ref_blob(html)
+    if os.path.exists(_ruta_blob(ref, True)) or os.path.exists(_ruta_blob(ref, False)):
+        return ref
+
+    ruta = _ruta_blob(ref, BLOBS_GZIP)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    _escribir_atomico(ruta, gzip.compress(data, compresslevel=6, mtime=0) if BLOBS_GZIP else data)
+    return ref
+
+
+def _leer_blob(ref: Optional[str]) -> str:
+    """HTML de un blob ('' si no hay ref o no se encuentra). Cacheado por ref."""
+    global _blob_cache_bytes
+    if not ref:
+        return ""
+    with _blob_cache_lock:
+        html = _blob_cache.get(ref)
+        if html is not None:
+            _blob_cache.move_to_end(ref)
+            return html
+
+    html = ""
+    try:
+        ruta = _ruta_blob(ref, True)
+        if os.path.exists(ruta):
+            with open(ruta, "rb") as f:
+                html = gzip.decompress(f.read()).decode("utf-8")
+        else:
+            with open(_ruta_blob(ref, False), "r", encoding="utf-8") as f:
+                html = f.read()
+    except Exception as e:
+        print(f"[WARN] No se pudo leer el blob {ref}: {e}")
+        return ""
+
+    if BLOB_CACHE_BYTES > 0 and len(html) <= BLOB_CACHE_BYTES:
+        with _blob_cache_lock:
+            if ref not in _blob_cache:
+                _blob_cache[ref] = html
+                _blob_cache_bytes += len(html)
+            while _blob_cache_bytes > BLOB_CACHE_BYTES and _blob_cache:
+                _, viejo = _blob_cache.popitem(last=False)
+                _blob_cache_bytes -= len(viejo)
+    return html
+
+
+def _articulo_indice(a: Dict[str, Any], titulo_defecto: str = "", escribir: bool = True) -> Dict[str, Any]:
+    """
+    Copia del artículo con el HTML movido a su blob (si todavía lo trae).
+    Con escribir=False (lecturas) solo se calcula la ref: el HTML queda en el
+    artículo como pendiente y el blob se escribe recién al persistir el
+    índice (_guardar_blobs_pendientes).
+    """
+    a = dict(a)
+    if "html" in a:
+        html = a.pop("html") or ""
+        if escribir:
+            a["blob"] = _guardar_blob(html)
+        else:
+            a["blob"] = _ref_blob(html) if html.strip() else None
+            if a["blob"]:
+                a["html"] = html
+        if not a.get("titulo"):
+            a["titulo"] = _extraer_titulo_de_html(html) or titulo_defecto
+        if "preview" not in a:
+            a["preview"] = _preview(html)
+    return a
+
+
+def _a_indice(ideas: list) -> list:
+    """
+    Versión para disco de las ideas: el HTML de cada artículo pasa a un blob
+    y queda solo la metadata (id, titulo, preview, estado, fechas, blob).
+    No modifica la lista recibida.
+    """
+    return UserIdeas.desde_lista(ideas).a_lista()
+
+
+def _html_articulo(a: "Articulo") -> str:
+    """HTML de un artículo del modelo: el pendiente si todavía no pasó a su blob, si no el del blob."""
+    return a.html if a.html is not None else _leer_blob(a.blob)
+
+
+def _guardar_blobs_pendientes(articulos) -> None:
+    """
+    Escribe los blobs de los artículos que vinieron de una lectura legacy
+    (ref calculada, HTML en memoria). Lo llama quien va a persistir un índice
+    que los referencia; después de esto el HTML se lee del blob.
+    """
+    for a in articulos:
+        if a.html is not None and a.blob:
+            _guardar_blob(a.html)
+            a.html = None
+
+
+def _hidratar(modelo: "UserIdeas") -> list:
+    """
+    Inversa de _a_indice: las ideas del modelo como dicts con el 'html' de
+    cada artículo y el 'articulo' legacy.
+    """
+    ideas = []
+    for idea in modelo:
+        d = idea.a_dict()
+        for ad, a in zip(d["articulos"], idea.articulos):
+            ad["html"] = _html_articulo(a)
+        d["articulo"] = d["articulos"][0]["html"] if d["articulos"] else ""
+        ideas.append(d)
+    return ideas
+
+
+def limpiar_blobs_huerfanos(antiguedad_min: int = 3600) -> int:
+    """
+    Borra blobs que ningún índice referencia. Solo toca archivos con más de
+    'antiguedad_min' segundos, para no pisar uno recién escrito por una
+    transacción que todavía no guardó su índice. Devuelve cuántos borró.
+    """
+    usados = set()
+    for nombre in os.listdir(IDEAS_DIR):
+        if nombre.endswith(".json"):
+            # base + journal: un artículo recién agregado puede vivir solo en el journal
+            for idea in _cargar_estado(os.path.join(IDEAS_DIR, nombre)).ideas:
+                usados.update(a.blob for a in idea.articulos if a.blob)
+
+    borrados = 0
+    limite = time.time() - antiguedad_min
+    for raiz, _, archivos in os.walk(BLOBS_DIR):
+        for nombre in archivos:
+            ref = nombre.split(".", 1)[0]
+            ruta = os.path.join(raiz, nombre)
+            if ref in usados or nombre.startswith(".tmp-"):
+                continue
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    os.unlink(ruta)
+                    borrados += 1
+            except OSError:
+                pass
+    return borrados
+
+
+def _id_articulo_legacy(keyword: str, html: str) -> str:
+    """
+    Id del artículo que sale de un 'articulo' legacy. Se deriva del hash del
+    contenido (keyword + ref del blob), así es el mismo en cada lectura, en
+    cada worker y en el que después persiste migrar_store_ideas.
+    """
+    return "legacy-" + hashlib.sha256(f"{_norm(keyword)}\0{_ref_blob(html)}".encode("utf-8")).hexdigest()[:16]
+
+
 def _ensure_article_compat(idea: Dict[str, Any]) -> None:
     """
     Mantiene compatibilidad:
@@ -90,7 +498,7 @@ def _ensure_article_compat(idea: Dict[str, Any]) -> None:
             html = idea["articulo"]
             if (html or "").strip():
                 idea["articulos"] = [{
-                    "id": str(int(time.time() * 1000) - 1),
+                    "id": _id_articulo_legacy(idea.get("keyword") or "", html),
                     "titulo": _extraer_titulo_de_html(html) or idea.get("titulo") or idea.get("keyword") or "",
                     "preview": _preview(html),
                     "html": html,
@@ -101,6 +509,579 @@ def _ensure_article_compat(idea: Dict[str, Any]) -> None:
         print(f"[WARN] _ensure_article_compat: {e}")
 
 
+# ------------------------------------------------------
+# MODELO EN MEMORIA (registros con __slots__ + índices)
+# ------------------------------------------------------
+# La cache y las transacciones trabajan sobre UserIdeas en lugar de listas de
+# dicts: cada idea y cada artículo es un registro con __slots__ (sin __dict__
+# por instancia) y hay dos índices, keyword normalizada -> Idea e id de
+# artículo -> (Idea, Articulo), así que ninguna mutación recorre las ideas.
+# Los dicts aparecen solo en el borde: al leer/escribir disco y al devolver
+# ideas a quien llama (a_lista / a_dict siempre arman objetos nuevos).
+_CAMPOS_IDEA = ("keyword", "titulo", "palabras_clave", "h2_sugeridos", "tips_seo")
+_CAMPOS_ARTICULO = ("id", "titulo", "preview", "html", "estado", "created_at", "updated_at", "blob")
+
+
+def _copia_valor(v):
+    return list(v) if isinstance(v, list) else dict(v) if isinstance(v, dict) else v
+
+
+class Articulo:
+    """
+    Un artículo de una idea. 'html' solo está mientras no pasó a su blob; si
+    además tiene 'blob', es un HTML legacy pendiente de escribir (no sale en
+    a_dict: el índice lleva solo la ref).
+    """
+    __slots__ = _CAMPOS_ARTICULO + ("extra",)
+
+    @classmethod
+    def desde_dict(cls, d: Dict[str, Any]) -> "Articulo":
+        a = cls.__new__(cls)
+        for campo in _CAMPOS_ARTICULO:
+            setattr(a, campo, d.get(campo))
+        a.extra = {k: v for k, v in d.items() if k not in _CAMPOS_ARTICULO} or None
+        return a
+
+    def a_dict(self) -> Dict[str, Any]:
+        d = {}
+        for campo in _CAMPOS_ARTICULO:
+            v = getattr(self, campo)
+            if v is not None:
+                d[campo] = v
+        if self.blob:
+            d.pop("html", None)
+        if self.extra:
+            d.update((k, _copia_valor(v)) for k, v in self.extra.items())
+        return d
+
+    def copia(self) -> "Articulo":
+        a = Articulo.__new__(Articulo)
+        for campo in self.__slots__:
+            setattr(a, campo, getattr(self, campo))
+        return a
+
+
+class Idea:
+    """Una idea (keyword) con sus artículos, del más nuevo al más viejo."""
+    __slots__ = _CAMPOS_IDEA + ("articulos", "extra")
+
+    @classmethod
+    def desde_dict(cls, d: Dict[str, Any], blobs: bool = True, escribir_blobs: bool = True) -> "Idea":
+        """
+        Con blobs=True, un artículo que todavía trae 'html' pasa a su blob
+        (con escribir_blobs=False solo se calcula la ref, ver _articulo_indice).
+        """
+        i = cls.__new__(cls)
+        for campo in _CAMPOS_IDEA:
+            setattr(i, campo, d.get(campo))
+        arts = d.get("articulos")
+        titulo_defecto = d.get("titulo") or d.get("keyword") or ""
+        i.articulos = [
+            Articulo.desde_dict(_articulo_indice(a, titulo_defecto, escribir_blobs) if blobs and "html" in a else a)
+            for a in arts if isinstance(a, dict)
+        ] if isinstance(arts, list) else []
+        i.extra = {k: v for k, v in d.items()
+                   if k not in _CAMPOS_IDEA and k not in ("articulos", "articulo")} or None
+        return i
+
+    @classmethod
+    def nueva(cls, keyword: str, titulo: Optional[str] = None) -> "Idea":
+        return cls.desde_dict({
+            "keyword": keyword,
+            "titulo": titulo or keyword,
+            "palabras_clave": [],
+            "h2_sugeridos": [],
+            "tips_seo": [],
+        })
+
+    def a_dict(self) -> Dict[str, Any]:
+        d = {}
+        for campo in _CAMPOS_IDEA:
+            v = getattr(self, campo)
+            if v is not None:
+                d[campo] = _copia_valor(v)
+        if self.extra:
+            d.update((k, _copia_valor(v)) for k, v in self.extra.items())
+        d["articulos"] = [a.a_dict() for a in self.articulos]
+        return d
+
+    def copia(self) -> "Idea":
+        """Copia superficial: comparte los Articulo, no la lista."""
+        i = Idea.__new__(Idea)
+        for campo in self.__slots__:
+            setattr(i, campo, getattr(self, campo))
+        i.articulos = list(self.articulos)
+        return i
+
+
+class UserIdeas:
+    """
+    Ideas de un usuario indexadas por keyword (normalizada) y por id de
+    artículo. El orden de las ideas es el de inserción (el del dict).
+
+    copia() es copy-on-write: comparte los registros con el original y solo
+    clona una Idea (o un Articulo) la primera vez que se modifica, así una
+    transacción sobre un usuario con miles de ideas no copia todo. El modelo
+    que está en la cache no se muta nunca: se trabaja sobre una copia.
+    """
+    __slots__ = ("_ideas", "_articulos", "_propias", "blobs")
+
+    def __init__(self, blobs: bool = True):
+        self._ideas: Dict[str, Idea] = {}
+        self._articulos: Dict[Any, Tuple[Idea, Articulo]] = {}
+        self._propias: Optional[set] = None   # None = todas las ideas son propias
+        self.blobs = blobs                    # False: el HTML queda en el artículo (backend sqlite)
+
+    @classmethod
+    def desde_lista(cls, ideas: list, blobs: bool = True, escribir_blobs: bool = True) -> "UserIdeas":
+        m = cls(blobs)
+        for d in ideas:
+            if not isinstance(d, dict):
+                continue
+            idea = Idea.desde_dict(d, blobs, escribir_blobs)
+            k = _norm(idea.keyword)
+            if k in m._ideas:
+                # Keyword repetida (datos viejos): se conserva en su lugar pero
+                # no se alcanza por keyword, como antes con la búsqueda lineal.
+                k = f"{k}\x00{len(m._ideas)}"
+            m._ideas[k] = idea
+            m._indexar(idea)
+        return m
+
+    def a_lista(self) -> list:
+        return [i.a_dict() for i in self._ideas.values()]
+
+    def copia(self) -> "UserIdeas":
+        m = UserIdeas(self.blobs)
+        m._ideas = dict(self._ideas)
+        m._articulos = dict(self._articulos)
+        m._propias = set()
+        return m
+
+    def __len__(self) -> int:
+        return len(self._ideas)
+
+    def __iter__(self):
+        return iter(self._ideas.values())
+
+    def __contains__(self, keyword: str) -> bool:
+        return _norm(keyword) in self._ideas
+
+    # --- índices ---
+    def _indexar(self, idea: Idea) -> None:
+        for a in idea.articulos:
+            if a.id is not None:
+                self._articulos[a.id] = (idea, a)
+
+    def _desindexar(self, idea: Idea) -> None:
+        for a in idea.articulos:
+            e = self._articulos.get(a.id)
+            if e is not None and e[1] is a:
+                del self._articulos[a.id]
+
+    def _propia(self, k: str, idea: Idea) -> Idea:
+        """La idea lista para mutar: si es compartida con el original, la clona."""
+        if self._propias is None or idea in self._propias:
+            return idea
+        clon = idea.copia()
+        self._ideas[k] = clon
+        for a in clon.articulos:
+            e = self._articulos.get(a.id)
+            if e is not None and e[0] is idea:
+                self._articulos[a.id] = (clon, a)
+        self._propias.add(clon)
+        return clon
+
+    def articulo_desde_dict(self, d: Dict[str, Any], idea: Optional[Idea] = None) -> Articulo:
+        if self.blobs and "html" in d:
+            d = _articulo_indice(d, (idea.titulo or idea.keyword or "") if idea else "")
+        return Articulo.desde_dict(d)
+
+    # --- lectura ---
+    def get(self, keyword: str) -> Optional[Idea]:
+        return self._ideas.get(_norm(keyword))
+
+    def recientes(self, offset: int = 0, limit: Optional[int] = None) -> List[Idea]:
+        """Ideas de la más nueva a la más vieja (orden inverso de alta), paginadas."""
+        fin = None if limit is None else offset + limit
+        return list(islice(reversed(self._ideas.values()), offset, fin))
+
+    def por_id(self, articulo_id) -> Optional[Tuple[Idea, Articulo]]:
+        """(Idea, Articulo) por id de artículo, sin saber la keyword."""
+        return self._articulos.get(articulo_id)
+
+    def articulo(self, keyword: str, articulo_id) -> Optional[Tuple[Idea, Articulo]]:
+        idea = self.get(keyword)
+        if idea is None:
+            return None
+        e = self._articulos.get(articulo_id)
+        if e is not None and e[0] is idea:
+            return e
+        if e is None:
+            return None
+        # id repetido en otra idea (ids legacy por timestamp): se busca en esta
+        for a in idea.articulos:
+            if a.id == articulo_id:
+                return idea, a
+        return None
+
+    # --- mutaciones (las usan IdeasTransaction y el replay del journal) ---
+    def poner(self, idea: Idea) -> Optional[Idea]:
+        """Inserta o reemplaza la idea por keyword (en su lugar). Devuelve la anterior."""
+        k = _norm(idea.keyword)
+        prev = self._ideas.get(k)
+        if prev is not None:
+            self._desindexar(prev)
+        self._ideas[k] = idea
+        self._indexar(idea)
+        if self._propias is not None:
+            self._propias.add(idea)
+        return prev
+
+    def quitar(self, keyword: str) -> Optional[Idea]:
+        idea = self._ideas.pop(_norm(keyword), None)
+        if idea is not None:
+            self._desindexar(idea)
+        return idea
+
+    def insertar_articulo(self, keyword: str, articulo: Articulo) -> bool:
+        """Agrega el artículo como el más nuevo (crea la idea si falta). Idempotente por id."""
+        k = _norm(keyword)
+        idea = self._ideas.get(k)
+        if idea is None:
+            idea = Idea.nueva(keyword)
+            self.poner(idea)
+        elif articulo.id is not None and self.articulo(keyword, articulo.id) is not None:
+            return False  # el replay puede repetir ops
+        idea = self._propia(k, idea)
+        idea.articulos.insert(0, articulo)
+        if articulo.id is not None:
+            self._articulos[articulo.id] = (idea, articulo)
+        return True
+
+    def quitar_articulo(self, keyword: str, articulo_id) -> bool:
+        e = self.articulo(keyword, articulo_id)
+        if e is None:
+            return False
+        idea = self._propia(_norm(keyword), e[0])
+        idea.articulos = [a for a in idea.articulos if a.id != articulo_id]
+        actual = self._articulos.get(articulo_id)
+        if actual is not None and actual[0] is idea:
+            del self._articulos[articulo_id]
+        return True
+
+    def cambiar_estado(self, keyword: str, articulo_id, estado: str, updated_at: Optional[str]) -> bool:
+        e = self.articulo(keyword, articulo_id)
+        if e is None:
+            return False
+        idea = self._propia(_norm(keyword), e[0])
+        a = e[1].copia()  # el Articulo puede estar compartido con la cache
+        a.estado, a.updated_at = estado, updated_at
+        idea.articulos = [a if x is e[1] else x for x in idea.articulos]
+        self._articulos[articulo_id] = (idea, a)
+        return True
+
+    def aplicar(self, op: Dict[str, Any]) -> None:
+        """Aplica una op del journal."""
+        tipo = op.get("op")
+        if tipo == "put" and isinstance(op.get("idea"), dict):
+            self.poner(Idea.desde_dict(op["idea"], self.blobs))
+        elif tipo == "del":
+            self.quitar(op.get("keyword"))
+        elif tipo == "art" and isinstance(op.get("articulo"), dict):
+            self.insertar_articulo(op.get("keyword"), self.articulo_desde_dict(op["articulo"]))
+        elif tipo == "estado":
+            self.cambiar_estado(op.get("keyword"), op.get("id"), op.get("estado"), op.get("updated_at"))
+        elif tipo == "del_art":
+            self.quitar_articulo(op.get("keyword"), op.get("id"))
+
+
+# ------------------------------------------------------
+# JOURNAL DE MUTACIONES (append-only, por usuario)
+# ------------------------------------------------------
+# Cada transacción agrega sus operaciones a '<archivo>.journal' (una línea JSON
+# por op) en vez de reescribir el índice entero. Al cargar, se aplica el
+# journal sobre el snapshot. Cuando crece más allá de los umbrales, un thread
+# de fondo lo compacta: escribe un snapshot nuevo (gen + 1) y borra el journal.
+# Las ops llevan la 'gen' del snapshot sobre el que aplican, así que si se
+# corta entre escribir el snapshot y borrar el journal no se aplican dos veces.
+JOURNAL_ENABLED = os.environ.get("SCIDATA_JOURNAL", "1").strip() not in ("0", "false", "no")
+JOURNAL_MAX_OPS = int(os.environ.get("SCIDATA_JOURNAL_MAX_OPS", "200"))
+JOURNAL_MAX_BYTES = int(os.environ.get("SCIDATA_JOURNAL_MAX_KB", "256")) * 1024
+
+
+def _ruta_journal(ruta: str) -> str:
+    return ruta + ".journal"
+
+
+def _leer_journal(ruta_j: str, offset: int, gen: int) -> Tuple[list, int]:
+    """
+    Ops del journal a partir de 'offset' (bytes) que aplican a 'gen'.
+    Devuelve (ops, nuevo_offset). Una última línea incompleta (escritura
+    cortada) se ignora y no avanza el offset.
+    """
+    try:
+        with open(ruta_j, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+
+    ops = []
+    fin = data.rfind(b"\n") + 1
+    for linea in data[:fin].splitlines():
+        if not linea.strip():
+            continue
+        try:
+            op = json.loads(linea)
+        except ValueError:
+            print(f"[WARN] Línea inválida en {ruta_j}, se ignora")
+            continue
+        if isinstance(op, dict) and op.get("g") == gen:
+            ops.append(op)
+    return ops, offset + fin
+
+
+def _anexar_journal(ruta_j: str, ops: list, gen: int) -> None:
+    """Agrega las ops al journal con fsync (el lock del usuario lo toma quien llama)."""
+    data = "".join(
+        json.dumps(dict(op, g=gen), ensure_ascii=False, separators=(",", ":")) + "\n" for op in ops
+    ).encode("utf-8")
+    with open(ruta_j, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _replay(ideas: "UserIdeas", ops: list) -> "UserIdeas":
+    """Aplica ops del journal sobre el modelo (que no puede ser el de la cache)."""
+    for op in ops:
+        ideas.aplicar(op)
+    return ideas
+
+
+class _EstadoUsuario:
+    """Snapshot + journal ya aplicados, y desde dónde seguir leyendo el journal."""
+    __slots__ = ("firma", "ideas", "gen", "n_ops", "offset")
+
+    def __init__(self, firma: tuple, ideas: "UserIdeas", gen: int, n_ops: int = 0, offset: int = 0):
+        self.firma = firma      # (firma del snapshot, firma del journal)
+        self.ideas = ideas      # índice (sin HTML), solo lectura
+        self.gen = gen
+        self.n_ops = n_ops      # ops del journal aplicadas sobre el snapshot
+        self.offset = offset    # bytes del journal ya consumidos
+
+
+def _firmas(ruta: str) -> tuple:
+    return (_firma_archivo(ruta), _firma_archivo(_ruta_journal(ruta)))
+
+
+def _cargar_estado(ruta: str) -> "_EstadoUsuario":
+    """Lectura completa desde disco: snapshot + journal entero."""
+    firma = _firmas(ruta)
+    version, ideas, gen = _cargar_store(ruta)
+    if version < IDEAS_SCHEMA_VERSION:
+        # Archivo que todavía no pasó por migrar_store_ideas: se normaliza en
+        # memoria (el HTML queda en el modelo, sin escribir blobs) y queda al
+        # día con la próxima escritura (acá no hay lock). Los ids de los
+        # artículos legacy son estables (_id_articulo_legacy).
+        _compat_ideas(ideas)
+    modelo = UserIdeas.desde_lista(ideas, escribir_blobs=False)
+    ops, offset = ([], 0)
+    if firma[1] is not None:
+        ops, offset = _leer_journal(_ruta_journal(ruta), 0, gen)
+    return _EstadoUsuario(firma, _replay(modelo, ops), gen, len(ops), offset)
+
+
+# ------------------------------------------------------
+# CACHE EN PROCESO (LRU por email, invalidada por stat del JSON)
+# ------------------------------------------------------
+# Guarda el modelo (UserIdeas) ya normalizado y con el journal aplicado. Las
+# firmas (mtime, tamaño, inodo) del snapshot y del journal se validan en cada
+# acceso: si otro worker reescribió el snapshot se vuelve a leer todo; si solo
+# agregó ops al journal, se aplica la cola nueva sobre lo cacheado.
+_ideas_cache: "OrderedDict[str, _EstadoUsuario]" = OrderedDict()
+_ideas_cache_lock = threading.Lock()
+_ideas_cache_stats = {"hits": 0, "misses": 0, "replays": 0, "evictions": 0}
+
+
+def _firma_archivo(ruta: str) -> Optional[tuple]:
+    """(mtime_ns, tamaño, inodo) del archivo, o None si no existe."""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _cache_put(email: str, estado: "_EstadoUsuario") -> None:
+    if estado.firma[0] is None or IDEAS_CACHE_MAX <= 0:
+        return
+    with _ideas_cache_lock:
+        _ideas_cache[email] = estado
+        _ideas_cache.move_to_end(email)
+        while len(_ideas_cache) > IDEAS_CACHE_MAX:
+            _ideas_cache.popitem(last=False)
+            _ideas_cache_stats["evictions"] += 1
+
+
+def _solo_crecio_journal(prev: "_EstadoUsuario", firma: tuple) -> bool:
+    """True si desde 'prev' solo se agregaron ops al journal (mismo snapshot)."""
+    if prev.firma[0] is None or prev.firma[0] != firma[0] or firma[1] is None:
+        return False
+    previo_j = prev.firma[1]
+    if previo_j is None:
+        return prev.offset == 0
+    return previo_j[2] == firma[1][2] and firma[1][1] >= prev.offset
+
+
+def _estado_usuario(email: str) -> "_EstadoUsuario":
+    """Estado del usuario desde la cache (validada contra disco) o leído de nuevo."""
+    ruta = _ruta_json_usuario(email)
+    firma = _firmas(ruta)
+    with _ideas_cache_lock:
+        prev = _ideas_cache.get(email)
+        if prev is not None and prev.firma == firma:
+            _ideas_cache.move_to_end(email)
+            _ideas_cache_stats["hits"] += 1
+            return prev
+
+    if prev is not None and _solo_crecio_journal(prev, firma):
+        ops, offset = _leer_journal(_ruta_journal(ruta), prev.offset, prev.gen)
+        estado = _EstadoUsuario(firma, _replay(prev.ideas.copia(), ops) if ops else prev.ideas,
+                                prev.gen, prev.n_ops + len(ops), offset)
+        tipo = "replays"
+    else:
+        estado = _cargar_estado(ruta)
+        tipo = "misses"
+    with _ideas_cache_lock:   # los contadores, siempre bajo el lock (si no se pierden sumas)
+        _ideas_cache_stats[tipo] += 1
+    _cache_put(email, estado)
+    return estado
+
+
+def invalidar_cache_ideas(email: Optional[str] = None) -> None:
+    """Descarta la entrada de un usuario (o toda la cache si email es None)."""
+    with _ideas_cache_lock:
+        if email is None:
+            _ideas_cache.clear()
+        else:
+            _ideas_cache.pop(email, None)
+
+
+def estadisticas_cache_ideas() -> Dict[str, Any]:
+    """Hits/misses/replays/evictions de la cache de ideas de este proceso."""
+    with _ideas_cache_lock:
+        stats = dict(_ideas_cache_stats)
+        stats["size"] = len(_ideas_cache)
+    stats["max"] = IDEAS_CACHE_MAX
+    total = stats["hits"] + stats["misses"] + stats["replays"]
+    stats["hit_rate"] = round((stats["hits"] + stats["replays"]) / total, 4) if total else 0.0
+    return stats
+
+
+def _guardar_snapshot(email: str, ideas: "UserIdeas", gen: int) -> bool:
+    """
+    Escribe el índice completo como snapshot 'gen' y descarta el journal.
+    Lo llama quien tiene el lock del usuario.
+    """
+    ruta = _ruta_json_usuario(email)
+    for idea in ideas:
+        _guardar_blobs_pendientes(idea.articulos)
+    ok = _guardar_store(ruta, ideas.a_lista(), gen)
+    if ok:
+        try:
+            os.unlink(_ruta_journal(ruta))
+        except FileNotFoundError:
+            pass
+        _cache_put(email, _EstadoUsuario(_firmas(ruta), ideas, gen))
+    else:
+        invalidar_cache_ideas(email)
+    return ok
+
+
+def _commit(email: str, tx: "IdeasTransaction", estado: "_EstadoUsuario") -> bool:
+    """
+    Persiste una transacción: si se puede, como ops en el journal (O(cambio));
+    si no (journal apagado o usuario nuevo), snapshot completo.
+    """
+    ruta = _ruta_json_usuario(email)
+    if not (JOURNAL_ENABLED and estado.firma[0] is not None):
+        return _guardar_snapshot(email, tx.ideas, estado.gen + 1)
+
+    try:
+        _anexar_journal(_ruta_journal(ruta), tx.ops, estado.gen)
+    except Exception as e:
+        print(f"[ERROR] No se pudo escribir el journal de {email}: {e}")
+        invalidar_cache_ideas(email)
+        return False
+
+    firma = _firmas(ruta)
+    nuevo = _EstadoUsuario(firma, tx.ideas, estado.gen,
+                           estado.n_ops + len(tx.ops), firma[1][1] if firma[1] else 0)
+    _cache_put(email, nuevo)
+    if nuevo.n_ops >= JOURNAL_MAX_OPS or nuevo.offset >= JOURNAL_MAX_BYTES:
+        _programar_compactacion(email)
+    return True
+
+
+# --- Compactación (fuera del request) ---
+_compactar_pendientes: set = set()
+_compactar_cond = threading.Condition()
+_compactador: Optional[threading.Thread] = None
+
+
+def compactar_usuario(email: str) -> bool:
+    """Pliega el journal del usuario en un snapshot nuevo. True si había algo que compactar."""
+    ruta = _ruta_json_usuario(email)
+    with _lock_archivo(ruta):
+        if _firma_archivo(_ruta_journal(ruta)) is None:
+            return False
+        estado = _estado_usuario(email)
+        return _guardar_snapshot(email, estado.ideas, estado.gen + 1)
+
+
+def compactar_todos() -> int:
+    """Compacta todos los usuarios con journal en IDEAS_DIR. Devuelve cuántos."""
+    n = 0
+    for nombre in sorted(os.listdir(IDEAS_DIR)):
+        if nombre.endswith(".json.journal"):
+            if compactar_usuario(_email_desde_ruta(nombre[:-len(".journal")])):
+                n += 1
+    return n
+
+
+def _loop_compactador() -> None:
+    while True:
+        with _compactar_cond:
+            while not _compactar_pendientes:
+                _compactar_cond.wait()
+            email = _compactar_pendientes.pop()
+        try:
+            compactar_usuario(email)
+        except Exception as e:
+            print(f"[WARN] compactar_usuario {email}: {e}")
+
+
+def _programar_compactacion(email: str) -> None:
+    """Encola la compactación para el thread de fondo (se crea a demanda)."""
+    global _compactador
+    with _compactar_cond:
+        _compactar_pendientes.add(email)
+        if _compactador is None or not _compactador.is_alive():
+            _compactador = threading.Thread(target=_loop_compactador, name="scidata-compactador", daemon=True)
+            _compactador.start()
+        _compactar_cond.notify()
+
+
+def _ideas_cacheadas(email: str) -> "UserIdeas":
+    """
+    Modelo (sin HTML) del usuario, compartido con la cache: solo lectura.
+    Para mutar, usar transaction(); para dicts, .a_lista() (copia sin HTML).
+    """
+    return _estado_usuario(email).ideas
+
+
 # ------------------------------------------------------
 # API DE IDEAS (JSON POR USUARIO)
 # ------------------------------------------------------
@@ -109,22 +1090,158 @@ def cargar_ideas_usuario(email: str) -> list:
     Carga la lista de ideas del usuario. Normaliza compat:
     - Si hay 'articulos' y NO está 'articulo', setea 'articulo' con el último HTML.
     - Si solo hay 'articulo' (legacy), migra a 'articulos'.
+    Sale de la cache en proceso si el archivo no cambió; siempre devuelve una copia.
+    Incluye el HTML de cada artículo (leído de su blob); si no hace falta, usar
+    listar_ideas_usuario.
     """
-    ruta = _ruta_json_usuario(email)
-    ideas = _cargar_json_seguro(ruta)
-    changed = False
+    return _hidratar(_ideas_cacheadas(email))
 
-    for i in ideas:
-        before = json.dumps(i, ensure_ascii=False, sort_keys=True)
-        _ensure_article_compat(i)
-        after = json.dumps(i, ensure_ascii=False, sort_keys=True)
-        if before != after:
-            changed = True
 
-    if changed:
-        _guardar_json_seguro(ruta, ideas)
+def listar_ideas_usuario(email: str, offset: int = 0, limit: int = 20) -> Tuple[list, int]:
+    """
+    Una página de ideas, de la más reciente a la más vieja, y el total de
+    ideas del usuario. Sin HTML: cada artículo trae titulo, preview, estado y
+    fechas; el cuerpo se pide aparte con obtener_articulo_usuario.
+    """
+    modelo = _ideas_cacheadas(email)
+    return [i.a_dict() for i in modelo.recientes(offset, limit)], len(modelo)
+
 
-    return ideas
+def obtener_articulo_usuario(email: str, articulo_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Un artículo por id, con su HTML y la 'keyword' de su idea (None si no
+    existe). 'blob' es el sha256 del HTML: sirve de ETag.
+    """
+    e = _ideas_cacheadas(email).por_id(articulo_id)
+    if e is None:
+        return None
+    idea, a = e
+    art = a.a_dict()
+    art["keyword"] = idea.keyword
+    art["html"] = _html_articulo(a)
+    return art
+
+
+def contar_ideas_usuario(email: str) -> int:
+    """Cantidad de ideas guardadas hoy (no el histórico de generadas)."""
+    return len(_ideas_cacheadas(email))
+
+
+# ------------------------------------------------------
+# MIGRACIÓN DEL STORE (legacy 'articulo' -> 'articulos')
+# ------------------------------------------------------
+_VERSION_RE = re.compile(r'^\s*\{\s*"schema_version"\s*:\s*(\d+)')
+
+
+def _version_archivo(ruta: str) -> int:
+    """
+    Versión del archivo mirando solo la cabecera (no parsea todo el JSON).
+    _guardar_store escribe 'schema_version' como primera clave (o en la
+    cabecera fija del formato binario).
+    """
+    try:
+        with open(ruta, "rb") as f:
+            head = f.read(64)
+            if head[:2] == _GZIP_MAGIC:
+                f.seek(0)
+                with gzip.GzipFile(fileobj=f) as gz:
+                    head = gz.read(64)
+    except (OSError, EOFError):
+        return 0
+    if head[:4] == _BIN_MAGIC and len(head) >= _BIN_HEADER.size:
+        return _BIN_HEADER.unpack_from(head, 0)[2]
+    m = _VERSION_RE.match(head.decode("utf-8", errors="ignore"))
+    return int(m.group(1)) if m else 1
+
+
+def _pendiente_migracion(ruta: str, reformatear: bool = False) -> bool:
+    if _version_archivo(ruta) < IDEAS_SCHEMA_VERSION:
+        return True
+    return reformatear and _formato_archivo(ruta) != STORAGE_FORMAT
+
+
+def _migrar_archivo(ruta: str, reformatear: bool = False) -> str:
+    """
+    Migra un archivo al schema actual (y, con reformatear=True, lo reescribe
+    en STORAGE_FORMAT). Devuelve 'migrado', 'al_dia' o 'error'.
+    """
+    try:
+        if not _pendiente_migracion(ruta, reformatear):
+            return "al_dia"
+        with _lock_archivo(ruta):
+            version, ideas, gen = _cargar_store(ruta)
+            if version >= IDEAS_SCHEMA_VERSION:
+                if not reformatear or _formato_archivo(ruta) == STORAGE_FORMAT:
+                    return "al_dia"
+                # Mismo contenido: el journal (si hay) sigue aplicando sobre esta gen
+                return "migrado" if _guardar_store(ruta, ideas, gen) else "error"
+            # Snapshot legacy + su journal: las escrituras que hubo antes de
+            # migrar van como ops sobre esta gen y con gen + 1 ya no aplicarían
+            estado = _cargar_estado(ruta)
+            for idea in estado.ideas:
+                _guardar_blobs_pendientes(idea.articulos)
+            if not _guardar_store(ruta, estado.ideas.a_lista(), estado.gen + 1):
+                return "error"
+            try:
+                os.unlink(_ruta_journal(ruta))
+            except FileNotFoundError:
+                pass
+            return "migrado"
+    except Exception as e:
+        print(f"[ERROR] _migrar_archivo {ruta}: {e}")
+        return "error"
+
+
+def migrar_store_ideas(max_workers: Optional[int] = None, reformatear: bool = False) -> Dict[str, int]:
+    """
+    Recorre IDEAS_DIR y migra en paralelo los JSON que sigan en formato legacy.
+    Con reformatear=True también reescribe los que estén en otro formato que
+    STORAGE_FORMAT (no hace falta: la lectura detecta el formato solo).
+    Es idempotente: los archivos al día solo se leen por la cabecera.
+    Devuelve {"total", "migrados", "al_dia", "errores"}.
+    """
+    rutas = [os.path.join(IDEAS_DIR, n) for n in sorted(os.listdir(IDEAS_DIR)) if n.endswith(".json")]
+    res = {"total": len(rutas), "migrados": 0, "al_dia": 0, "errores": 0}
+    if not rutas:
+        return res
+
+    pendientes = [r for r in rutas if _pendiente_migracion(r, reformatear)]
+    res["al_dia"] = len(rutas) - len(pendientes)
+    if not pendientes:
+        return res
+
+    if len(pendientes) == 1 or max_workers == 1:
+        estados = [_migrar_archivo(r, reformatear) for r in pendientes]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            estados = list(ex.map(_migrar_archivo, pendientes, [reformatear] * len(pendientes), chunksize=16))
+
+    for st in estados:
+        if st == "migrado":
+            res["migrados"] += 1
+        elif st == "al_dia":
+            res["al_dia"] += 1
+        else:
+            res["errores"] += 1
+
+    invalidar_cache_ideas()
+    return res
+
+
+def _fusionar_idea(existing: Optional[Dict[str, Any]], it: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Arma la idea que queda al fusionar 'it' sobre 'existing' (misma keyword):
+    reemplaza la idea completa, pero conserva 'articulos' existentes cuando la
+    nueva no los trae.
+    """
+    incoming = dict(it)  # copia
+    if existing:
+        # Conservar artículos existentes si los nuevos no vienen
+        if "articulos" not in incoming or not isinstance(incoming.get("articulos"), list):
+            incoming["articulos"] = existing.get("articulos", [])
+    # Mantener compatibilidad 'articulo'
+    _ensure_article_compat(incoming)
+    return incoming
 
 
 def _merge_ideas_list(base: List[Dict[str, Any]], nuevas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -148,22 +1265,166 @@ def _merge_ideas_list(base: List[Dict[str, Any]], nuevas: List[Dict[str, Any]])
         k = _norm(it.get("keyword"))
         if not k:
             continue
+        idx[k] = _fusionar_idea(idx.get(k), it)
+
+    return list(idx.values())
 
-        incoming = dict(it)  # copia
-        existing = idx.get(k)
 
-        if existing:
-            # Conservar artículos existentes si los nuevos no vienen
-            if "articulos" not in incoming or not isinstance(incoming.get("articulos"), list):
-                incoming["articulos"] = existing.get("articulos", [])
-            # Mantener compatibilidad 'articulo'
-            _ensure_article_compat(incoming)
-            idx[k] = incoming
+# ------------------------------------------------------
+# TRANSACCIONES (una lectura + una escritura por operación)
+# ------------------------------------------------------
+class IdeasTransaction:
+    """
+    Vista mutable de las ideas de un usuario (una copia copy-on-write del
+    UserIdeas cacheado). La entrega storage.transaction(email); los cambios se
+    escriben una sola vez al salir del bloque 'with'. Cada método registra su
+    op en 'ops', que es lo que va al journal.
+    get()/find_articulo() devuelven registros Idea/Articulo: son de solo
+    lectura, todo cambio pasa por los métodos de acá.
+    Un artículo nuevo puede traer 'html': con blobs (backend JSON) pasa a su
+    blob al agregarse y en el modelo queda solo la metadata.
+    """
+
+    def __init__(self, email: str, ideas: "UserIdeas"):
+        self.email = email
+        self.ideas = ideas
+        self.dirty = False
+        self.ops: List[Dict[str, Any]] = []
+        self.delta: Dict[str, int] = {}   # cambios en los agregados (ver _aplicar_delta_agregados)
+
+    def __len__(self) -> int:
+        return len(self.ideas)
+
+    def __iter__(self):
+        return iter(self.ideas)
+
+    def __contains__(self, keyword: str) -> bool:
+        return keyword in self.ideas
+
+    def _registrar(self, op: Dict[str, Any]) -> None:
+        self.dirty = True
+        self.ops.append(op)
+
+    def _sumar(self, campo: str, n: int = 1) -> None:
+        self.delta[campo] = self.delta.get(campo, 0) + n
+
+    def _sumar_articulos(self, articulos, signo: int) -> None:
+        for a in articulos:
+            if a.blob or a.html:
+                self._sumar("articulos", signo)
+                self._sumar(_estado_agregado(a.estado), signo)
+
+    def a_lista(self) -> list:
+        """Las ideas como lista de dicts (para backends que guardan todo)."""
+        return self.ideas.a_lista()
+
+    # --- API ---
+    def get(self, keyword: str) -> Optional[Idea]:
+        return self.ideas.get(keyword)
+
+    def get_or_create(self, keyword: str, titulo: Optional[str] = None) -> Idea:
+        """Devuelve la idea con esa keyword; si no existe, agrega una vacía."""
+        idea = self.ideas.get(keyword)
+        if idea is None:
+            idea = Idea.nueva(keyword, titulo)
+            self.ideas.poner(idea)
+            self._registrar({"op": "put", "idea": idea.a_dict()})
+            self._sumar("ideas")
+        return idea
+
+    def upsert(self, it: Dict[str, Any]) -> bool:
+        """
+        Fusiona una idea por keyword (misma regla que _merge_ideas_list:
+        reemplaza la idea y conserva sus artículos si la nueva no trae
+        'articulos'). Devuelve True si la keyword no existía.
+        """
+        if not isinstance(it, dict) or not _norm(it.get("keyword")):
+            return False
+        existing = self.ideas.get(it.get("keyword"))
+        conservar = bool(existing and existing.articulos) and not isinstance(it.get("articulos"), list)
+        incoming = dict(it)
+        if not conservar:
+            _ensure_article_compat(incoming)  # 'articulo' legacy -> lista
+        idea = Idea.desde_dict(incoming, self.ideas.blobs)
+        if conservar:
+            idea.articulos = list(existing.articulos)
+            _guardar_blobs_pendientes(idea.articulos)   # la op 'put' los referencia
+        self.ideas.poner(idea)
+        self._registrar({"op": "put", "idea": idea.a_dict()})
+        if existing is None:
+            self._sumar("ideas")
         else:
-            _ensure_article_compat(incoming)
-            idx[k] = incoming
+            self._sumar_articulos(existing.articulos, -1)
+        self._sumar_articulos(idea.articulos, 1)
+        return existing is None
 
-    return list(idx.values())
+    def remove(self, keyword: str) -> bool:
+        idea = self.ideas.quitar(keyword)
+        if idea is None:
+            return False
+        self._registrar({"op": "del", "keyword": keyword})
+        self._sumar("ideas", -1)
+        self._sumar_articulos(idea.articulos, -1)
+        return True
+
+    def add_articulo(self, keyword: str, articulo: Dict[str, Any]) -> Dict[str, Any]:
+        """Inserta el artículo como el más reciente de la idea (la crea si falta)."""
+        idea = self.get_or_create(keyword)
+        registro = self.ideas.articulo_desde_dict(articulo, idea)
+        if self.ideas.insertar_articulo(keyword, registro):
+            self._registrar({"op": "art", "keyword": keyword, "articulo": registro.a_dict()})
+            self._sumar_articulos((registro,), 1)
+        return articulo
+
+    def find_articulo(self, keyword: str, articulo_id: str) -> Optional[Articulo]:
+        e = self.ideas.articulo(keyword, articulo_id)
+        return e[1] if e else None
+
+    def set_estado(self, keyword: str, articulo_id: str, estado: str) -> bool:
+        updated_at = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+        previo = self.find_articulo(keyword, articulo_id)
+        if previo is None or not self.ideas.cambiar_estado(keyword, articulo_id, estado, updated_at):
+            return False
+        if previo.blob or previo.html:
+            self._sumar(_estado_agregado(previo.estado), -1)
+            self._sumar(_estado_agregado(estado), 1)
+        self._registrar({"op": "estado", "keyword": keyword, "id": articulo_id,
+                         "estado": estado, "updated_at": updated_at})
+        return True
+
+    def remove_articulo(self, keyword: str, articulo_id: str) -> bool:
+        previo = self.find_articulo(keyword, articulo_id)
+        if previo is None or not self.ideas.quitar_articulo(keyword, articulo_id):
+            return False
+        self._sumar_articulos((previo,), -1)
+        self._registrar({"op": "del_art", "keyword": keyword, "id": articulo_id})
+        return True
+
+
+@contextmanager
+def transaction(email: str):
+    """
+    Read-modify-write de las ideas de un usuario:
+
+        with storage.transaction(email) as tx:
+            tx.upsert(idea)
+
+    Carga una vez (de la cache si está vigente) y escribe una vez al salir,
+    solo si hubo cambios: normalmente anexando las ops al journal. Si el
+    bloque lanza una excepción no se escribe nada.
+    Todo el bloque corre con el lock exclusivo del usuario tomado, así dos
+    requests concurrentes (aun en procesos distintos) no se pisan cambios.
+    No anidar transacciones del mismo usuario: el lock no es reentrante.
+    """
+    with _lock_archivo(_ruta_json_usuario(email)):
+        estado = _estado_usuario(email)
+        tx = IdeasTransaction(email, estado.ideas.copia())
+        yield tx
+        if tx.dirty:
+            os.makedirs(IDEAS_DIR, exist_ok=True)
+            if not _commit(email, tx, estado):
+                raise OSError(f"No se pudieron guardar las ideas de {email}")
+            _aplicar_delta_agregados(email, tx.delta, tx.ideas)
 
 
 def guardar_ideas_usuario(email: str, ideas: list) -> None:
@@ -171,11 +1432,9 @@ def guardar_ideas_usuario(email: str, ideas: list) -> None:
     Guarda ideas fusionando por keyword (no sobreescribe a ciegas).
     - Si querés sobreescritura total, usá explícitamente _guardar_json_seguro.
     """
-    ruta = _ruta_json_usuario(email)
-    actuales = cargar_ideas_usuario(email)
-    fusionadas = _merge_ideas_list(actuales, ideas)
-    os.makedirs(IDEAS_DIR, exist_ok=True)
-    _guardar_json_seguro(ruta, fusionadas)
+    with transaction(email) as tx:
+        for it in ideas if isinstance(ideas, list) else []:
+            tx.upsert(it)
 
 
 def eliminar_idea_usuario(email: str, keyword: str) -> bool:
@@ -184,14 +1443,8 @@ def eliminar_idea_usuario(email: str, keyword: str) -> bool:
     No modifica el contador persistente de ideas generadas.
     """
     try:
-        ideas = cargar_ideas_usuario(email)
-        if not isinstance(ideas, list):
-            return False
-
-        norm_kw = (keyword or "").strip().lower()
-        nuevas = [i for i in ideas if (i.get("keyword") or "").strip().lower() != norm_kw]
-
-        guardar_ideas_usuario(email, nuevas)
+        with transaction(email) as tx:
+            tx.remove(keyword)
         return True
     except Exception as e:
         print("[storage] eliminar_idea_usuario error:", e)
@@ -200,20 +1453,13 @@ def eliminar_idea_usuario(email: str, keyword: str) -> bool:
 
 def contar_articulos_usuario(email: str) -> int:
     """
-    Cuenta artículos escritos para el usuario:
-    - Si existe lista 'articulos', cuenta items con 'html' no vacío.
-    - Si no, usa el campo legacy 'articulo' (1 si existe y no está vacío).
+    Cuenta artículos escritos para el usuario: items de 'articulos' con HTML
+    no vacío (los que tienen 'blob'). Solo mira el índice, nunca el HTML.
     """
-    ruta = _ruta_json_usuario(email)
-    ideas = _cargar_json_seguro(ruta)
     total = 0
     try:
-        for i in ideas:
-            if isinstance(i.get("articulos"), list):
-                total += sum(1 for a in i["articulos"] if a and (a.get("html") or "").strip())
-            else:
-                if (i.get("articulo") or "").strip():
-                    total += 1
+        for idea in _ideas_cacheadas(email):
+            total += sum(1 for a in idea.articulos if a.blob)
     except Exception as e:
         print(f"[WARN] contar_articulos_usuario: {e}")
     return total
@@ -222,109 +1468,270 @@ def contar_articulos_usuario(email: str) -> int:
 # ------------------------------------------------------
 # CONTADORES EN DB (SQLite)
 # ------------------------------------------------------
-def _ensure_counter_columns():
-    """Crea columnas de contadores si no existen (idempotente)."""
+# Todas las consultas van por db.conexion(): conexión reutilizada por thread,
+# WAL y sentencias preparadas cacheadas (ver db.py). Las columnas las crea
+# migraciones.py al arrancar.
+#
+# Cada incremento es un único UPDATE col = col + ?, atómico en SQLite: dos
+# workers sumando a la vez no se pisan. Con SCIDATA_COUNTER_FLUSH_MS > 0 los
+# incrementos se acumulan en memoria por (email, columna) y un thread de fondo
+# los escribe todos juntos en una transacción cada ese intervalo (y al salir
+# del proceso). Las lecturas suman lo pendiente, así que el usuario ve su
+# contador al día aunque todavía no esté en la base. Un kill -9 pierde como
+# mucho lo acumulado en el último intervalo.
+COUNTER_FLUSH_MS = int(os.environ.get("SCIDATA_COUNTER_FLUSH_MS", "0"))
+
+_contadores_pendientes: Dict[Tuple[str, str], int] = {}
+_contadores_lock = threading.Lock()
+_contadores_flusher: Optional[threading.Thread] = None
+
+
+def _escribir_contadores(deltas: Dict[Tuple[str, str], int]) -> None:
+    """Aplica {(email, columna): n} en una sola transacción, un UPDATE atómico por fila."""
+    por_columna: Dict[str, list] = {}
+    for (email, columna), n in deltas.items():
+        por_columna.setdefault(columna, []).append((n, email))
+    with db.transaccion(DB_PATH) as conn:
+        for columna, filas in por_columna.items():
+            conn.executemany(
+                f"UPDATE usuarios SET {columna} = COALESCE({columna}, 0) + ? WHERE email = ?", filas
+            )
+
+
+def flush_contadores() -> int:
+    """Escribe los incrementos acumulados. Devuelve cuántas filas tocó (0 si no había nada)."""
+    global _contadores_pendientes
+    with _contadores_lock:
+        pendientes, _contadores_pendientes = _contadores_pendientes, {}
+    if not pendientes:
+        return 0
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        try:
-            cur.execute("ALTER TABLE usuarios ADD COLUMN ideas_generadas INTEGER DEFAULT 0")
-        except Exception:
-            pass
-        try:
-            cur.execute("ALTER TABLE usuarios ADD COLUMN articulos_generados INTEGER DEFAULT 0")
-        except Exception:
-            pass
-        conn.commit()
+        _escribir_contadores(pendientes)
     except Exception as e:
-        print(f".[WARN] _ensure_counter_columns: {e}")
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+        print(f"[ERROR] flush_contadores: {e}")
+        with _contadores_lock:   # se reintentan en el próximo flush
+            for k, n in pendientes.items():
+                _contadores_pendientes[k] = _contadores_pendientes.get(k, 0) + n
+        return 0
+    return len(pendientes)
 
 
-def incrementar_articulos_generados(email: str) -> None:
-    """Incrementa el contador de artículos en usuarios.db (columna articulos_generados)."""
-    _ensure_counter_columns()
+def _loop_contadores() -> None:
+    while True:
+        time.sleep(COUNTER_FLUSH_MS / 1000)
+        flush_contadores()
+
+
+def _descartar_contadores_heredados() -> None:
+    # Un hijo de fork hereda el buffer del padre: lo escribe el padre, no el hijo
+    global _contadores_pendientes, _contadores_lock
+    _contadores_pendientes = {}
+    _contadores_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_contadores_heredados)
+atexit.register(flush_contadores)
+
+
+def _sumar_contador(email: str, columna: str, inc: int) -> None:
+    global _contadores_flusher
+    if COUNTER_FLUSH_MS <= 0:
+        _escribir_contadores({(email, columna): inc})
+        return
+    with _contadores_lock:
+        _contadores_pendientes[(email, columna)] = _contadores_pendientes.get((email, columna), 0) + inc
+        if _contadores_flusher is None or not _contadores_flusher.is_alive():
+            _contadores_flusher = threading.Thread(target=_loop_contadores, name="scidata-contadores", daemon=True)
+            _contadores_flusher.start()
+
+
+def _pendiente_contador(email: str, columna: str) -> int:
+    with _contadores_lock:
+        return _contadores_pendientes.get((email, columna), 0)
+
+
+def incrementar_articulos_generados(email: str, inc: int = 1) -> None:
+    """Suma inc al contador de artículos en usuarios.db (columna articulos_generados)."""
+    if inc <= 0:
+        return
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT articulos_generados FROM usuarios WHERE email = ?", (email,))
-        row = cur.fetchone()
-        if row is not None:
-            nuevo = (row[0] or 0) + 1
-            cur.execute("UPDATE usuarios SET articulos_generados = ? WHERE email = ?", (nuevo, email))
-            conn.commit()
+        _sumar_contador(email, "articulos_generados", int(inc))
     except Exception as e:
         print(f"[ERROR] incrementar_articulos_generados: {e}")
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
 def obtener_articulos_generados(email: str) -> int:
-    """Obtiene el contador de artículos generados desde usuarios.db."""
-    _ensure_counter_columns()
+    """Obtiene el contador de artículos generados desde usuarios.db (más lo pendiente)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT articulos_generados FROM usuarios WHERE email = ?", (email,))
-        row = cur.fetchone()
-        return row[0] if row else 0
+        with db.conexion(DB_PATH) as conn:
+            row = conn.execute("SELECT articulos_generados FROM usuarios WHERE email = ?", (email,)).fetchone()
+        return (row[0] or 0) + _pendiente_contador(email, "articulos_generados") if row else 0
     except Exception as e:
         print(f"[ERROR] obtener_articulos_generados: {e}")
         return 0
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
 def incrementar_ideas_generadas(email: str, inc: int = 1) -> None:
     """Suma inc al contador persistente de ideas (no decrece)."""
     if inc <= 0:
         return
-    _ensure_counter_columns()
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT ideas_generadas FROM usuarios WHERE email = ?", (email,))
-        row = cur.fetchone()
-        if row is not None:
-            nuevo = max(0, (row[0] or 0)) + int(inc)
-            cur.execute("UPDATE usuarios SET ideas_generadas = ? WHERE email = ?", (nuevo, email))
-            conn.commit()
+        _sumar_contador(email, "ideas_generadas", int(inc))
     except Exception as e:
         print(f"[ERROR] incrementar_ideas_generadas: {e}")
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
 def obtener_ideas_generadas(email: str) -> int:
-    """Devuelve el contador persistente de ideas (0 si no existe)."""
-    _ensure_counter_columns()
+    """Devuelve el contador persistente de ideas, más lo pendiente (0 si no existe)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT ideas_generadas FROM usuarios WHERE email = ?", (email,))
-        row = cur.fetchone()
-        return max(0, int(row[0])) if row and row[0] is not None else 0
+        with db.conexion(DB_PATH) as conn:
+            row = conn.execute("SELECT ideas_generadas FROM usuarios WHERE email = ?", (email,)).fetchone()
+        if not row:
+            return 0
+        return max(0, int(row[0] or 0)) + _pendiente_contador(email, "ideas_generadas")
     except Exception as e:
         print(f"[ERROR] obtener_ideas_generadas: {e}")
         return 0
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+
+
+# ------------------------------------------------------
+# AGREGADOS POR USUARIO (ideas, artículos, artículos por estado)
+# ------------------------------------------------------
+# Tabla agregados_usuario en usuarios.db, actualizada por deltas al cerrar
+# cada transacción (con el lock del usuario tomado, después de escribir las
+# ideas). /api/counters la lee en una sola consulta junto con los contadores
+# históricos de 'usuarios', sin recorrer el JSON. Si falta la fila, la lectura
+# cuenta en memoria sin guardar nada (el camino de lectura no escribe ni toma
+# el lock del usuario) y la arma completa la próxima transacción que cambie
+# algún agregado; fix_counters.py --all la rellena para todos. Si un corte
+# entre escribir las ideas y aplicar el delta la deja desfasada,
+# reconstruir_agregados la recalcula.
+# La tabla la crea migraciones.py (migración 4).
+_ESTADOS_AGREGADOS = ("borrador", "revisado", "publicado", "archivado")
+_CAMPOS_AGREGADOS = ("ideas", "articulos") + _ESTADOS_AGREGADOS
+
+
+def _ahora_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def _estado_agregado(estado: Optional[str]) -> str:
+    return estado if estado in _ESTADOS_AGREGADOS else "borrador"
+
+
+def _contar_agregados(ideas) -> Dict[str, int]:
+    """Agregados desde cero recorriendo un UserIdeas (reconstrucción y fila que falta)."""
+    agg = dict.fromkeys(_CAMPOS_AGREGADOS, 0)
+    for idea in ideas:
+        agg["ideas"] += 1
+        for a in idea.articulos:
+            if a.blob or a.html:
+                agg["articulos"] += 1
+                agg[_estado_agregado(a.estado)] += 1
+    return agg
+
+
+def _guardar_agregados(conn: sqlite3.Connection, email: str, agg: Dict[str, int]) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO agregados_usuario (email, %s, updated_at) VALUES (?, %s, ?)"
+        % (", ".join(_CAMPOS_AGREGADOS), ", ".join("?" * len(_CAMPOS_AGREGADOS))),
+        (email, *(int(agg.get(c, 0)) for c in _CAMPOS_AGREGADOS), _ahora_iso())
+    )
+
+
+def _aplicar_delta_agregados(email: str, delta: Dict[str, int], ideas: Optional["UserIdeas"] = None) -> None:
+    """
+    Suma el delta de una transacción a la fila del usuario. Si la fila todavía
+    no existe la arma completa desde 'ideas' (el estado ya con este cambio);
+    lo llama la transacción con el lock del usuario tomado.
+    """
+    cambios = [(c, delta[c]) for c in _CAMPOS_AGREGADOS if delta.get(c)]
+    if not cambios:
+        return
+    try:
+        with db.conexion(DB_PATH) as conn:
+            cur = conn.execute(
+                "UPDATE agregados_usuario SET %s, updated_at = ? WHERE email = ?"
+                % ", ".join(f"{c} = {c} + ?" for c, _ in cambios),
+                (*(n for _, n in cambios), _ahora_iso(), email)
+            )
+            if cur.rowcount == 0 and ideas is not None:
+                _guardar_agregados(conn, email, _contar_agregados(ideas))
+    except Exception as e:
+        print(f"[WARN] _aplicar_delta_agregados {email}: {e}")
+
+
+def reconstruir_agregados(email: str) -> Dict[str, int]:
+    """Recalcula desde el índice la fila de agregados del usuario y la guarda."""
+    with _lock_archivo(_ruta_json_usuario(email)):
+        agg = _contar_agregados(_estado_usuario(email).ideas)
+        with db.conexion(DB_PATH) as conn:
+            _guardar_agregados(conn, email, agg)
+    return agg
+
+
+def contar_agregados_usuario(email: str) -> Dict[str, int]:
+    """Agregados recalculados desde el índice, sin guardarlos (ver fix_counters.py --all)."""
+    return _contar_agregados(_estado_usuario(email).ideas)
+
+
+def guardar_agregados_lote(aggs: Dict[str, Dict[str, int]]) -> None:
+    """
+    Reemplaza las filas de agregados de muchos usuarios en una transacción.
+    No toma el lock de cada usuario: un delta que llegue entre el conteo y
+    esta escritura se pisa (lo corrige la próxima reconstrucción).
+    """
+    with db.transaccion(DB_PATH) as conn:
+        for email, agg in aggs.items():
+            _guardar_agregados(conn, email, agg)
+
+
+def listar_emails_usuarios() -> List[str]:
+    """Emails de la tabla usuarios más los que tienen ideas guardadas (ordenados, sin repetir)."""
+    emails = set()
+    try:
+        with db.conexion(DB_PATH) as conn:
+            emails.update(r[0] for r in conn.execute("SELECT email FROM usuarios") if r[0])
+            if STORAGE_BACKEND == "sqlite":
+                emails.update(r[0] for r in conn.execute("SELECT DISTINCT email FROM ideas"))
+    except Exception as e:
+        print(f"[WARN] listar_emails_usuarios (usuarios.db): {e}")
+    if os.path.isdir(IDEAS_DIR):
+        emails.update(_email_desde_ruta(n) for n in os.listdir(IDEAS_DIR) if n.endswith(".json"))
+    return sorted(emails)
+
+
+def obtener_resumen_usuario(email: str) -> Dict[str, int]:
+    """
+    Todos los contadores del usuario en una consulta: los históricos de
+    'usuarios' (ideas_generadas, articulos_generados, no decrecen) y los
+    agregados de lo guardado hoy (ideas, articulos y uno por estado).
+    """
+    res = dict.fromkeys(("ideas_generadas", "articulos_generados") + _CAMPOS_AGREGADOS, 0)
+    try:
+        with db.conexion(DB_PATH) as conn:
+            row = conn.execute(
+                "SELECT u.ideas_generadas, u.articulos_generados, a.%s "
+                "FROM (SELECT ? AS email) q "
+                "LEFT JOIN usuarios u ON u.email = q.email "
+                "LEFT JOIN agregados_usuario a ON a.email = q.email"
+                % ", a.".join(_CAMPOS_AGREGADOS),
+                (email,)
+            ).fetchone()
+    except Exception as e:
+        print(f"[ERROR] obtener_resumen_usuario: {e}")
+        return res
+
+    res["ideas_generadas"] = max(0, int(row[0] or 0)) + _pendiente_contador(email, "ideas_generadas")
+    res["articulos_generados"] = max(0, int(row[1] or 0)) + _pendiente_contador(email, "articulos_generados")
+    if row[2] is None:
+        # sin fila todavía: se cuenta en memoria y no se guarda (ver arriba)
+        agg = contar_agregados_usuario(email)
+    else:
+        agg = dict(zip(_CAMPOS_AGREGADOS, row[2:]))
+    res.update((c, int(agg.get(c) or 0)) for c in _CAMPOS_AGREGADOS)
+    return res
 
 
 # ------------------------------------------------------
@@ -338,43 +1745,18 @@ def guardar_articulo_usuario(email: str, keyword: str, articulo_html: str, titul
     Mantiene compat: idea['articulo'] = último HTML.
     """
     try:
-        ruta = _ruta_json_usuario(email)
-        ideas = cargar_ideas_usuario(email)
-
-        key_norm = _norm(keyword)
-        idea_ref = None
-        for i in ideas:
-            if _norm(i.get("keyword")) == key_norm:
-                idea_ref = i
-                break
-
-        if idea_ref is None:
-            idea_ref = {
-                "keyword": keyword,
-                "titulo": titulo or keyword,
-                "palabras_clave": [],
-                "h2_sugeridos": [],
-                "tips_seo": [],
-                "articulos": []
-            }
-            ideas.append(idea_ref)
-
-        _ensure_article_compat(idea_ref)
-
-        titulo_final = titulo or _extraer_titulo_de_html(articulo_html) or idea_ref.get("titulo") or keyword
-        nuevo = {
-            "id": str(int(time.time() * 1000)),
-            "titulo": titulo_final,
-            "preview": _preview(articulo_html),
-            "html": articulo_html or "",
-            "estado": "borrador",
-            "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-        }
-        idea_ref.setdefault("articulos", [])
-        idea_ref["articulos"].insert(0, nuevo)
-        idea_ref["articulo"] = articulo_html or ""
-
-        return _guardar_json_seguro(ruta, ideas)
+        with transaction(email) as tx:
+            idea_ref = tx.get_or_create(keyword, titulo=titulo)
+            titulo_final = titulo or _extraer_titulo_de_html(articulo_html) or idea_ref.titulo or keyword
+            tx.add_articulo(keyword, {
+                "id": str(int(time.time() * 1000)),
+                "titulo": titulo_final,
+                "preview": _preview(articulo_html),
+                "html": articulo_html or "",
+                "estado": "borrador",
+                "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            })
+        return True
     except Exception as e:
         print(f"[ERROR] guardar_articulo_usuario: {e}")
         return False
@@ -386,39 +1768,13 @@ def append_articulo_usuario(email: str, keyword: str, html: str, estado: str = "
     Devuelve el artículo creado.
     """
     try:
-        ruta = _ruta_json_usuario(email)
-        ideas = cargar_ideas_usuario(email)
-
-        idea = None
-        for i in ideas:
-            if _norm(i.get("keyword")) == _norm(keyword):
-                idea = i
-                break
-
-        if not idea:
-            idea = {
-                "keyword": keyword,
-                "titulo": keyword,
-                "palabras_clave": [],
-                "h2_sugeridos": [],
-                "tips_seo": [],
-                "articulos": []
-            }
-            ideas.append(idea)
-
-        _ensure_article_compat(idea)
-
-        articulo = {
-            "id": str(uuid.uuid4()),
-            "html": html or "",
-            "estado": estado or "borrador",
-            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z"
-        }
-        idea.setdefault("articulos", [])
-        idea["articulos"].insert(0, articulo)
-        idea["articulo"] = html or ""
-
-        _guardar_json_seguro(ruta, ideas)
+        with transaction(email) as tx:
+            articulo = tx.add_articulo(keyword, {
+                "id": str(uuid.uuid4()),
+                "html": html or "",
+                "estado": estado or "borrador",
+                "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z"
+            })
         return articulo
     except Exception as e:
         print(f"[ERROR] append_articulo_usuario: {e}")
@@ -434,25 +1790,10 @@ def update_estado_articulo(email: str, keyword: str, articulo_id: str, estado: s
     if not (email and keyword and articulo_id and estado in ESTADOS_VALIDOS):
         return False
     try:
-        ruta = _ruta_json_usuario(email)
-        ideas = cargar_ideas_usuario(email)
-        updated = False
-
-        for idea in ideas:
-            if _norm(idea.get("keyword")) != _norm(keyword):
-                continue
-            arts = idea.get("articulos") or []
-            for a in arts:
-                if a.get("id") == articulo_id:
-                    a["estado"] = estado
-                    a["updated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
-                    updated = True
-                    break
-            break
-
-        if updated:
-            return _guardar_json_seguro(ruta, ideas)
-        return False
+        with transaction(email) as tx:
+            if not tx.set_estado(keyword, articulo_id, estado):
+                return False
+        return True
     except Exception as e:
         print(f"[ERROR] update_estado_articulo: {e}")
         return False
@@ -461,22 +1802,9 @@ def update_estado_articulo(email: str, keyword: str, articulo_id: str, estado: s
 def eliminar_articulo_usuario(email: str, keyword: str, articulo_id: str) -> bool:
     """Elimina un artículo individual (por id) dentro de una idea (por keyword)."""
     try:
-        ruta = _ruta_json_usuario(email)
-        ideas = cargar_ideas_usuario(email)
-        changed = False
-
-        for idea in ideas:
-            if _norm(idea.get("keyword")) != _norm(keyword):
-                continue
-            arts = idea.get("articulos") or []
-            new_arts = [a for a in arts if a.get("id") != articulo_id]
-            if len(new_arts) != len(arts):
-                idea["articulos"] = new_arts
-                idea["articulo"] = new_arts[0].get("html", "") if new_arts else ""
-                changed = True
-            break
-
-        return _guardar_json_seguro(ruta, ideas) if changed else False
+        with transaction(email) as tx:
+            changed = tx.remove_articulo(keyword, articulo_id)
+        return changed
     except Exception as e:
         print(f"[ERROR] eliminar_articulo_usuario: {e}")
         return False
@@ -485,47 +1813,33 @@ def eliminar_articulo_usuario(email: str, keyword: str, articulo_id: str) -> boo
 # ------------------------------------------------------
 # IDEAS: API de acumulación
 # ------------------------------------------------------
-def agregar_ideas_usuario(email: str, nuevas_ideas: list) -> bool:
+def agregar_ideas_usuario(email: str, nuevas_ideas: list) -> Optional[int]:
     """
     Agrega/mergea ideas para el usuario fusionando por 'keyword' (case-insensitive).
     - Si una keyword ya existe, la reemplaza (conserva 'articulos' si la nueva no los trae).
     - Si es nueva, la agrega.
     - Actualiza el contador persistente de ideas solo por las realmente NUEVAS.
+    Devuelve cuántas ideas nuevas agregó (0 si todas ya estaban) o None si no
+    se pudo guardar.
     """
     try:
-        actuales = cargar_ideas_usuario(email)
-        actuales_idx = {_norm(i.get("keyword")): i for i in actuales if isinstance(i, dict)}
-
-        nuevas_ideas = nuevas_ideas if isinstance(nuevas_ideas, list) else []
-        nuevas_idx = {}
-        nuevas_claves_norm = []
-
-        for idea in nuevas_ideas:
-            if not isinstance(idea, dict):
-                continue
-            k = _norm(idea.get("keyword"))
-            if not k:
-                continue
-            nuevas_idx[k] = idea
-            nuevas_claves_norm.append(k)
-
-        # Contar cuántas son realmente nuevas
-        realmente_nuevas = [k for k in nuevas_claves_norm if k not in actuales_idx]
-
-        fusionadas = _merge_ideas_list(actuales, list(nuevas_idx.values()))
-        guardar_ideas_usuario(email, fusionadas)  # usa merge interno también
+        realmente_nuevas = 0
+        with transaction(email) as tx:
+            for idea in nuevas_ideas if isinstance(nuevas_ideas, list) else []:
+                if isinstance(idea, dict) and tx.upsert(idea):
+                    realmente_nuevas += 1
 
         # contador persistente de ideas +N
         try:
             if realmente_nuevas:
-                incrementar_ideas_generadas(email, inc=len(realmente_nuevas))
+                incrementar_ideas_generadas(email, inc=realmente_nuevas)
         except Exception:
             pass
 
-        return True
+        return realmente_nuevas
     except Exception as e:
         print("[storage] agregar_ideas_usuario error:", e)
-        return False
+        return None
 
 
 # --- Setters explícitos para contadores históricos (opcional) ---
@@ -543,26 +1857,56 @@ def _cargar_contadores() -> Dict[str, Any]:
 
 
 def _guardar_contadores(base: Dict[str, Any]) -> None:
-    p = _counters_path()
-    with open(p, "w", encoding="utf-8") as f:
-        json.dump(base, f, ensure_ascii=False, indent=2)
+    if not _guardar_json_seguro(_counters_path(), base):
+        raise OSError("No se pudo guardar data/counters.json")
+
+
+def set_contadores_lote(valores: Dict[str, Dict[str, int]]) -> None:
+    """
+    Setea contadores históricos de muchos usuarios con una sola lectura y
+    escritura de data/counters.json: valores = {email: {"ideas_generadas": n, ...}}.
+    """
+    if not valores:
+        return
+    with _lock_archivo(_counters_path()):
+        base = _cargar_contadores()
+        by_user = base.get("by_user", {})
+        for email, campos in valores.items():
+            u = by_user.get(email, {})
+            u.update((k, max(0, int(v))) for k, v in campos.items())
+            by_user[email] = u
+        base["by_user"] = by_user
+        _guardar_contadores(base)
 
 
 def set_ideas_generadas(email: str, valor: int) -> None:
-    base = _cargar_contadores()
-    by_user = base.get("by_user", {})
-    u = by_user.get(email, {})
-    u["ideas_generadas"] = max(0, int(valor))
-    by_user[email] = u
-    base["by_user"] = by_user
-    _guardar_contadores(base)
+    set_contadores_lote({email: {"ideas_generadas": valor}})
 
 
 def set_articulos_generados(email: str, valor: int) -> None:
-    base = _cargar_contadores()
-    by_user = base.get("by_user", {})
-    u = by_user.get(email, {})
-    u["articulos_generados"] = max(0, int(valor))
-    by_user[email] = u
-    base["by_user"] = by_user
-    _guardar_contadores(base)
\ No newline at end of file
+    set_contadores_lote({email: {"articulos_generados": valor}})
+
+
+# ------------------------------------------------------
+# BACKEND SQLITE (opcional, SCIDATA_STORAGE_BACKEND=sqlite)
+# ------------------------------------------------------
+# Reemplaza la API pública de ideas/artículos por la de storage_sqlite; los
+# contadores y helpers de este módulo se siguen usando tal cual.
+if STORAGE_BACKEND == "sqlite":
+    from storage_sqlite import (  # noqa: E402,F401
+        transaction,
+        cargar_ideas_usuario,
+        listar_ideas_usuario,
+        obtener_articulo_usuario,
+        contar_ideas_usuario,
+        reconstruir_agregados,
+        contar_agregados_usuario,
+        guardar_ideas_usuario,
+        eliminar_idea_usuario,
+        contar_articulos_usuario,
+        guardar_articulo_usuario,
+        append_articulo_usuario,
+        update_estado_articulo,
+        eliminar_articulo_usuario,
+        agregar_ideas_usuario,
+    )
@@ -0,0 +1,506 @@
+# -*- coding: utf-8 -*-
+"""
+Backend SQLite para ideas y artículos (SCIDATA_STORAGE_BACKEND=sqlite).
+
+Implementa la misma API pública de ideas/artículos que storage.py, pero con
+tablas en data/usuarios.db en lugar de un JSON por usuario. Cambiar el estado
+de un artículo o borrarlo es un UPDATE/DELETE de una fila, no una reescritura
+del archivo entero.
+
+Importar los JSON existentes:
+    python storage_sqlite.py --importar
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
+
+import db
+import migraciones
+import storage
+from storage import _norm, _preview, _extraer_titulo_de_html, ESTADOS_VALIDOS
+
+# Campos con columna propia; el resto de las claves viaja en 'extra' (JSON)
+_CAMPOS_IDEA = ("keyword", "titulo", "palabras_clave", "h2_sugeridos", "tips_seo")
+_CAMPOS_ARTICULO = ("id", "titulo", "preview", "html", "estado", "created_at", "updated_at")
+
+
+# ------------------------------------------------------
+# CONEXIÓN (las tablas las crea migraciones.py, migración 5)
+# ------------------------------------------------------
+def _conectar():
+    """Conexión del pool de db.py (autocommit; no cerrarla)."""
+    return db.conexion(storage.DB_PATH)
+
+
+@contextmanager
+def _tx_sql(email: Optional[str] = None, immediate: bool = True):
+    """
+    BEGIN [IMMEDIATE] ... COMMIT; ROLLBACK si el bloque falla. Con 'email',
+    antes del COMMIT recalcula la fila de agregados_usuario de ese usuario,
+    así queda siempre consistente con sus ideas/artículos.
+    """
+    with db.transaccion(storage.DB_PATH, immediate=immediate) as conn:
+        yield conn
+        if email is not None:
+            _recalcular_agregados(conn, email)
+
+
+def _contar_agregados_sql(conn: sqlite3.Connection, email: str) -> Dict[str, int]:
+    """Agregados del usuario con dos COUNT sobre los índices por email."""
+    agg = dict.fromkeys(storage._CAMPOS_AGREGADOS, 0)
+    agg["ideas"] = conn.execute("SELECT COUNT(*) FROM ideas WHERE email = ?", (email,)).fetchone()[0]
+    for estado, n in conn.execute(
+        "SELECT estado, COUNT(*) FROM articulos WHERE email = ? AND TRIM(html) <> '' GROUP BY estado", (email,)
+    ):
+        agg["articulos"] += n
+        agg[storage._estado_agregado(estado)] += n
+    return agg
+
+
+def _recalcular_agregados(conn: sqlite3.Connection, email: str) -> Dict[str, int]:
+    """Recuenta y guarda la fila de agregados (solo al escribir, dentro de la transacción)."""
+    agg = _contar_agregados_sql(conn, email)
+    storage._guardar_agregados(conn, email, agg)
+    return agg
+
+
+def _ahora() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+# ------------------------------------------------------
+# FILAS <-> DICTS
+# ------------------------------------------------------
+def _extra(d: Dict[str, Any], conocidos) -> str:
+    resto = {k: v for k, v in d.items() if k not in conocidos and k not in ("articulos", "articulo")}
+    return json.dumps(resto, ensure_ascii=False) if resto else "{}"
+
+
+def _lista(v) -> str:
+    return json.dumps(list(v) if isinstance(v, list) else [], ensure_ascii=False)
+
+
+def _idea_desde_fila(row) -> Dict[str, Any]:
+    _id, keyword, titulo, pc, h2, tips, extra = row
+    idea = json.loads(extra or "{}")
+    idea.update({
+        "keyword": keyword,
+        "titulo": titulo,
+        "palabras_clave": json.loads(pc or "[]"),
+        "h2_sugeridos": json.loads(h2 or "[]"),
+        "tips_seo": json.loads(tips or "[]"),
+        "articulos": [],
+    })
+    return idea
+
+
+def _articulo_desde_fila(row) -> Dict[str, Any]:
+    art = json.loads(row[-1] or "{}")
+    for campo, valor in zip(_CAMPOS_ARTICULO, row[:-1]):
+        if valor is not None:
+            art[campo] = valor
+    return art
+
+
+def _leer_ideas(conn: sqlite3.Connection, email: str, offset: int = 0,
+                limit: Optional[int] = None, con_html: bool = True) -> List[Dict[str, Any]]:
+    """
+    Ideas del usuario en orden de inserción, artículos del más nuevo al más viejo.
+    Con 'limit', una página de la idea más nueva a la más vieja. Con
+    con_html=False los artículos vienen sin 'html' (y sin 'articulo' legacy).
+    """
+    por_id: Dict[int, Dict[str, Any]] = {}
+    ideas = []
+    sql = ("SELECT id, keyword, titulo, palabras_clave, h2_sugeridos, tips_seo, extra "
+           "FROM ideas WHERE email = ? ")
+    if limit is None:
+        filas = conn.execute(sql + "ORDER BY posicion", (email,))
+    else:
+        filas = conn.execute(sql + "ORDER BY posicion DESC LIMIT ? OFFSET ?", (email, limit, offset))
+    for row in filas:
+        idea = _idea_desde_fila(row)
+        por_id[row[0]] = idea
+        ideas.append(idea)
+    if not ideas:
+        return ideas
+
+    sql = ("SELECT idea_id, id, titulo, preview, %s, estado, created_at, updated_at, extra "
+           "FROM articulos WHERE email = ? ") % ("html" if con_html else "NULL")
+    if limit is None:
+        filas = conn.execute(sql + "ORDER BY idea_id, orden DESC", (email,))
+    else:
+        marcas = ",".join("?" * len(por_id))
+        filas = conn.execute(sql + f"AND idea_id IN ({marcas}) ORDER BY idea_id, orden DESC",
+                             (email, *por_id))
+    for row in filas:
+        idea = por_id.get(row[0])
+        if idea is not None:
+            idea["articulos"].append(_articulo_desde_fila(row[1:]))
+
+    for idea in ideas if con_html else []:
+        # compat: 'articulo' = HTML del último artículo
+        idea["articulo"] = idea["articulos"][0].get("html", "") if idea["articulos"] else ""
+    return ideas
+
+
+def _insertar_articulo(conn, email: str, idea_id: int, art: Dict[str, Any], orden: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO articulos "
+        "(id, email, idea_id, orden, titulo, preview, html, estado, created_at, updated_at, extra) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (str(art.get("id") or uuid.uuid4()), email, idea_id, orden,
+         # como el índice JSON: sin titulo/preview se sacan del HTML (el dashboard no trae el cuerpo)
+         art.get("titulo") or _extraer_titulo_de_html(art.get("html") or "") or None,
+         art["preview"] if "preview" in art else _preview(art.get("html") or ""),
+         art.get("html") or "",
+         art.get("estado") or "borrador", art.get("created_at"), art.get("updated_at"),
+         _extra(art, _CAMPOS_ARTICULO))
+    )
+
+
+def _reemplazar_articulos(conn, email: str, idea_id: int, articulos: list) -> None:
+    conn.execute("DELETE FROM articulos WHERE idea_id = ?", (idea_id,))
+    n = len(articulos)
+    for pos, art in enumerate(articulos):
+        if isinstance(art, dict):
+            _insertar_articulo(conn, email, idea_id, art, n - pos)
+
+
+def _id_idea(conn, email: str, keyword: str) -> Optional[int]:
+    row = conn.execute(
+        "SELECT id FROM ideas WHERE email = ? AND keyword_norm = ?", (email, _norm(keyword))
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _upsert_idea(conn, email: str, it: Dict[str, Any]) -> bool:
+    """
+    Misma regla de fusión que storage._fusionar_idea: reemplaza los campos de
+    la idea y solo pisa los artículos si la nueva trae la lista 'articulos'.
+    Devuelve True si la keyword no existía.
+    """
+    k = _norm(it.get("keyword"))
+    if not k:
+        return False
+    incoming = dict(it)
+    idea_id = _id_idea(conn, email, k)
+    nueva = idea_id is None
+    if nueva and "articulos" not in incoming:
+        storage._ensure_article_compat(incoming)  # legacy 'articulo' -> lista
+
+    valores = (
+        str(incoming.get("keyword")), incoming.get("titulo") or "",
+        _lista(incoming.get("palabras_clave")), _lista(incoming.get("h2_sugeridos")),
+        _lista(incoming.get("tips_seo")), _extra(incoming, _CAMPOS_IDEA),
+    )
+    if nueva:
+        pos = conn.execute(
+            "SELECT COALESCE(MAX(posicion), 0) + 1 FROM ideas WHERE email = ?", (email,)
+        ).fetchone()[0]
+        cur = conn.execute(
+            "INSERT INTO ideas (keyword, titulo, palabras_clave, h2_sugeridos, tips_seo, extra, "
+            "email, keyword_norm, posicion) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            valores + (email, k, pos)
+        )
+        idea_id = cur.lastrowid
+    else:
+        conn.execute(
+            "UPDATE ideas SET keyword = ?, titulo = ?, palabras_clave = ?, h2_sugeridos = ?, "
+            "tips_seo = ?, extra = ? WHERE id = ?",
+            valores + (idea_id,)
+        )
+
+    if isinstance(incoming.get("articulos"), list):
+        _reemplazar_articulos(conn, email, idea_id, incoming["articulos"])
+    return nueva
+
+
+def _guardar_todo(conn, email: str, ideas: list) -> None:
+    """Reemplaza todas las ideas/artículos del usuario (importador)."""
+    conn.execute("DELETE FROM articulos WHERE email = ?", (email,))
+    conn.execute("DELETE FROM ideas WHERE email = ?", (email,))
+    for it in ideas:
+        if isinstance(it, dict):
+            _upsert_idea(conn, email, it)
+
+
+def _borrar_idea(conn, email: str, keyword: str) -> None:
+    conn.execute("DELETE FROM articulos WHERE email = ? AND idea_id IN "
+                 "(SELECT id FROM ideas WHERE email = ? AND keyword_norm = ?)",
+                 (email, email, _norm(keyword)))
+    conn.execute("DELETE FROM ideas WHERE email = ? AND keyword_norm = ?", (email, _norm(keyword)))
+
+
+def _cambiar_estado(conn, email: str, keyword: str, articulo_id: str, estado: str,
+                    updated_at: Optional[str] = None) -> bool:
+    cur = conn.execute(
+        "UPDATE articulos SET estado = ?, updated_at = ? WHERE id = ? AND email = ? "
+        "AND idea_id = (SELECT id FROM ideas WHERE email = ? AND keyword_norm = ?)",
+        (estado, updated_at or _ahora(), articulo_id, email, email, _norm(keyword))
+    )
+    return cur.rowcount > 0
+
+
+def _borrar_articulo(conn, email: str, keyword: str, articulo_id: str) -> bool:
+    cur = conn.execute(
+        "DELETE FROM articulos WHERE id = ? AND email = ? "
+        "AND idea_id = (SELECT id FROM ideas WHERE email = ? AND keyword_norm = ?)",
+        (articulo_id, email, email, _norm(keyword))
+    )
+    return cur.rowcount > 0
+
+
+def _aplicar_ops(conn, email: str, ops: list) -> None:
+    """
+    Escribe solo lo que cambió en una transacción, a partir de sus ops (las
+    mismas que el backend JSON anexa al journal): cada una toca la idea o el
+    artículo afectado, no todas las filas del usuario.
+    """
+    for op in ops:
+        tipo = op.get("op")
+        if tipo == "put" and isinstance(op.get("idea"), dict):
+            _upsert_idea(conn, email, op["idea"])
+        elif tipo == "del":
+            _borrar_idea(conn, email, op.get("keyword"))
+        elif tipo == "art" and isinstance(op.get("articulo"), dict):
+            _agregar_articulo(conn, email, op.get("keyword"), op["articulo"])
+        elif tipo == "estado":
+            _cambiar_estado(conn, email, op.get("keyword"), op.get("id"), op.get("estado"), op.get("updated_at"))
+        elif tipo == "del_art":
+            _borrar_articulo(conn, email, op.get("keyword"), op.get("id"))
+
+
+def _idea_para_articulo(conn, email: str, keyword: str, titulo: Optional[str] = None) -> int:
+    idea_id = _id_idea(conn, email, keyword)
+    if idea_id is None:
+        _upsert_idea(conn, email, {
+            "keyword": keyword,
+            "titulo": titulo or keyword,
+            "palabras_clave": [],
+            "h2_sugeridos": [],
+            "tips_seo": [],
+        })
+        idea_id = _id_idea(conn, email, keyword)
+    return idea_id
+
+
+def _agregar_articulo(conn, email: str, keyword: str, articulo: Dict[str, Any],
+                      titulo: Optional[str] = None) -> Dict[str, Any]:
+    idea_id = _idea_para_articulo(conn, email, keyword, titulo)
+    orden = conn.execute(
+        "SELECT COALESCE(MAX(orden), 0) + 1 FROM articulos WHERE idea_id = ?", (idea_id,)
+    ).fetchone()[0]
+    _insertar_articulo(conn, email, idea_id, articulo, orden)
+    return articulo
+
+
+# ------------------------------------------------------
+# API PÚBLICA (misma firma que storage.py)
+# ------------------------------------------------------
+@contextmanager
+def transaction(email: str):
+    """
+    Igual que storage.transaction: vista IdeasTransaction, una escritura al
+    salir con solo las filas que cambiaron (_aplicar_ops). Corre dentro de
+    BEGIN IMMEDIATE, así que serializa con otros writers.
+    """
+    with _tx_sql(email) as conn:
+        tx = storage.IdeasTransaction(email, storage.UserIdeas.desde_lista(_leer_ideas(conn, email), blobs=False))
+        yield tx
+        if tx.dirty:
+            _aplicar_ops(conn, email, tx.ops)
+
+
+def cargar_ideas_usuario(email: str) -> list:
+    with _conectar() as conn:
+        return _leer_ideas(conn, email)
+
+
+def listar_ideas_usuario(email: str, offset: int = 0, limit: int = 20) -> Tuple[list, int]:
+    with _conectar() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM ideas WHERE email = ?", (email,)).fetchone()[0]
+        return _leer_ideas(conn, email, offset, limit, con_html=False), int(total)
+
+
+def obtener_articulo_usuario(email: str, articulo_id: str) -> Optional[Dict[str, Any]]:
+    with _conectar() as conn:
+        row = conn.execute(
+            "SELECT i.keyword, a.id, a.titulo, a.preview, a.html, a.estado, a.created_at, a.updated_at, a.extra "
+            "FROM articulos a JOIN ideas i ON i.id = a.idea_id WHERE a.email = ? AND a.id = ?",
+            (email, articulo_id)
+        ).fetchone()
+        if row is None:
+            return None
+        art = _articulo_desde_fila(row[1:])
+        art["keyword"] = row[0]
+        return art
+
+
+def reconstruir_agregados(email: str) -> Dict[str, int]:
+    with _tx_sql() as conn:
+        return _recalcular_agregados(conn, email)
+
+
+def contar_agregados_usuario(email: str) -> Dict[str, int]:
+    with _conectar() as conn:
+        return _contar_agregados_sql(conn, email)
+
+
+def contar_ideas_usuario(email: str) -> int:
+    with _conectar() as conn:
+        return int(conn.execute("SELECT COUNT(*) FROM ideas WHERE email = ?", (email,)).fetchone()[0])
+
+
+def guardar_ideas_usuario(email: str, ideas: list) -> None:
+    with _tx_sql(email) as conn:
+        for it in ideas if isinstance(ideas, list) else []:
+            if isinstance(it, dict):
+                _upsert_idea(conn, email, it)
+
+
+def eliminar_idea_usuario(email: str, keyword: str) -> bool:
+    try:
+        with _tx_sql(email) as conn:
+            _borrar_idea(conn, email, keyword)
+        return True
+    except Exception as e:
+        print("[storage_sqlite] eliminar_idea_usuario error:", e)
+        return False
+
+
+def contar_articulos_usuario(email: str) -> int:
+    try:
+        with _conectar() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM articulos WHERE email = ? AND TRIM(html) <> ''", (email,)
+            ).fetchone()
+        return int(row[0] or 0)
+    except Exception as e:
+        print(f"[WARN] contar_articulos_usuario: {e}")
+        return 0
+
+
+def guardar_articulo_usuario(email: str, keyword: str, articulo_html: str, titulo: Optional[str] = None) -> bool:
+    try:
+        with _tx_sql(email) as conn:
+            _agregar_articulo(conn, email, keyword, {
+                "id": str(int(time.time() * 1000)),
+                "titulo": titulo or _extraer_titulo_de_html(articulo_html) or keyword,
+                "preview": _preview(articulo_html),
+                "html": articulo_html or "",
+                "estado": "borrador",
+                "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            }, titulo=titulo)
+        return True
+    except Exception as e:
+        print(f"[ERROR] guardar_articulo_usuario: {e}")
+        return False
+
+
+def append_articulo_usuario(email: str, keyword: str, html: str, estado: str = "borrador"):
+    try:
+        articulo = {
+            "id": str(uuid.uuid4()),
+            "html": html or "",
+            "estado": estado or "borrador",
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z"
+        }
+        with _tx_sql(email) as conn:
+            _agregar_articulo(conn, email, keyword, articulo)
+        return articulo
+    except Exception as e:
+        print(f"[ERROR] append_articulo_usuario: {e}")
+        return None
+
+
+def update_estado_articulo(email: str, keyword: str, articulo_id: str, estado: str) -> bool:
+    """Un solo UPDATE sobre la fila del artículo."""
+    if not (email and keyword and articulo_id and estado in ESTADOS_VALIDOS):
+        return False
+    try:
+        with _tx_sql(email) as conn:
+            return _cambiar_estado(conn, email, keyword, articulo_id, estado)
+    except Exception as e:
+        print(f"[ERROR] update_estado_articulo: {e}")
+        return False
+
+
+def eliminar_articulo_usuario(email: str, keyword: str, articulo_id: str) -> bool:
+    try:
+        with _tx_sql(email) as conn:
+            return _borrar_articulo(conn, email, keyword, articulo_id)
+    except Exception as e:
+        print(f"[ERROR] eliminar_articulo_usuario: {e}")
+        return False
+
+
+def agregar_ideas_usuario(email: str, nuevas_ideas: list) -> Optional[int]:
+    """Como storage.agregar_ideas_usuario: cuántas ideas nuevas agregó, o None si falló."""
+    try:
+        realmente_nuevas = 0
+        with _tx_sql(email) as conn:
+            for idea in nuevas_ideas if isinstance(nuevas_ideas, list) else []:
+                if isinstance(idea, dict) and _upsert_idea(conn, email, idea):
+                    realmente_nuevas += 1
+
+        try:
+            if realmente_nuevas:
+                storage.incrementar_ideas_generadas(email, inc=realmente_nuevas)
+        except Exception:
+            pass
+        return realmente_nuevas
+    except Exception as e:
+        print("[storage_sqlite] agregar_ideas_usuario error:", e)
+        return None
+
+
+# ------------------------------------------------------
+# IMPORTADOR DESDE LOS JSON POR USUARIO
+# ------------------------------------------------------
+def importar_desde_json(ideas_dir: Optional[str] = None) -> Dict[str, int]:
+    """
+    Copia cada data/ideas/<usuario>.json a las tablas (reemplaza lo que hubiera
+    para ese usuario). Acepta archivos legacy y v2. Idempotente.
+    """
+    ideas_dir = ideas_dir or storage.IDEAS_DIR
+    res = {"usuarios": 0, "ideas": 0, "articulos": 0, "errores": 0}
+    for nombre in sorted(os.listdir(ideas_dir)):
+        if not nombre.endswith(".json"):
+            continue
+        ruta = os.path.join(ideas_dir, nombre)
+        email = storage._email_desde_ruta(ruta)
+        try:
+            ideas = storage._ideas_completas_archivo(ruta)
+            with _tx_sql(email) as conn:
+                _guardar_todo(conn, email, ideas)
+            res["usuarios"] += 1
+            res["ideas"] += len(ideas)
+            res["articulos"] += sum(len(i.get("articulos") or []) for i in ideas if isinstance(i, dict))
+        except Exception as e:
+            print(f"[ERROR] importar {ruta}: {e}")
+            res["errores"] += 1
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Backend SQLite de ideas/artículos")
+    ap.add_argument("--importar", action="store_true", help="Importar data/ideas/*.json a la base")
+    args = ap.parse_args()
+
+    if args.importar:
+        migraciones.aplicar_migraciones()
+        res = importar_desde_json()
+        print(f"[OK] {res['usuarios']} usuarios, {res['ideas']} ideas, "
+              f"{res['articulos']} artículos importados ({res['errores']} errores)")
+    else:
+        print("Usá --importar.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# stress_storage.py
+# Prueba de carga del storage JSON con varios procesos escribiendo a la vez
+# sobre el mismo usuario. Verifica que no se pierda ningún artículo y que el
+# archivo quede siempre parseable.
+# Uso:
+#   python stress_storage.py [--procesos 8] [--articulos 50] [--keywords 3]
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+EMAIL = "stress@scidata.test"
+
+
+def _worker(base_dir: str, n: int, articulos: int, keywords: int) -> list:
+    # storage usa rutas relativas a data/: importarlo recién después del chdir
+    os.chdir(base_dir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import storage
+
+    ids = []
+    for j in range(articulos):
+        kw = f"keyword {j % keywords}"
+        art = storage.append_articulo_usuario(EMAIL, kw, f"<article><h1>p{n} a{j}</h1></article>")
+        if art:
+            ids.append(art["id"])
+    return ids
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--procesos", type=int, default=8)
+    ap.add_argument("--articulos", type=int, default=50, help="Artículos por proceso")
+    ap.add_argument("--keywords", type=int, default=3, help="Ideas distintas sobre las que se reparten")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="scidata-stress-") as base_dir:
+        # schema de usuarios.db (contadores y agregados) antes de arrancar los workers
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.chdir(base_dir)
+        import migraciones
+        migraciones.aplicar_migraciones()
+
+        t0 = time.perf_counter()
+        with multiprocessing.Pool(args.procesos) as pool:
+            res = pool.starmap(_worker, [(base_dir, n, args.articulos, args.keywords) for n in range(args.procesos)])
+        dt = time.perf_counter() - t0
+
+        import storage
+
+        esperados = {i for ids in res for i in ids}
+        ideas = storage.cargar_ideas_usuario(EMAIL)
+        guardados = {a["id"] for i in ideas for a in i.get("articulos") or []}
+
+        total = args.procesos * args.articulos
+        perdidos = esperados - guardados
+        print(f"{args.procesos} procesos x {args.articulos} artículos = {total} escrituras en {dt:.2f}s "
+              f"({total / dt:.0f} escrituras/s)")
+        print(f"confirmados={len(esperados)} guardados={len(guardados)} ideas={len(ideas)} perdidos={len(perdidos)}")
+
+        if len(esperados) != total or perdidos or len(ideas) != min(args.keywords, args.articulos):
+            print("[FAIL] Se perdieron escrituras")
+            sys.exit(1)
+        print("[OK] Ningún artículo perdido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# stub_openai.py
+# Servidor local que imita POST /v1/chat/completions de la API de OpenAI
+# (con y sin stream=True) para probar y medir ideas.py sin red ni costo.
+# Responde con contenido armado a partir del prompt, con la misma forma que
+# el modelo real:
+#   - ideas de una keyword -> array JSON (a veces dentro de ```json ... ```)
+#   - ideas en lote        -> objeto JSON por keyword (a veces le falta alguna)
+#   - artículo             -> <article> HTML (a veces dentro de ```html ... ```)
+# Latencia, errores HTTP, respuestas rotas y cortes de stream son
+# configurables y salen de un RNG con semilla, para poder repetir corridas.
+#
+# Uso:
+#   python stub_openai.py [--puerto 8765] [--latencia lognormal:0.8,0.4]
+#                         [--chunk-ms 20] [--errores 0.05] [--rotas 0.02] [--semilla 1]
+#   OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python app.py
+#
+# Latencias: fija:S | uniforme:A,B | normal:MEDIA,DESVIO | exp:MEDIA |
+#            lognormal:MEDIANA,SIGMA  (segundos hasta el primer fragmento).
+# Después cada fragmento de ~40 caracteres tarda --chunk-ms: en streaming
+# se manda a medida que "se genera"; sin stream, todo junto al final.
+# GET /stats devuelve los contadores del servidor; POST /stats/reset los pone en cero.
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def parsear_latencia(spec: str):
+    """'tipo:params' -> función rng -> segundos (nunca negativos)."""
+    tipo, _, params = (spec or "fija:0").partition(":")
+    vals = [float(x) for x in params.split(",") if x.strip()] if params else []
+    tipo = tipo.strip().lower()
+    if tipo == "fija":
+        s = vals[0] if vals else 0.0
+        return lambda rng: s
+    if tipo == "uniforme":
+        a, b = (vals + [0.0, 0.0])[:2]
+        return lambda rng: rng.uniform(a, b)
+    if tipo == "normal":
+        media, desvio = (vals + [0.0, 0.0])[:2]
+        return lambda rng: max(0.0, rng.gauss(media, desvio))
+    if tipo == "exp":
+        media = vals[0] if vals else 0.0
+        return lambda rng: rng.expovariate(1 / media) if media > 0 else 0.0
+    if tipo == "lognormal":
+        mediana, sigma = (vals + [0.0, 0.0])[:2]
+        return lambda rng: rng.lognormvariate(math.log(mediana), sigma) if mediana > 0 else 0.0
+    raise ValueError(f"latencia desconocida: {spec!r}")
+
+
+class ConfigStub:
+    def __init__(self, latencia: str = "fija:0", chunk_ms: float = 20, errores: float = 0.0,
+                 codigos: str = "500,429,503", rotas: float = 0.0, faltantes: float = 0.0,
+                 fences: float = 0.5, cortes: float = 0.0, semilla: Optional[int] = None):
+        self.latencia = parsear_latencia(latencia)
+        self.chunk_s = chunk_ms / 1000.0
+        self.errores = errores          # fracción de pedidos que devuelven un código de 'codigos'
+        self.codigos = [int(c) for c in str(codigos).split(",") if c.strip()]
+        self.rotas = rotas              # fracción de respuestas 200 con texto que no es JSON/HTML
+        self.faltantes = faltantes      # en lote: fracción de keywords que no vienen en el objeto
+        self.fences = fences            # fracción de respuestas envueltas en ``` ```
+        self.cortes = cortes            # fracción de streams que se cortan a la mitad
+        self.rng = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.stats = self._stats_cero()
+
+    @staticmethod
+    def _stats_cero() -> Dict[str, int]:
+        return {"pedidos": 0, "stream": 0, "errores": 0, "rotas": 0, "cortes": 0,
+                "tokens_prompt": 0, "tokens_respuesta": 0}
+
+    def sortear(self) -> random.Random:
+        """Un RNG propio para el pedido (derivado del global, así la corrida se puede repetir)."""
+        with self.lock:
+            return random.Random(self.rng.random())
+
+    def sumar(self, **deltas: int) -> None:
+        with self.lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+
+# ------------------------------------------------------
+# Respuestas armadas según el prompt
+# ------------------------------------------------------
+_KW_RE = re.compile(r'keyword "(.*?)"')
+_KW_LOTE_RE = re.compile(r'^- "(.*?)" \(país', re.M)
+
+
+def _tokens(texto: str) -> int:
+    return max(1, len(texto) // 4)
+
+
+def _partes(texto: str) -> List[str]:
+    """Fragmentos de ~10 tokens, como los manda el stream real."""
+    return [texto[i:i + 40] for i in range(0, len(texto), 40)] or [""]
+
+
+def _ideas(keyword: str) -> List[Dict[str, Any]]:
+    return [
+        {
+            "keyword": f"{keyword} {sufijo}",
+            "titulo": f"{titulo} {keyword}",
+            "palabras_clave": [keyword, f"{keyword} {sufijo}"],
+            "h2_sugeridos": [f"¿Qué es {keyword}?", f"{keyword}: paso a paso"],
+            "tips_seo": ["Usá la keyword en el H1.", "Respondé preguntas frecuentes."],
+            "articulo": ""
+        }
+        for sufijo, titulo in (("guía", "Guía completa de"), ("2025", "Novedades de"), ("faq", "Preguntas sobre"))
+    ]
+
+
+def _articulo(keyword: str) -> str:
+    secciones = "".join(
+        f"<h2>{h}</h2>\n<p>Párrafo de prueba sobre {keyword} para la sección «{h}». Texto de relleno.</p>\n"
+        for h in (f"Qué es {keyword}", "Cómo empezar", "Errores frecuentes", "Tips SEO")
+    )
+    return f"<article>\n<h1>{keyword.capitalize()}: guía práctica</h1>\n{secciones}</article>"
+
+
+def armar_respuesta(config: ConfigStub, rng: random.Random, mensajes: List[Dict[str, Any]]) -> Tuple[str, bool]:
+    """Texto de la respuesta para estos mensajes y si salió 'roto' a propósito."""
+    prompt = " ".join(str(m.get("content") or "") for m in mensajes)
+    if rng.random() < config.rotas:
+        return "Lo siento, no puedo ayudar con eso ahora mismo.", True
+
+    if "ARTÍCULO" in prompt or "<article>" in prompt:
+        m = _KW_RE.search(prompt)
+        texto, lang = _articulo(m.group(1) if m else "contenido"), "html"
+    else:
+        lote = _KW_LOTE_RE.findall(prompt)
+        if lote:
+            texto = json.dumps({kw: _ideas(kw) for kw in lote if rng.random() >= config.faltantes},
+                               ensure_ascii=False, indent=2)
+        else:
+            m = _KW_RE.search(prompt)
+            texto = json.dumps(_ideas(m.group(1) if m else "keyword"), ensure_ascii=False, indent=2)
+        lang = "json"
+    if rng.random() < config.fences:
+        texto = f"```{lang}\n{texto}\n```"
+    return texto, False
+
+
+# ------------------------------------------------------
+# HTTP
+# ------------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "stub-openai/1"
+
+    @property
+    def config(self) -> ConfigStub:
+        return self.server.config
+
+    def log_message(self, fmt, *args):  # sin una línea por pedido
+        pass
+
+    def _json(self, codigo: int, datos: Dict[str, Any]) -> None:
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        if codigo == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.config.lock:
+                stats = dict(self.config.stats)
+            return self._json(200, stats)
+        self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        cuerpo = self.rfile.read(largo) if largo else b""
+        if self.path.rstrip("/") == "/stats/reset":
+            with self.config.lock:
+                self.config.stats = ConfigStub._stats_cero()
+            return self._json(200, {"ok": True})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+
+        try:
+            pedido = json.loads(cuerpo or b"{}")
+        except ValueError:
+            return self._json(400, {"error": {"message": "invalid json"}})
+
+        config = self.config
+        rng = config.sortear()
+        mensajes = pedido.get("messages") or []
+        stream = bool(pedido.get("stream"))
+        tokens_prompt = sum(_tokens(str(m.get("content") or "")) for m in mensajes)
+        config.sumar(pedidos=1, stream=int(stream), tokens_prompt=tokens_prompt)
+
+        time.sleep(config.latencia(rng))
+        if config.codigos and rng.random() < config.errores:
+            codigo = rng.choice(config.codigos)
+            config.sumar(errores=1)
+            return self._json(codigo, {"error": {"message": f"stub error {codigo}", "type": "server_error"}})
+
+        texto, rota = armar_respuesta(config, rng, mensajes)
+        config.sumar(rotas=int(rota), tokens_respuesta=_tokens(texto))
+        modelo = pedido.get("model") or "stub"
+        partes = _partes(texto)
+        if stream:
+            uso = None
+            if (pedido.get("stream_options") or {}).get("include_usage"):
+                uso = {"prompt_tokens": tokens_prompt, "completion_tokens": _tokens(texto),
+                       "total_tokens": tokens_prompt + _tokens(texto)}
+            return self._stream(rng, modelo, partes, uso)
+
+        # sin stream la respuesta sale entera, pero tarda lo mismo que generarla
+        time.sleep(config.chunk_s * len(partes))
+        self._json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": modelo,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": texto}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens_prompt, "completion_tokens": _tokens(texto),
+                      "total_tokens": tokens_prompt + _tokens(texto)},
+        })
+
+    def _stream(self, rng: random.Random, modelo: str, partes: List[str],
+                uso: Optional[Dict[str, int]] = None) -> None:
+        config = self.config
+        cid = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def enviar(delta: Dict[str, Any], fin: Optional[str] = None) -> None:
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": modelo,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": fin}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        corte = len(partes) // 2 if rng.random() < config.cortes else None
+        try:
+            enviar({"role": "assistant", "content": ""})
+            for n, parte in enumerate(partes):
+                if n == corte:
+                    config.sumar(cortes=1)
+                    return   # se cierra la conexión sin [DONE]
+                enviar({"content": parte})
+                if config.chunk_s:
+                    time.sleep(config.chunk_s)
+            enviar({}, fin="stop")
+            if uso is not None:   # stream_options.include_usage: un último fragmento sin choices
+                chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": modelo, "choices": [], "usage": uso}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ServidorStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion: Tuple[str, int], config: ConfigStub):
+        super().__init__(direccion, _Handler)
+        self.config = config
+
+    def handle_error(self, request, client_address):
+        # el cliente cortó (timeout o pedido cubierto descartado): no es un error del stub
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+def iniciar(puerto: int = 0, host: str = "127.0.0.1", **config) -> Tuple[ServidorStub, str]:
+    """Levanta el stub en un thread (puerto 0 = uno libre). Devuelve (server, base_url para OPENAI_BASE_URL)."""
+    server = ServidorStub((host, puerto), ConfigStub(**config))
+    threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor local compatible con chat.completions de OpenAI")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--puerto", type=int, default=8765)
+    ap.add_argument("--latencia", default="fija:0.2", help="Distribución de latencia (ver encabezado)")
+    ap.add_argument("--chunk-ms", type=float, default=20, help="Pausa entre fragmentos del stream")
+    ap.add_argument("--errores", type=float, default=0.0, help="Fracción de pedidos que fallan")
+    ap.add_argument("--codigos", default="500,429,503", help="Códigos HTTP de los errores")
+    ap.add_argument("--rotas", type=float, default=0.0, help="Fracción de respuestas que no son JSON/HTML")
+    ap.add_argument("--faltantes", type=float, default=0.0, help="En lote: fracción de keywords que no vuelven")
+    ap.add_argument("--fences", type=float, default=0.5, help="Fracción de respuestas dentro de ``` ```")
+    ap.add_argument("--cortes", type=float, default=0.0, help="Fracción de streams cortados a la mitad")
+    ap.add_argument("--semilla", type=int, default=None)
+    args = ap.parse_args()
+
+    server = ServidorStub((args.host, args.puerto), ConfigStub(
+        args.latencia, args.chunk_ms, args.errores, args.codigos, args.rotas,
+        args.faltantes, args.fences, args.cortes, args.semilla
+    ))
+    print(f"[stub-openai] escuchando en http://{args.host}:{args.puerto}/v1 (Ctrl+C para salir)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
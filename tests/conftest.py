@@ -0,0 +1,36 @@
+# tests/conftest.py
+# Cada test corre en un directorio temporal propio: los módulos usan rutas
+# relativas a data/ (usuarios.db, ideas/, blobs/), así que con chdir alcanza
+# para no tocar los datos reales. Backend JSON, sin OPENAI_API_KEY (ideas.py
+# offline) y contadores escritos en el momento, salvo que el test diga otra cosa.
+import os
+import tempfile
+
+import pytest
+
+os.environ["SCIDATA_STORAGE_BACKEND"] = "json"
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["SCIDATA_COUNTER_FLUSH_MS"] = "0"
+
+
+def pytest_sessionstart(session):
+    # storage.py crea data/ideas al importarse (en la colección): que no sea en el repo
+    os.chdir(tempfile.mkdtemp(prefix="scidata-tests-"))
+
+
+@pytest.fixture(autouse=True)
+def datos(tmp_path, monkeypatch):
+    """data/ vacío en tmp_path, usuarios.db migrada y la cache de ideas limpia."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join("data", "ideas"))
+    os.makedirs(os.path.join("data", "blobs"))
+
+    import db
+    import migraciones
+    import storage
+
+    storage.invalidar_cache_ideas()
+    migraciones.aplicar_migraciones()
+    yield tmp_path
+    storage.invalidar_cache_ideas()
+    db.cerrar_conexiones()
@@ -0,0 +1,94 @@
+# tests/test_agregados.py
+# Agregados por usuario (agregados_usuario): los deltas de cada transacción
+# dejan la fila igual a recontar desde el índice, en los dos backends.
+import sqlite3
+
+import storage
+import storage_sqlite
+
+EMAIL = "agg@scidata.test"
+
+
+def _registrar(email: str = EMAIL) -> None:
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("INSERT INTO usuarios (nombre, email, password_hash) VALUES ('Ana', ?, 'x')", (email,))
+    conn.commit()
+    conn.close()
+
+
+def _fila(email: str = EMAIL):
+    conn = sqlite3.connect(storage.DB_PATH)
+    try:
+        return conn.execute(
+            "SELECT %s FROM agregados_usuario WHERE email = ?" % ", ".join(storage._CAMPOS_AGREGADOS), (email,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
+def _operar(backend) -> None:
+    backend.guardar_ideas_usuario(EMAIL, [{"keyword": k, "titulo": k} for k in ("Python", "Rust", "Go")])
+    a1 = backend.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    a2 = backend.append_articulo_usuario(EMAIL, "Python", "<h1>Dos</h1>")
+    backend.append_articulo_usuario(EMAIL, "Rust", "<h1>Rust</h1>")
+    backend.append_articulo_usuario(EMAIL, "Java", "<h1>Nueva idea</h1>")
+    assert backend.update_estado_articulo(EMAIL, "Python", a1["id"], "publicado")
+    assert backend.update_estado_articulo(EMAIL, "Python", a2["id"], "archivado")
+    assert backend.eliminar_articulo_usuario(EMAIL, "Python", a2["id"])
+    assert backend.eliminar_idea_usuario(EMAIL, "Rust")
+    backend.agregar_ideas_usuario(EMAIL, [{"keyword": "python", "titulo": "Python 2"}, {"keyword": "C", "titulo": "C"}])
+
+
+ESPERADO = {"ideas": 4, "articulos": 2, "borrador": 1, "revisado": 0, "publicado": 1, "archivado": 0}
+
+
+def test_deltas_json_igual_a_recontar():
+    _registrar()
+    _operar(storage)
+
+    resumen = storage.obtener_resumen_usuario(EMAIL)
+    assert {c: resumen[c] for c in storage._CAMPOS_AGREGADOS} == ESPERADO
+    storage.invalidar_cache_ideas()
+    assert storage._contar_agregados(storage._ideas_cacheadas(EMAIL)) == ESPERADO
+    # el histórico solo suma lo nuevo de agregar_ideas_usuario ("C")
+    assert resumen["ideas_generadas"] == 1
+
+
+def test_lectura_sin_fila_cuenta_sin_escribir():
+    _registrar()
+    _operar(storage)
+    # la primera transacción que cambió un agregado armó la fila completa
+    assert _fila() == tuple(ESPERADO.values())
+
+    conn = sqlite3.connect(storage.DB_PATH)
+    conn.execute("DELETE FROM agregados_usuario")
+    conn.commit()
+    conn.close()
+    resumen = storage.obtener_resumen_usuario(EMAIL)
+    assert {c: resumen[c] for c in storage._CAMPOS_AGREGADOS} == ESPERADO
+    assert _fila() is None                   # el camino de lectura no escribe
+
+    assert storage.eliminar_idea_usuario(EMAIL, "Go")
+    assert _fila() == tuple(dict(ESPERADO, ideas=3).values())
+
+
+def test_sqlite_recalcula_en_cada_commit():
+    _registrar()
+    _operar(storage_sqlite)
+    assert _fila() == tuple(ESPERADO.values())
+    assert storage_sqlite.reconstruir_agregados(EMAIL) == ESPERADO
+
+
+def test_api_counters(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    _registrar()
+    _operar(storage)
+    c = app_mod.app.test_client()
+    assert c.get("/api/counters").get_json() == {"total_ideas": 0, "total_articulos": 0}
+    with c.session_transaction() as s:
+        s["email"] = EMAIL
+    data = c.get("/api/counters").get_json()
+    assert data["total_ideas"] == 4 and data["total_articulos"] == 2
+    assert data["articulos_por_estado"] == {"borrador": 1, "revisado": 0, "publicado": 1, "archivado": 0}
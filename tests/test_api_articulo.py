@@ -0,0 +1,74 @@
+# tests/test_api_articulo.py
+# /api/articulo/<id>: el cuerpo de un artículo con ETag (sha256 del HTML) y
+# Last-Modified; un GET condicional que coincide responde 304 sin cuerpo.
+import hashlib
+
+import pytest
+
+import storage
+
+EMAIL = "etag@scidata.test"
+HTML = "<article><h1>Guía</h1><p>contenido ñ</p></article>"
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    c = app_mod.app.test_client()
+    with c.session_transaction() as s:
+        s["email"] = EMAIL
+    return c
+
+
+@pytest.fixture
+def articulo():
+    return storage.append_articulo_usuario(EMAIL, "Python", HTML)
+
+
+def test_devuelve_el_html_con_validadores(cliente, articulo):
+    r = cliente.get(f"/api/articulo/{articulo['id']}")
+    assert r.status_code == 200
+    assert r.mimetype == "text/html"
+    assert r.get_data(as_text=True) == HTML
+    assert r.headers["ETag"] == '"%s"' % hashlib.sha256(HTML.encode("utf-8")).hexdigest()
+    assert r.headers["Last-Modified"]
+    assert r.headers["Cache-Control"] == "private, no-cache"
+    assert r.headers["Content-Security-Policy"] == "sandbox"
+
+
+def test_if_none_match_da_304(cliente, articulo):
+    url = f"/api/articulo/{articulo['id']}"
+    etag = cliente.get(url).headers["ETag"]
+
+    r = cliente.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.get_data() == b""
+    assert r.headers["ETag"] == etag
+
+    assert cliente.get(url, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_if_modified_since_da_304(cliente, articulo):
+    url = f"/api/articulo/{articulo['id']}"
+    modificado = cliente.get(url).headers["Last-Modified"]
+    assert cliente.get(url, headers={"If-Modified-Since": modificado}).status_code == 304
+
+
+def test_cambiar_el_estado_no_cambia_el_etag(cliente, articulo):
+    url = f"/api/articulo/{articulo['id']}"
+    etag = cliente.get(url).headers["ETag"]
+    assert storage.update_estado_articulo(EMAIL, "Python", articulo["id"], "publicado")
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_ajeno_inexistente_o_sin_sesion(cliente, articulo):
+    assert cliente.get("/api/articulo/no-existe").status_code == 404
+
+    with cliente.session_transaction() as s:
+        s["email"] = "otro@scidata.test"
+    assert cliente.get(f"/api/articulo/{articulo['id']}").status_code == 404
+
+    anonimo = cliente.application.test_client()
+    assert anonimo.get(f"/api/articulo/{articulo['id']}").status_code == 401
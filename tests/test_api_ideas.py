@@ -0,0 +1,68 @@
+# tests/test_api_ideas.py
+# /api/ideas (y listar_ideas_usuario de los dos backends): páginas de la idea
+# más reciente a la más vieja, sin repetir ni saltear.
+import pytest
+
+import storage
+
+EMAIL = "pagina@scidata.test"
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    c = app_mod.app.test_client()
+    with c.session_transaction() as s:
+        s["email"] = EMAIL
+    return c
+
+
+def _sembrar(n: int) -> None:
+    storage.guardar_ideas_usuario(EMAIL, [{"keyword": f"kw {i}", "titulo": f"Idea {i}"} for i in range(n)])
+
+
+def test_recorre_todas_las_paginas(cliente):
+    _sembrar(7)
+    vistas, offset = [], 0
+    while offset is not None:
+        r = cliente.get(f"/api/ideas?offset={offset}&limit=3")
+        assert r.status_code == 200
+        data = r.get_json()
+        assert data["total"] == 7 and data["limit"] == 3
+        vistas += [i["keyword"] for i in data["ideas"]]
+        offset = data["next_offset"]
+    assert vistas == [f"kw {i}" for i in reversed(range(7))]
+
+
+def test_limites_y_errores(cliente):
+    _sembrar(3)
+    data = cliente.get("/api/ideas?offset=10&limit=1000").get_json()
+    assert data["ideas"] == [] and data["limit"] == 100 and data["next_offset"] is None
+    assert cliente.get("/api/ideas?offset=x").status_code == 400
+
+    anonimo = cliente.application.test_client()
+    assert anonimo.get("/api/ideas").status_code == 401
+
+
+def test_pagina_trae_los_articulos_sin_html(cliente):
+    _sembrar(3)
+    storage.append_articulo_usuario(EMAIL, "kw 0", "<h1>Viejo</h1><p>cuerpo</p>")
+    data = cliente.get("/api/ideas?offset=2&limit=1").get_json()
+    assert [i["keyword"] for i in data["ideas"]] == ["kw 0"]
+    art = data["ideas"][0]["articulos"][0]
+    assert art["titulo"] == "Viejo" and "cuerpo" in art["preview"]
+    assert "html" not in art and "articulo" not in data["ideas"][0]
+
+
+def test_listar_ideas_usuario_sqlite():
+    import storage_sqlite
+
+    storage_sqlite.guardar_ideas_usuario(EMAIL, [{"keyword": f"kw {i}", "titulo": f"Idea {i}"} for i in range(5)])
+    storage_sqlite.append_articulo_usuario(EMAIL, "kw 3", "<h1>Tres</h1>")
+    pagina, total = storage_sqlite.listar_ideas_usuario(EMAIL, 1, 2)
+    assert total == 5 and storage_sqlite.contar_ideas_usuario(EMAIL) == 5
+    assert [i["keyword"] for i in pagina] == ["kw 3", "kw 2"]
+    assert pagina[0]["articulos"][0]["titulo"] == "Tres"
+    assert "html" not in pagina[0]["articulos"][0]
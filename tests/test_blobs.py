@@ -0,0 +1,76 @@
+# tests/test_blobs.py
+# HTML de los artículos en blobs direccionados por contenido: el JSON del
+# usuario queda como índice liviano y un mismo HTML se guarda una sola vez.
+import hashlib
+import json
+import os
+
+import storage
+
+EMAIL = "blobs@scidata.test"
+OTRO = "otro@scidata.test"
+HTML = "<article><h1>Guía de Python</h1><p>" + "contenido ñ " * 200 + "</p></article>"
+
+
+def _archivos_blob() -> list:
+    return [os.path.join(r, n) for r, _, ns in os.walk(storage.BLOBS_DIR) for n in ns]
+
+
+def _indice_en_disco(email: str) -> dict:
+    with open(storage._ruta_json_usuario(email), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_el_indice_no_guarda_html():
+    art = storage.append_articulo_usuario(EMAIL, "Python", HTML)
+
+    data = _indice_en_disco(EMAIL)
+    assert data["schema_version"] == storage.IDEAS_SCHEMA_VERSION
+    idea = data["ideas"][0]
+    assert "articulo" not in idea
+    guardado = idea["articulos"][0]
+    assert "html" not in guardado
+    assert guardado["blob"] == hashlib.sha256(HTML.encode("utf-8")).hexdigest()
+    assert guardado["titulo"] == "Guía de Python" and guardado["id"] == art["id"]
+
+    # la lectura completa lo hidrata
+    storage.invalidar_cache_ideas()
+    idea = storage.cargar_ideas_usuario(EMAIL)[0]
+    assert idea["articulos"][0]["html"] == HTML
+    assert idea["articulo"] == HTML
+    assert storage.contar_articulos_usuario(EMAIL) == 1
+
+
+def test_mismo_html_un_solo_blob():
+    storage.append_articulo_usuario(EMAIL, "Python", HTML)
+    storage.append_articulo_usuario(EMAIL, "Python 2", HTML)
+    storage.append_articulo_usuario(OTRO, "Python", HTML)
+    assert len(_archivos_blob()) == 1
+
+    storage.append_articulo_usuario(EMAIL, "Rust", "<h1>Rust</h1>")
+    assert len(_archivos_blob()) == 2
+
+
+def test_blob_comprimido_y_sin_comprimir(monkeypatch):
+    ref = storage._guardar_blob(HTML)
+    assert _archivos_blob() == [storage._ruta_blob(ref, True)]
+    assert os.path.getsize(_archivos_blob()[0]) < len(HTML.encode("utf-8"))
+
+    monkeypatch.setattr(storage, "BLOBS_GZIP", False)
+    otro = storage._guardar_blob("<p>plano</p>")
+    with open(storage._ruta_blob(otro, False), encoding="utf-8") as f:
+        assert f.read() == "<p>plano</p>"
+    assert storage._leer_blob(otro) == "<p>plano</p>"
+    assert storage._guardar_blob("   ") is None
+
+
+def test_limpiar_blobs_huerfanos():
+    storage.append_articulo_usuario(EMAIL, "Python", HTML)
+    huerfano = storage._guardar_blob("<p>sin dueño</p>")
+
+    # recién escrito: no se toca aunque nadie lo referencie
+    assert storage.limpiar_blobs_huerfanos() == 0
+    assert storage.limpiar_blobs_huerfanos(antiguedad_min=-1) == 1
+    assert not os.path.exists(storage._ruta_blob(huerfano, True))
+    # el que está en uso sigue
+    assert _archivos_blob() == [storage._ruta_blob(hashlib.sha256(HTML.encode("utf-8")).hexdigest(), True)]
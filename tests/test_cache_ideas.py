@@ -0,0 +1,87 @@
+# tests/test_cache_ideas.py
+# Cache LRU en proceso de las ideas por usuario: acierta mientras el archivo
+# no cambia, se invalida si otro proceso lo reescribe y no comparte objetos
+# mutables con quien llama.
+import json
+import threading
+
+import storage
+
+EMAIL = "cache@scidata.test"
+
+
+def _escribir_externo(email: str, ideas: list) -> None:
+    """Como si el JSON lo reescribiera otro worker (sin pasar por la cache de este proceso)."""
+    with open(storage._ruta_json_usuario(email), "w", encoding="utf-8") as f:
+        json.dump(ideas, f)
+
+
+def _stats() -> dict:
+    return storage.estadisticas_cache_ideas()
+
+
+def test_segunda_lectura_sale_de_la_cache():
+    _escribir_externo(EMAIL, [{"keyword": "Python", "titulo": "Python"}])
+    antes = _stats()
+    assert [i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)] == ["Python"]
+    assert [i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)] == ["Python"]
+    despues = _stats()
+    assert despues["misses"] == antes["misses"] + 1
+    assert despues["hits"] == antes["hits"] + 1
+
+
+def test_cambio_del_archivo_invalida():
+    _escribir_externo(EMAIL, [{"keyword": "Python", "titulo": "Python"}])
+    storage.cargar_ideas_usuario(EMAIL)
+    _escribir_externo(EMAIL, [{"keyword": "Python", "titulo": "Python"},
+                              {"keyword": "Rust", "titulo": "Rust"}])
+    assert [i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)] == ["Python", "Rust"]
+
+
+def test_mutar_el_resultado_no_toca_la_cache():
+    _escribir_externo(EMAIL, [{"keyword": "Python", "titulo": "Python", "palabras_clave": ["py"]}])
+    ideas = storage.cargar_ideas_usuario(EMAIL)
+    ideas[0]["titulo"] = "otro"
+    ideas[0]["palabras_clave"].append("x")
+    ideas.append({"keyword": "Rust"})
+
+    de_nuevo = storage.cargar_ideas_usuario(EMAIL)
+    assert len(de_nuevo) == 1
+    assert de_nuevo[0]["titulo"] == "Python"
+    assert de_nuevo[0]["palabras_clave"] == ["py"]
+
+
+def test_lru_acotada(monkeypatch):
+    monkeypatch.setattr(storage, "IDEAS_CACHE_MAX", 2)
+    for n in range(3):
+        email = f"u{n}@scidata.test"
+        _escribir_externo(email, [{"keyword": f"kw{n}", "titulo": f"kw{n}"}])
+        storage.cargar_ideas_usuario(email)
+    stats = _stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] >= 1
+    # el más viejo salió: volver a leerlo es un miss
+    antes = stats["misses"]
+    storage.cargar_ideas_usuario("u0@scidata.test")
+    assert _stats()["misses"] == antes + 1
+
+
+def test_contadores_con_lecturas_concurrentes():
+    emails = [f"u{n}@scidata.test" for n in range(4)]
+    for e in emails:
+        _escribir_externo(e, [{"keyword": "Python", "titulo": "Python"}])
+    antes = _stats()
+
+    def _leer(e):
+        for _ in range(50):
+            storage.cargar_ideas_usuario(e)
+
+    hilos = [threading.Thread(target=_leer, args=(e,)) for e in emails for _ in range(2)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    despues = _stats()
+    lecturas = sum(despues[k] - antes[k] for k in ("hits", "misses", "replays"))
+    assert lecturas == len(hilos) * 50
@@ -0,0 +1,216 @@
+# tests/test_circuito.py
+# Circuit breaker de ideas.py (_Circuito + _llamar), qué errores se
+# reintentan, los pedidos cubiertos (_con_cobertura) y el límite de tiempo
+# del stream completo (_leer_con_limite).
+import threading
+import time
+
+import pytest
+
+import ideas
+
+
+class _ErrorApi(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def circuito(monkeypatch):
+    """Circuito propio: abre con 50% de fallas sobre al menos 2 llamadas, 50 ms abierto; sin reintentos."""
+    c = ideas._Circuito(0.5, 2, 60, 0.05)
+    monkeypatch.setattr(ideas, "_circuito", c)
+    monkeypatch.setattr(ideas, "LLM_REINTENTOS", 0)
+    return c
+
+
+def _falla(status: int = 503):
+    def fn(t):
+        raise _ErrorApi(status)
+    return fn
+
+
+def _abrir(c) -> None:
+    while c.estado() == "cerrado":
+        with pytest.raises(_ErrorApi):
+            ideas._llamar(_falla(), 1)
+    assert c.estado() == "abierto"
+
+
+def _esperar_semiabierto(c) -> None:
+    time.sleep(c.abierto_s + 0.02)
+    assert c.estado() == "semiabierto"
+
+
+def test_cerrado_abierto_semiabierto_cerrado(circuito):
+    assert ideas._llamar(lambda t: "ok", 1) == "ok"
+    assert circuito.estado() == "cerrado"
+    _abrir(circuito)
+
+    llamadas = []
+    with pytest.raises(ideas.CircuitoAbierto):
+        ideas._llamar(lambda t: llamadas.append(t), 1)
+    assert llamadas == []                    # abierto: ni siquiera se intenta
+
+    _esperar_semiabierto(circuito)
+    assert ideas._llamar(lambda t: "ok", 1) == "ok"
+    assert circuito.estado() == "cerrado" and not circuito.sondeando
+
+
+def test_sonda_fallida_vuelve_a_abrir(circuito):
+    _abrir(circuito)
+    _esperar_semiabierto(circuito)
+    with pytest.raises(_ErrorApi):
+        ideas._llamar(_falla(), 1)
+    assert circuito.estado() == "abierto" and not circuito.sondeando
+
+
+def test_una_sola_sonda_a_la_vez(circuito):
+    _abrir(circuito)
+    _esperar_semiabierto(circuito)
+    en_sonda, seguir = threading.Event(), threading.Event()
+
+    def _lenta(t):
+        en_sonda.set()
+        seguir.wait(2)
+        return "ok"
+
+    th = threading.Thread(target=ideas._llamar, args=(_lenta, 1))
+    th.start()
+    assert en_sonda.wait(2)
+    with pytest.raises(ideas.CircuitoAbierto):
+        ideas._llamar(lambda t: "ok", 1)
+    seguir.set()
+    th.join(2)
+    assert circuito.estado() == "cerrado"
+
+
+@pytest.mark.parametrize("error", [_ErrorApi(400), KeyboardInterrupt()])
+def test_sonda_sin_resultado_se_suelta(circuito, error):
+    _abrir(circuito)
+    _esperar_semiabierto(circuito)
+
+    def fn(t):
+        raise error
+
+    with pytest.raises(type(error)):
+        ideas._llamar(fn, 1)
+    # sigue semiabierto y la próxima llamada puede ser la sonda
+    assert circuito.estado() == "semiabierto" and not circuito.sondeando
+    assert ideas._llamar(lambda t: "ok", 1) == "ok"
+    assert circuito.estado() == "cerrado"
+
+
+def test_errores_del_pedido_no_cuentan(circuito):
+    for _ in range(5):
+        with pytest.raises(_ErrorApi):
+            ideas._llamar(_falla(400), 1)
+    assert circuito.estado() == "cerrado"
+    assert len(circuito.resultados) == 0     # ni como falla ni como éxito
+
+    # un éxito y una falla de la API: 50% sobre 2, abre
+    ideas._llamar(lambda t: "ok", 1)
+    with pytest.raises(_ErrorApi):
+        ideas._llamar(_falla(), 1)
+    assert circuito.estado() == "abierto"
+
+
+def test_umbral_cero_nunca_abre(monkeypatch):
+    monkeypatch.setattr(ideas, "_circuito", ideas._Circuito(0, 1, 60, 60))
+    monkeypatch.setattr(ideas, "LLM_REINTENTOS", 0)
+    for _ in range(5):
+        with pytest.raises(_ErrorApi):
+            ideas._llamar(_falla(), 1)
+    assert ideas._circuito.estado() == "cerrado"
+
+
+@pytest.mark.parametrize("error, reintentable", [
+    (TimeoutError(), True),
+    (ConnectionError(), True),
+    (_ErrorApi(429), True),
+    (_ErrorApi(503), True),
+    (_ErrorApi(400), False),
+    (_ErrorApi(401), False),
+    (ideas.CircuitoAbierto(), False),
+    (ValueError(), False),
+])
+def test_es_reintentable(error, reintentable):
+    assert ideas._es_reintentable(error) is reintentable
+
+
+def test_reintenta_solo_los_reintentables(circuito, monkeypatch):
+    monkeypatch.setattr(ideas, "LLM_REINTENTOS", 2)
+    monkeypatch.setattr(ideas, "_espera_reintento", lambda intento, e: 0)
+    circuito.minimo = 10                     # que los reintentos no lo abran
+    intentos = []
+
+    def _dos_fallas(t):
+        intentos.append(t)
+        if len(intentos) < 3:
+            raise TimeoutError()
+        return "ok"
+
+    assert ideas._llamar(_dos_fallas, 1) == "ok"
+    assert len(intentos) == 3
+
+    intentos.clear()
+    with pytest.raises(_ErrorApi):
+        ideas._llamar(lambda t: intentos.append(t) or _falla(401)(t), 1)
+    assert len(intentos) == 1
+
+
+def test_pedido_cubierto_usa_el_primero_que_vuelve(monkeypatch):
+    monkeypatch.setattr(ideas, "LLM_HEDGE_MS", 20)
+    llamadas = []
+    lock = threading.Lock()
+
+    def _fn(t):
+        with lock:
+            llamadas.append(t)
+            n = len(llamadas)
+        if n == 1:
+            time.sleep(0.5)                  # el primero se cuelga
+            return "lento"
+        return "rapido"
+
+    t0 = time.monotonic()
+    assert ideas._con_cobertura(_fn, 1) == "rapido"
+    assert len(llamadas) == 2 and time.monotonic() - t0 < 0.4
+
+
+def test_pedido_que_vuelve_a_tiempo_no_se_cubre(monkeypatch):
+    monkeypatch.setattr(ideas, "LLM_HEDGE_MS", 200)
+    llamadas = []
+    assert ideas._con_cobertura(lambda t: llamadas.append(t) or "ya", 1) == "ya"
+    time.sleep(0.25)
+    assert llamadas == [1]
+
+
+def test_stream_colgado_corta_en_el_limite():
+    liberar = threading.Event()
+
+    def _colgado():
+        yield "a"
+        liberar.wait(5)                      # el servidor no manda más nada
+        yield "b"
+
+    recibidos = []
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        for chunk in ideas._leer_con_limite(_colgado(), time.monotonic() + 0.2, 0.2):
+            recibidos.append(chunk)
+    assert recibidos == ["a"]
+    assert time.monotonic() - t0 < 1
+    liberar.set()
+
+
+def test_stream_completo_y_errores_del_stream():
+    assert list(ideas._leer_con_limite(iter("abc"), time.monotonic() + 5, 5)) == ["a", "b", "c"]
+
+    def _roto():
+        yield "a"
+        raise ConnectionError("cortado")
+
+    with pytest.raises(ConnectionError):
+        list(ideas._leer_con_limite(_roto(), time.monotonic() + 5, 5))
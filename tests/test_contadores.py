@@ -0,0 +1,95 @@
+# tests/test_contadores.py
+# Contadores históricos (ideas_generadas / articulos_generados): con
+# SCIDATA_COUNTER_FLUSH_MS > 0 se acumulan en memoria y flush_contadores los
+# escribe juntos; las lecturas ya suman lo pendiente.
+import threading
+
+import pytest
+
+import db
+import storage
+
+EMAIL = "contadores@scidata.test"
+OTRO = "otro@scidata.test"
+
+
+@pytest.fixture(autouse=True)
+def usuarios():
+    for email in (EMAIL, OTRO):
+        with db.conexion(storage.DB_PATH) as conn:
+            conn.execute("INSERT INTO usuarios (nombre, email, password_hash) VALUES ('x', ?, 'x')", (email,))
+
+
+@pytest.fixture
+def write_behind(monkeypatch):
+    """Acumula sin thread de fondo: el test decide cuándo se hace el flush."""
+    monkeypatch.setattr(storage, "COUNTER_FLUSH_MS", 60_000)
+    monkeypatch.setattr(storage, "_contadores_pendientes", {})
+    monkeypatch.setattr(storage, "_contadores_flusher", threading.current_thread())
+
+
+def _en_base(email: str) -> tuple:
+    with db.conexion(storage.DB_PATH) as conn:
+        return conn.execute(
+            "SELECT ideas_generadas, articulos_generados FROM usuarios WHERE email = ?", (email,)
+        ).fetchone()
+
+
+def test_sin_write_behind_escribe_en_el_momento():
+    storage.incrementar_ideas_generadas(EMAIL, inc=3)
+    storage.incrementar_articulos_generados(EMAIL)
+    assert _en_base(EMAIL) == (3, 1)
+    assert storage.flush_contadores() == 0
+
+
+def test_acumula_y_el_flush_escribe_todo_junto(write_behind):
+    for _ in range(5):
+        storage.incrementar_ideas_generadas(EMAIL, inc=2)
+        storage.incrementar_articulos_generados(EMAIL)
+    storage.incrementar_ideas_generadas(OTRO)
+    storage.incrementar_ideas_generadas(EMAIL, inc=0)   # no suma nada
+
+    # todavía nada en la base, pero las lecturas ya lo ven
+    assert _en_base(EMAIL) == (0, 0)
+    assert storage.obtener_ideas_generadas(EMAIL) == 10
+    assert storage.obtener_articulos_generados(EMAIL) == 5
+    resumen = storage.obtener_resumen_usuario(EMAIL)
+    assert (resumen["ideas_generadas"], resumen["articulos_generados"]) == (10, 5)
+
+    assert storage.flush_contadores() == 3   # una fila por (email, columna)
+    assert _en_base(EMAIL) == (10, 5) and _en_base(OTRO) == (1, 0)
+    assert storage.obtener_ideas_generadas(EMAIL) == 10   # sin contar dos veces
+    assert storage.flush_contadores() == 0
+
+
+def test_flush_que_falla_reintenta_despues(write_behind, monkeypatch):
+    storage.incrementar_ideas_generadas(EMAIL, inc=4)
+    escribir = storage._escribir_contadores
+
+    def _falla(deltas):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(storage, "_escribir_contadores", _falla)
+    assert storage.flush_contadores() == 0
+    storage.incrementar_ideas_generadas(EMAIL, inc=1)
+    monkeypatch.setattr(storage, "_escribir_contadores", escribir)
+    assert storage.flush_contadores() == 1
+    assert _en_base(EMAIL) == (5, 0)
+
+
+def test_incrementos_concurrentes_no_se_pierden(write_behind):
+    def _sumar():
+        for n in range(200):
+            storage.incrementar_ideas_generadas(EMAIL)
+            if n % 50 == 0:
+                storage.flush_contadores()
+        db.cerrar_conexiones()
+
+    hilos = [threading.Thread(target=_sumar) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    storage.flush_contadores()
+    assert _en_base(EMAIL)[0] == 800
+
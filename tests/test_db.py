@@ -0,0 +1,64 @@
+# tests/test_db.py
+# db.py: una conexión reutilizada por thread, en WAL y con busy_timeout, y
+# transacciones que nunca devuelven al pool una conexión con BEGIN abierto.
+import threading
+
+import pytest
+
+import db
+
+
+def test_reutiliza_la_conexion_del_thread():
+    with db.conexion() as c1:
+        pass
+    with db.conexion() as c2:
+        assert c2 is c1
+        assert c2.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert c2.execute("PRAGMA busy_timeout").fetchone()[0] == db.BUSY_TIMEOUT_MS
+        assert c2.execute("PRAGMA synchronous").fetchone()[0] == 1   # NORMAL
+
+    otra = []
+
+    def _en_otro_thread():
+        with db.conexion() as c:
+            otra.append(c)
+        db.cerrar_conexiones()
+
+    th = threading.Thread(target=_en_otro_thread)
+    th.start()
+    th.join()
+    assert otra[0] is not c1
+
+
+def test_despues_de_un_fork_abre_otra(monkeypatch):
+    with db.conexion() as c1:
+        pass
+    monkeypatch.setattr(db.os, "getpid", lambda: -1)
+    with db.conexion() as c2:
+        assert c2 is not c1
+
+
+def test_transaccion_commit_y_rollback():
+    with db.conexion() as conn:
+        conn.execute("CREATE TABLE t (n INTEGER)")
+    with db.transaccion() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(ZeroDivisionError):
+        with db.transaccion() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            1 / 0
+
+    with db.conexion() as conn:
+        assert not conn.in_transaction
+        assert [r[0] for r in conn.execute("SELECT n FROM t")] == [1]
+
+
+def test_sin_pool_abre_y_cierra(monkeypatch):
+    monkeypatch.setattr(db, "POOL_ENABLED", False)
+    with db.conexion() as c1:
+        c1.execute("SELECT 1")
+    with db.conexion() as c2:
+        assert c2 is not c1
+    with pytest.raises(Exception):
+        c1.execute("SELECT 1")   # ya cerrada
@@ -0,0 +1,78 @@
+# tests/test_escrituras_concurrentes.py
+# Escrituras atómicas y lock por usuario: varios threads o procesos
+# escribiendo a la vez no pierden cambios y el archivo nunca queda a medias.
+import json
+import multiprocessing
+import os
+import threading
+
+import storage
+
+EMAIL = "lock@scidata.test"
+
+
+def _htmls() -> list:
+    storage.invalidar_cache_ideas()
+    return sorted(a["html"] for i in storage.cargar_ideas_usuario(EMAIL) for a in i.get("articulos") or [])
+
+
+def _escribir(prefijo: str, n: int) -> None:
+    for k in range(n):
+        assert storage.append_articulo_usuario(EMAIL, f"kw{k % 3}", f"<p>{prefijo}-{k}</p>")
+
+
+def test_threads_no_pierden_articulos():
+    hilos = [threading.Thread(target=_escribir, args=(f"t{t}", 15)) for t in range(6)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert _htmls() == sorted(f"<p>t{t}-{k}</p>" for t in range(6) for k in range(15))
+
+
+def test_procesos_no_pierden_articulos():
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_escribir, args=(f"p{p}", 10)) for p in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+    assert _htmls() == sorted(f"<p>p{p}-{k}</p>" for p in range(4) for k in range(10))
+
+
+def test_escritura_fallida_deja_el_archivo_anterior():
+    ruta = os.path.join(storage.IDEAS_DIR, "x.json")
+    assert storage._guardar_json_seguro(ruta, {"ok": 1})
+    assert not storage._guardar_json_seguro(ruta, {"roto": object()})   # no serializable
+    with open(ruta, encoding="utf-8") as f:
+        assert json.load(f) == {"ok": 1}
+    assert sorted(os.listdir(storage.IDEAS_DIR)) == ["x.json"]          # sin temporales
+
+
+def test_leer_un_archivo_legacy_no_lo_reescribe():
+    ruta = storage._ruta_json_usuario(EMAIL)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump([{"keyword": "Python", "titulo": "Python", "articulo": "<p>viejo</p>"}], f)
+    with open(ruta, "rb") as f:
+        antes = f.read()
+    assert storage.cargar_ideas_usuario(EMAIL)[0]["articulo"] == "<p>viejo</p>"
+    with open(ruta, "rb") as f:
+        assert f.read() == antes
+
+
+def test_el_lock_se_suelta_si_la_transaccion_falla():
+    class _Falla(Exception):
+        pass
+
+    try:
+        with storage.transaction(EMAIL):
+            raise _Falla()
+    except _Falla:
+        pass
+    # si el lock hubiera quedado tomado, esto se colgaría
+    hilo = threading.Thread(target=_escribir, args=("x", 1))
+    hilo.start()
+    hilo.join(5)
+    assert not hilo.is_alive()
+    assert _htmls() == ["<p>x-0</p>"]
@@ -0,0 +1,48 @@
+# tests/test_fix_counters.py
+# fix_counters.py --all: cuenta en un pool de procesos y escribe todo al
+# final; el resultado es el mismo que recontar usuario por usuario.
+import db
+import fix_counters
+import storage
+
+USUARIOS = {
+    "a@scidata.test": 3,
+    "b@scidata.test": 0,
+    "c@scidata.test": 5,
+}
+
+
+def _sembrar():
+    # "b" no tiene ideas: aparece solo por la tabla usuarios
+    with db.conexion(storage.DB_PATH) as conn:
+        conn.execute("INSERT INTO usuarios (nombre, email, password_hash) VALUES ('b', 'b@scidata.test', 'x')")
+    for email, n in USUARIOS.items():
+        storage.guardar_ideas_usuario(email, [{"keyword": f"kw {i}", "titulo": f"kw {i}"} for i in range(n)])
+        for i in range(n // 2):
+            storage.append_articulo_usuario(email, f"kw {i}", f"<h1>Art {i}</h1>")
+    # agregados desfasados a propósito
+    storage.guardar_agregados_lote({"a@scidata.test": dict.fromkeys(storage._CAMPOS_AGREGADOS, 99)})
+
+
+def test_all_igual_a_recontar():
+    _sembrar()
+    assert storage.listar_emails_usuarios() == sorted(USUARIOS)
+
+    fix_counters.recalcular_todos(workers=2)
+
+    contadores = storage._cargar_contadores()["by_user"]
+    for email, n in USUARIOS.items():
+        esperado = storage.contar_agregados_usuario(email)
+        assert esperado["ideas"] == n and esperado["articulos"] == n // 2
+        resumen = storage.obtener_resumen_usuario(email)
+        assert {c: resumen[c] for c in storage._CAMPOS_AGREGADOS} == esperado, email
+        assert contadores[email] == {"ideas_generadas": n, "articulos_generados": n // 2}
+
+
+def test_email_suelto():
+    _sembrar()
+    fix_counters.recalcular_para_email("c@scidata.test")
+    assert storage._cargar_contadores()["by_user"]["c@scidata.test"] == {
+        "ideas_generadas": 5, "articulos_generados": 2,
+    }
+    assert "a@scidata.test" not in storage._cargar_contadores().get("by_user", {})
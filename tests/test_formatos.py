@@ -0,0 +1,47 @@
+# tests/test_formatos.py
+# Formatos del índice por usuario (SCIDATA_STORAGE_FORMAT): ida y vuelta sin
+# pérdida y detección por cabecera, aunque el directorio tenga formatos mezclados.
+import pytest
+
+import storage
+
+EMAIL = "formatos@scidata.test"
+IDEAS = [
+    {"keyword": "Python", "titulo": "Qué es Python — guía ñ", "articulos": [
+        {"id": "1", "blob": "ab" * 32, "titulo": "Uno", "preview": "…", "estado": "borrador"}]},
+    {"keyword": "Rust", "titulo": "Rust", "palabras_clave": ["rust", "cargo"], "articulos": []},
+]
+
+
+@pytest.mark.parametrize("formato", storage.FORMATOS_STORE)
+def test_ida_y_vuelta(formato):
+    ruta = storage._ruta_json_usuario(EMAIL)
+    assert storage._guardar_store(ruta, IDEAS, 7, formato=formato)
+    assert storage._formato_archivo(ruta) == formato
+    assert storage._cargar_store(ruta) == (storage.IDEAS_SCHEMA_VERSION, IDEAS, 7)
+    assert storage._version_archivo(ruta) == storage.IDEAS_SCHEMA_VERSION
+
+
+@pytest.mark.parametrize("formato", storage.FORMATOS_STORE)
+def test_la_api_lee_cualquier_formato(formato, monkeypatch):
+    monkeypatch.setattr(storage, "STORAGE_FORMAT", formato)
+    storage.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    # cambiar el formato de escritura no obliga a migrar lo ya escrito
+    monkeypatch.setattr(storage, "STORAGE_FORMAT", "compact")
+    assert storage.compactar_usuario(EMAIL) is False
+    storage.invalidar_cache_ideas()
+    assert storage.cargar_ideas_usuario(EMAIL)[0]["articulo"] == "<h1>Uno</h1>"
+
+
+def test_reformatear(monkeypatch):
+    ruta = storage._ruta_json_usuario(EMAIL)
+    storage._guardar_store(ruta, IDEAS, 3, formato="json")
+    assert storage.migrar_store_ideas(max_workers=1)["migrados"] == 0
+
+    monkeypatch.setattr(storage, "STORAGE_FORMAT", "binary")
+    res = storage.migrar_store_ideas(max_workers=1, reformatear=True)
+    assert res["migrados"] == 1
+    assert storage._formato_archivo(ruta) == "binary"
+    # misma gen: un journal pendiente sigue aplicando
+    assert storage._cargar_store(ruta) == (storage.IDEAS_SCHEMA_VERSION, IDEAS, 3)
+    assert storage.migrar_store_ideas(max_workers=1, reformatear=True)["al_dia"] == 1
@@ -0,0 +1,259 @@
+# tests/test_ideas_lote.py
+# Generación de ideas en lote: límite de RPM compartido (_TokenBucket),
+# generar_ideas_lote en paralelo en el orden de entrada y varias keywords
+# por pedido (generar_ideas_para_keywords), también contra stub_openai.py.
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from openai import OpenAI
+
+import ideas
+import llm_cache
+import stub_openai
+
+FILAS = [("Python", "Argentina"), ("Rust", "Chile"), ("Go", "Uruguay"), ("Java", "Perú")]
+
+
+class _Reloj:
+    """monotonic/sleep falsos: sleep avanza el reloj en lugar de dormir."""
+
+    def __init__(self):
+        self.ahora = 100.0
+        self.esperas = []
+
+    def monotonic(self) -> float:
+        return self.ahora
+
+    def sleep(self, s: float) -> None:
+        self.esperas.append(s)
+        self.ahora += s
+
+
+# ------------------------------------------------------
+# _TokenBucket
+# ------------------------------------------------------
+def test_rafaga_y_despues_al_ritmo_del_rpm(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(ideas, "time", SimpleNamespace(monotonic=reloj.monotonic, sleep=reloj.sleep))
+    bucket = ideas._TokenBucket(rpm=60, rafaga=3)     # 1 por segundo
+
+    for _ in range(3):
+        bucket.tomar()
+    assert reloj.esperas == []                         # la ráfaga no espera
+
+    inicio = reloj.ahora
+    for _ in range(4):
+        bucket.tomar()
+    assert abs((reloj.ahora - inicio) - 4.0) < 1e-6    # después, un pedido por segundo
+
+
+def test_recarga_con_el_tiempo_sin_pasar_la_capacidad(monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(ideas, "time", SimpleNamespace(monotonic=reloj.monotonic, sleep=reloj.sleep))
+    bucket = ideas._TokenBucket(rpm=60, rafaga=2)
+    bucket.tomar()
+    bucket.tomar()
+
+    reloj.ahora += 60                                  # un minuto quieto: vuelve a 2, no a 60
+    for _ in range(2):
+        bucket.tomar()
+    assert reloj.esperas == []
+    bucket.tomar()
+    assert reloj.esperas and abs(sum(reloj.esperas) - 1.0) < 1e-6
+
+
+def test_rpm_cero_no_limita(monkeypatch):
+    monkeypatch.setattr(ideas, "time", SimpleNamespace(monotonic=time.monotonic, sleep=lambda s: 1 / 0))
+    bucket = ideas._TokenBucket(rpm=0, rafaga=1)
+    for _ in range(100):
+        bucket.tomar()
+
+
+# ------------------------------------------------------
+# generar_ideas_lote
+# ------------------------------------------------------
+def test_lote_en_paralelo_conserva_el_orden(monkeypatch):
+    en_curso, maximo = [0], [0]
+    lock = threading.Lock()
+    orden = [kw for kw, _ in FILAS]
+
+    def _generar(grupo, lote, *a, **k):
+        with lock:
+            en_curso[0] += 1
+            maximo[0] = max(maximo[0], en_curso[0])
+        # los primeros grupos tardan más: terminan en orden inverso
+        time.sleep(0.02 * (len(FILAS) - orden.index(grupo[0][0])))
+        with lock:
+            en_curso[0] -= 1
+        return [[{"keyword": f"{kw} {pais}", "titulo": kw}] for kw, pais in grupo]
+
+    monkeypatch.setattr(ideas, "generar_ideas_para_keywords", _generar)
+    res = ideas.generar_ideas_lote(FILAS, concurrencia=2, lote=1)
+
+    assert [r[0]["keyword"] for r in res] == [f"{kw} {pais}" for kw, pais in FILAS]
+    assert maximo[0] == 2
+
+
+def test_grupo_que_falla_queda_vacio_y_el_resto_sigue(monkeypatch):
+    def _generar(grupo, lote, *a, **k):
+        if grupo[0][0] == "Go":
+            raise RuntimeError("sin modelo")
+        return [[{"keyword": kw, "titulo": kw}] for kw, _ in grupo]
+
+    monkeypatch.setattr(ideas, "generar_ideas_para_keywords", _generar)
+    res = ideas.generar_ideas_lote(FILAS, concurrencia=4, lote=2)
+    assert [len(r) for r in res] == [1, 1, 0, 0]
+    assert ideas.generar_ideas_lote([]) == []
+
+
+def test_cerrar_el_iterador_no_pide_mas_lotes(monkeypatch):
+    llamados = []
+    lock = threading.Lock()
+
+    def _generar(grupo, lote, *a, **k):
+        with lock:
+            llamados.append(grupo[0][0])
+        time.sleep(0.02)
+        return [[{"keyword": kw, "titulo": kw}] for kw, _ in grupo]
+
+    monkeypatch.setattr(ideas, "generar_ideas_para_keywords", _generar)
+    filas = [(f"kw{n}", "Chile") for n in range(40)]
+    it = ideas.iterar_ideas_lote(filas, concurrencia=2, lote=1)
+    assert next(it)[0]["keyword"] == "kw0"
+    time.sleep(0.3)                          # el que consume se demora: no se adelantan todos
+    # a lo sumo la ventana (2 * concurrencia) más el que se encoló al consumir
+    assert len(llamados) <= 5
+    it.close()                               # p.ej. el job pasó a otro worker
+    time.sleep(0.1)
+    assert len(llamados) <= 5
+    assert llamados == [f"kw{n}" for n in range(len(llamados))]
+
+
+# ------------------------------------------------------
+# generar_ideas_para_keywords (varias keywords por pedido)
+# ------------------------------------------------------
+@pytest.fixture
+def modelo(monkeypatch):
+    """Cliente falso: responde un objeto {keyword: ideas} con las keywords del prompt menos las de 'faltan'."""
+    pedidos, faltan = [], set()
+
+    def _create(messages, **k):
+        prompt = messages[-1]["content"]
+        pedidos.append(prompt)
+        if prompt.lstrip().startswith("Para CADA"):
+            kws = [kw for kw, _ in FILAS if f'"{kw}"' in prompt and kw not in faltan]
+            contenido = json.dumps({kw: [{"keyword": f"{kw} lote {n}", "titulo": f"{kw} {n}"} for n in range(3)]
+                                    for kw in kws})
+        else:
+            kw = next(kw for kw, _ in FILAS if f'"{kw}"' in prompt)
+            contenido = json.dumps([{"keyword": f"{kw} sola", "titulo": kw}])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))])
+
+    monkeypatch.setattr(ideas, "client", SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+    monkeypatch.setattr(ideas, "_limite_rpm", ideas._TokenBucket(0, 1))
+    monkeypatch.setattr(llm_cache, "_schema_ok", False)   # llm_cache.db nueva en cada test
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    return SimpleNamespace(pedidos=pedidos, faltan=faltan)
+
+
+def test_un_pedido_por_lote_en_el_orden_de_entrada(modelo):
+    res = ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS))
+    assert len(modelo.pedidos) == 1
+    assert [[i["keyword"] for i in r] for r in res] == [[f"{kw} lote {n}" for n in range(3)] for kw, _ in FILAS]
+
+    ideas.generar_ideas_para_keywords(FILAS, lote=2)    # todo en la cache: ningún pedido más
+    assert len(modelo.pedidos) == 1
+
+
+def test_faltante_en_la_respuesta_se_pide_sola(modelo):
+    modelo.faltan.add("Rust")
+    res = ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS))
+    assert len(modelo.pedidos) == 2
+    assert [i["keyword"] for i in res[1]] == ["Rust sola"]
+    assert all(r for r in res)
+
+
+def test_lo_del_lote_sirve_para_el_pedido_individual(modelo):
+    primero = ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS))
+    assert ideas.generar_ideas_para_keyword(*FILAS[2]) == primero[2]
+    assert len(modelo.pedidos) == 1
+
+
+def test_sin_cliente_usa_el_fallback(monkeypatch):
+    monkeypatch.setattr(ideas, "client", None)
+    res = ideas.generar_ideas_para_keywords(FILAS + [("", "Chile")])
+    assert all(res[:-1]) and res[-1] == []
+
+
+# ------------------------------------------------------
+# Contra stub_openai.py (HTTP real, sin red)
+# ------------------------------------------------------
+@pytest.fixture
+def stub(monkeypatch):
+    """Levanta el stub y apunta ideas.client a él; devuelve una función para configurarlo."""
+    servidores = []
+
+    def _iniciar(**config):
+        config.setdefault("fences", 0.0)
+        config.setdefault("chunk_ms", 0)      # sin el tiempo simulado de generación
+        srv, url = stub_openai.iniciar(semilla=1, **config)
+        servidores.append(srv)
+        monkeypatch.setattr(ideas, "client", OpenAI(api_key="stub", base_url=url, max_retries=0))
+        return srv
+
+    monkeypatch.setattr(ideas, "_circuito", ideas._Circuito(0.5, 5, 60, 60))
+    monkeypatch.setattr(ideas, "_limite_rpm", ideas._TokenBucket(0, 1))
+    monkeypatch.setattr(ideas, "LLM_REINTENTOS", 0)
+    monkeypatch.setattr(ideas, "LLM_HEDGE_MS", 0)
+    monkeypatch.setattr(llm_cache, "_schema_ok", False)   # llm_cache.db nueva en cada test
+    yield _iniciar
+    for srv in servidores:
+        srv.shutdown()
+        srv.server_close()
+
+
+def _sin_vacias(res) -> None:
+    assert len(res) == len(FILAS)
+    for (kw, _), ideas_fila in zip(FILAS, res):
+        assert ideas_fila, kw
+        assert all(i.get("keyword") and i.get("titulo") for i in ideas_fila), kw
+
+
+def test_stub_un_pedido_por_lote(stub):
+    srv = stub(faltantes=0.0)
+    res = ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS))
+    _sin_vacias(res)
+    assert srv.config.stats["pedidos"] == 1
+    # cada keyword con sus propias ideas, en el orden de entrada
+    for (kw, _), ideas_fila in zip(FILAS, res):
+        assert all(kw.lower() in i["keyword"].lower() for i in ideas_fila), kw
+
+
+def test_stub_respuesta_con_fences(stub):
+    srv = stub(faltantes=0.0, fences=1.0)
+    _sin_vacias(ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS)))
+    assert srv.config.stats["pedidos"] == 1
+
+
+def test_stub_keywords_faltantes_se_piden_de_a_una(stub):
+    srv = stub(faltantes=1.0)                # el lote vuelve como {}
+    _sin_vacias(ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS)))
+    assert srv.config.stats["pedidos"] == 1 + len(FILAS)
+
+
+def test_stub_lote_que_falla_usa_el_fallback(stub):
+    srv = stub(errores=1.0, codigos="503")
+    _sin_vacias(ideas.generar_ideas_para_keywords(FILAS, lote=len(FILAS)))
+    assert srv.config.stats["errores"] >= 1
+
+
+def test_stub_articulo_en_streaming(stub):
+    srv = stub()
+    salida = list(ideas.generar_articulo_stream("Python"))
+    assert salida[-1][0] == "html" and "<article" in salida[-1][1]
+    assert len(salida) > 2 and srv.config.stats["stream"] == 1
+
@@ -0,0 +1,190 @@
+# tests/test_idempotencia.py
+# Idempotency-Key persistente (singleflight.py) y su uso en /generar-articulo:
+# un reintento devuelve el mismo artículo, nunca genera otro.
+import json
+import threading
+
+import pytest
+
+import db
+import singleflight
+import storage
+
+EMAIL = "idem@scidata.test"
+
+
+# ------------------------------------------------------
+# singleflight.SingleFlight
+# ------------------------------------------------------
+def test_pedidos_concurrentes_comparten_una_ejecucion():
+    sf = singleflight.SingleFlight()
+    adentro, seguir = threading.Event(), threading.Event()
+    llamadas, resultados = [], []
+
+    def _fn():
+        llamadas.append(1)
+        adentro.set()
+        seguir.wait(2)
+        return "ok"
+
+    lider = threading.Thread(target=lambda: resultados.append(sf.hacer("k", _fn)))
+    lider.start()
+    assert adentro.wait(2)
+    otros = [threading.Thread(target=lambda: resultados.append(sf.hacer("k", _fn))) for _ in range(3)]
+    for t in otros:
+        t.start()
+    seguir.set()
+    for t in [lider] + otros:
+        t.join(2)
+
+    assert llamadas == [1]
+    assert sorted(resultados) == [("ok", False)] + [("ok", True)] * 3
+    # sin ventana: terminado el vuelo, la próxima llamada vuelve a ejecutar
+    assert sf.hacer("k", lambda: "otra") == ("otra", False)
+
+
+def test_un_error_no_queda_compartido():
+    sf = singleflight.SingleFlight(ventana_s=60)
+
+    def _falla():
+        raise RuntimeError("falló")
+
+    with pytest.raises(RuntimeError):
+        sf.hacer("k", _falla)
+    assert sf.hacer("k", lambda: "ok") == ("ok", False)
+    assert sf.hacer("k", lambda: "otra") == ("ok", True)   # dentro de la ventana
+
+
+# ------------------------------------------------------
+# singleflight.reclamar/completar/liberar_idempotencia
+# ------------------------------------------------------
+def test_reclamar_completar_y_repetir():
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+    singleflight.completar_idempotencia(EMAIL, "k1", {"id": "123", "html": "<p>ñ</p>"})
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") == {"id": "123", "html": "<p>ñ</p>"}
+    # la clave es por usuario
+    assert singleflight.reclamar_idempotencia("otro@scidata.test", "k1") is None
+
+
+def test_clave_en_curso_no_se_reclama_dos_veces():
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+    with pytest.raises(singleflight.ClaveEnCurso) as e:
+        singleflight.reclamar_idempotencia(EMAIL, "k1", timeout_s=0)
+    assert 1 <= e.value.retry_after_s <= 5
+
+
+def test_espera_la_respuesta_del_otro_pedido(monkeypatch):
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+    esperas = []
+
+    def _dormir(s):
+        # el primer pedido termina mientras el segundo espera
+        esperas.append(s)
+        singleflight.completar_idempotencia(EMAIL, "k1", {"id": "123"})
+
+    monkeypatch.setattr(singleflight.time, "sleep", _dormir)
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1", timeout_s=5) == {"id": "123"}
+    assert esperas
+
+
+def test_liberar_permite_reintentar(monkeypatch):
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+    singleflight.liberar_idempotencia(EMAIL, "k1")
+    monkeypatch.setattr(singleflight.time, "sleep", lambda s: pytest.fail("no tendría que esperar"))
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+
+
+def test_liberar_no_borra_una_respuesta_guardada():
+    singleflight.reclamar_idempotencia(EMAIL, "k1")
+    singleflight.completar_idempotencia(EMAIL, "k1", {"id": "123"})
+    singleflight.liberar_idempotencia(EMAIL, "k1")
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") == {"id": "123"}
+
+
+def test_reclamo_abandonado_se_retoma(monkeypatch):
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+    monkeypatch.setattr(singleflight, "_RECLAMO_VENCIDO_S", -1)
+    monkeypatch.setattr(singleflight.time, "sleep", lambda s: pytest.fail("no tendría que esperar"))
+    assert singleflight.reclamar_idempotencia(EMAIL, "k1") is None
+
+
+# ------------------------------------------------------
+# /generar-articulo y /generar-articulo/stream
+# ------------------------------------------------------
+@pytest.fixture
+def cliente(monkeypatch):
+    import app as app_mod
+    import ideas
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    monkeypatch.setattr(app_mod, "_generaciones", singleflight.SingleFlight())
+    generados = []
+
+    def _articulo(keyword):
+        generados.append(keyword)
+        return {"html": f"<article><h1>{keyword}</h1><p>n° {len(generados)}</p></article>"}
+
+    monkeypatch.setattr(ideas, "generar_articulo_para_keyword", _articulo)
+    c = app_mod.app.test_client()
+    with c.session_transaction() as s:
+        s["email"] = EMAIL
+    c.generados = generados
+    return c
+
+
+def _articulos() -> list:
+    storage.invalidar_cache_ideas()
+    return [a for i in storage.cargar_ideas_usuario(EMAIL) for a in i.get("articulos", [])]
+
+
+def test_reintento_con_la_misma_clave_devuelve_el_mismo_articulo(cliente):
+    h = {"Idempotency-Key": "abc"}
+    r1 = cliente.post("/generar-articulo", json={"keyword": "Python"}, headers=h)
+    r2 = cliente.post("/generar-articulo", json={"keyword": "Python"}, headers=h)
+
+    assert r1.status_code == r2.status_code == 200
+    assert "Idempotent-Replayed" not in r1.headers
+    assert r2.headers["Idempotent-Replayed"] == "true"
+    assert r2.get_json() == r1.get_json()
+    assert cliente.generados == ["Python"]
+    assert [a["id"] for a in _articulos()] == [r1.get_json()["id"]]
+
+    # el stream comparte las claves: tampoco genera otro
+    r3 = cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers=h)
+    assert r3.headers["Idempotent-Replayed"] == "true"
+    evento, datos = r3.get_data(as_text=True).strip().split("\n")
+    assert evento == "event: done"
+    assert json.loads(datos[len("data: "):])["id"] == r1.get_json()["id"]
+    assert len(_articulos()) == 1
+
+    # otra clave sí genera
+    r4 = cliente.post("/generar-articulo", json={"keyword": "Python"}, headers={"Idempotency-Key": "def"})
+    assert r4.get_json()["id"] != r1.get_json()["id"]
+    assert len(_articulos()) == 2
+
+
+def test_clave_en_curso_da_409_sin_generar(cliente, monkeypatch):
+    monkeypatch.setattr(singleflight, "IDEMPOTENCIA_ESPERA_S", 0)
+    assert singleflight.reclamar_idempotencia(EMAIL, "abc") is None   # otro pedido generando
+
+    for ruta in ("/generar-articulo", "/generar-articulo/stream"):
+        r = cliente.post(ruta, json={"keyword": "Python"}, headers={"Idempotency-Key": "abc"})
+        assert r.status_code == 409, ruta
+        assert r.get_json() == {"error": "in_progress"}
+        assert 1 <= int(r.headers["Retry-After"]) <= 5
+    assert cliente.generados == []
+    assert _articulos() == []
+
+
+def test_falla_al_guardar_libera_la_clave(cliente, monkeypatch):
+    import app as app_mod
+
+    def _falla(*a):
+        raise RuntimeError("persist_error")
+
+    monkeypatch.setattr(app_mod, "_generar_y_guardar_articulo", _falla)
+    r = cliente.post("/generar-articulo", json={"keyword": "Python"}, headers={"Idempotency-Key": "abc"})
+    assert r.status_code == 500
+    # el reclamo se soltó: el reintento genera en lugar de esperar una respuesta que no va a llegar
+    with db.conexion(singleflight.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM idempotencia").fetchone()[0] == 0
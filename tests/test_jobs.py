@@ -0,0 +1,190 @@
+# tests/test_jobs.py
+# Cola de jobs: cada job lo toma un solo worker, uno abandonado se retoma
+# desde su checkpoint y el worker que lo perdió deja de escribir.
+import io
+import os
+import time
+
+import pytest
+
+import db
+import ideas
+import jobs
+import storage
+
+EMAIL = "jobs@scidata.test"
+CSV = b"tendencia,pais\nPython,Argentina\nRust,Chile\nGo,Uruguay\n"
+
+
+@pytest.fixture
+def lote_falso(monkeypatch):
+    """iterar_ideas_lote sin LLM: una idea por fila; anota las filas que recibe."""
+    recibidas = []
+
+    def _iterar(filas, *a, **k):
+        for kw, pais in filas:
+            recibidas.append(kw)
+            yield [{"keyword": f"{kw} {pais}", "titulo": kw}]
+
+    monkeypatch.setattr(ideas, "iterar_ideas_lote", _iterar)
+    return recibidas
+
+
+def _abandonar(job_id: str) -> None:
+    """Como si el worker que lo tiene hubiera muerto hace rato."""
+    with db.conexion(jobs.DB_PATH) as conn:
+        conn.execute("UPDATE jobs SET heartbeat = 0 WHERE id = ?", (job_id,))
+
+
+def _worker_de(job_id: str) -> str:
+    with db.conexion(jobs.DB_PATH) as conn:
+        return conn.execute("SELECT worker FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_leer_filas_csv():
+    raw = "tendencia,pais\nPython,\n,Chile\nÑandú,Perú\n".encode("latin-1")
+    assert jobs.leer_filas_csv(raw, "Uruguay") == [("Python", "Uruguay"), ("Ñandú", "Perú")]
+
+
+def test_encolar_y_obtener_solo_del_dueno():
+    job = jobs.encolar_csv(EMAIL, CSV)
+    assert job["estado"] == "pendiente" and job["total"] == 3 and job["progreso"] == 0
+    assert jobs.obtener_job(job["id"], EMAIL)["id"] == job["id"]
+    assert jobs.obtener_job(job["id"], "otro@scidata.test") is None
+    assert [j["id"] for j in jobs.jobs_activos(EMAIL)] == [job["id"]]
+
+
+def test_un_job_lo_reclama_un_solo_worker():
+    job = jobs.encolar_csv(EMAIL, CSV)
+    reclamado = jobs._reclamar("a")
+    assert reclamado[0] == job["id"] and reclamado[4] == 0
+    assert jobs._reclamar("b") is None          # en curso con heartbeat fresco
+    assert jobs.obtener_job(job["id"])["estado"] == "en_curso"
+
+
+def test_job_abandonado_cambia_de_dueno():
+    job = jobs.encolar_csv(EMAIL, CSV)
+    jobs._reclamar("a")
+    assert jobs._checkpoint(job["id"], "a", 1, 1)
+    _abandonar(job["id"])
+
+    reclamado = jobs._reclamar("b")
+    assert reclamado[0] == job["id"] and reclamado[4] == 1
+    assert _worker_de(job["id"]) == "b"
+
+    # el worker viejo ya no escribe nada
+    assert not jobs._checkpoint(job["id"], "a", 3, 2)
+    assert not jobs._terminar(job["id"], "a", "terminado")
+    estado = jobs.obtener_job(job["id"])
+    assert estado["estado"] == "en_curso" and estado["procesadas"] == 1 and estado["ideas"] == 1
+
+    assert jobs._checkpoint(job["id"], "b", 2, 1)
+    assert jobs._terminar(job["id"], "b", "terminado")
+    assert jobs.obtener_job(job["id"])["estado"] == "terminado"
+
+
+def test_retomar_sigue_desde_el_checkpoint(lote_falso):
+    job = jobs.encolar_csv(EMAIL, CSV)
+    jobs._reclamar("a")
+    assert jobs._checkpoint(job["id"], "a", 2, 2)
+    _abandonar(job["id"])
+
+    jobs.procesar_job(jobs._reclamar("b"), "b")
+
+    assert lote_falso == ["Go"]
+    fin = jobs.obtener_job(job["id"])
+    assert fin["estado"] == "terminado" and fin["procesadas"] == 3 and fin["ideas"] == 3
+    assert [i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)] == ["Go Uruguay"]
+
+
+def test_ideas_cuenta_solo_las_agregadas(lote_falso):
+    assert storage.agregar_ideas_usuario(EMAIL, [{"keyword": "Rust Chile", "titulo": "ya estaba"}]) == 1
+    job = jobs.encolar_csv(EMAIL, CSV)
+
+    jobs.procesar_job(jobs._reclamar("a"), "a")
+
+    fin = jobs.obtener_job(job["id"])
+    assert fin["procesadas"] == 3 and fin["ideas"] == 2
+    assert len(storage.cargar_ideas_usuario(EMAIL)) == 3
+
+
+def test_falla_al_guardar_termina_en_error(lote_falso, monkeypatch):
+    monkeypatch.setattr(storage, "agregar_ideas_usuario", lambda email, ideas: None)
+    job = jobs.encolar_csv(EMAIL, CSV)
+    assert jobs.procesar_pendientes("w") == 1
+    fin = jobs.obtener_job(job["id"])
+    assert fin["estado"] == "error" and fin["procesadas"] == 0 and fin["ideas"] == 0
+
+
+def test_worker_que_pierde_el_job_deja_de_procesarlo(monkeypatch):
+    job = jobs.encolar_csv(EMAIL, CSV)
+    archivo = jobs._reclamar("a")
+    ruta_csv = archivo[2]
+
+    def _iterar(filas, *a, **k):
+        for n, (kw, pais) in enumerate(filas):
+            if n == 1:
+                # mientras "a" genera la fila 2, "b" toma el job
+                _abandonar(job["id"])
+                assert jobs._reclamar("b")[0] == job["id"]
+            yield [{"keyword": kw, "titulo": kw}]
+
+    monkeypatch.setattr(ideas, "iterar_ideas_lote", _iterar)
+    jobs.procesar_job(archivo, "a")
+
+    estado = jobs.obtener_job(job["id"])
+    assert estado["estado"] == "en_curso" and estado["procesadas"] == 1
+    assert _worker_de(job["id"]) == "b"
+    assert os.path.exists(ruta_csv)          # lo sigue necesitando "b"
+
+
+def test_latido_renueva_y_detecta_perdida():
+    job = jobs.encolar_csv(EMAIL, CSV)
+    jobs._reclamar("a")
+    _abandonar(job["id"])
+
+    with jobs._Latido(job["id"], "a", intervalo_s=0.05) as latido:
+        time.sleep(0.2)
+        assert not latido.perdido.is_set()
+        assert jobs._reclamar("b") is None   # el heartbeat lo mantiene vivo
+        with db.conexion(jobs.DB_PATH) as conn:
+            conn.execute("UPDATE jobs SET worker = 'b' WHERE id = ?", (job["id"],))
+        assert latido.perdido.wait(2)
+
+
+def test_archivo_perdido_termina_en_error():
+    job = jobs.encolar_csv(EMAIL, CSV)
+    reclamado = jobs._reclamar("a")
+    os.remove(reclamado[2])
+    jobs.procesar_job(reclamado, "a")
+    fin = jobs.obtener_job(job["id"])
+    assert fin["estado"] == "error" and fin["error"].startswith("archivo:")
+
+
+def test_procesar_pendientes_vacia_la_cola(lote_falso):
+    j1 = jobs.encolar_csv(EMAIL, CSV)
+    j2 = jobs.encolar_csv(EMAIL, b"tendencia,pais\nJava,Peru\n")
+
+    assert jobs.procesar_pendientes("w") == 2
+    assert jobs.procesar_pendientes("w") == 0
+    for j, total in ((j1, 3), (j2, 1)):
+        fin = jobs.obtener_job(j["id"])
+        assert fin["estado"] == "terminado" and fin["procesadas"] == total and fin["progreso"] == 1.0
+    assert jobs.jobs_activos(EMAIL) == []
+    assert os.listdir(jobs.UPLOAD_FOLDER) == []
+    assert len(storage.cargar_ideas_usuario(EMAIL)) == 4
+
+
+def test_csv_por_api_devuelve_202_con_el_job(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    c = app_mod.app.test_client()
+    with c.session_transaction() as sess:
+        sess["email"] = EMAIL
+    r = c.post("/dashboard", data={"csv": (io.BytesIO(CSV), "tendencias.csv")},
+               headers={"Accept": "application/json"}, content_type="multipart/form-data")
+    assert r.status_code == 202
+    job = r.get_json()["job"]
+    assert job["total"] == 3 and r.headers["Location"].endswith(f"/api/jobs/{job['id']}")
+    assert c.get(r.headers["Location"]).get_json()["id"] == job["id"]
@@ -0,0 +1,138 @@
+# tests/test_journal.py
+# Journal de mutaciones por usuario: cada transacción anexa sus ops en vez de
+# reescribir el índice, y la compactación las pliega en un snapshot nuevo.
+import json
+import os
+import time
+
+import pytest
+
+import storage
+
+EMAIL = "journal@scidata.test"
+
+
+@pytest.fixture
+def rutas():
+    ruta = storage._ruta_json_usuario(EMAIL)
+    return ruta, storage._ruta_journal(ruta)
+
+
+def _sembrar():
+    # usuario nuevo: la primera escritura es snapshot completo (gen 1)
+    storage.guardar_ideas_usuario(EMAIL, [{"keyword": "Python", "titulo": "Python"}])
+
+
+def _leer(ruta: str) -> dict:
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _ops(ruta_j: str) -> list:
+    with open(ruta_j, encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+def _desde_disco() -> list:
+    storage.invalidar_cache_ideas()
+    return storage.cargar_ideas_usuario(EMAIL)
+
+
+def test_las_transacciones_anexan_al_journal(rutas):
+    ruta, ruta_j = rutas
+    _sembrar()
+    assert not os.path.exists(ruta_j)
+    snapshot = os.stat(ruta).st_mtime_ns, _leer(ruta)
+
+    art = storage.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    assert storage.update_estado_articulo(EMAIL, "Python", art["id"], "publicado")
+    storage.agregar_ideas_usuario(EMAIL, [{"keyword": "Rust", "titulo": "Rust"}])
+
+    # el snapshot no se tocó; las ops están en el journal, sin HTML
+    assert (os.stat(ruta).st_mtime_ns, _leer(ruta)) == snapshot
+    ops = _ops(ruta_j)
+    assert [o["op"] for o in ops] == ["art", "estado", "put"]
+    assert all(o["g"] == 1 for o in ops)
+    assert "html" not in ops[0]["articulo"] and ops[0]["articulo"]["blob"]
+
+    ideas = {i["keyword"]: i for i in _desde_disco()}
+    assert set(ideas) == {"Python", "Rust"}
+    assert ideas["Python"]["articulos"][0]["html"] == "<h1>Uno</h1>"
+    assert ideas["Python"]["articulos"][0]["estado"] == "publicado"
+
+
+def test_otro_proceso_ve_las_ops_nuevas(rutas):
+    _sembrar()
+    assert len(storage.cargar_ideas_usuario(EMAIL)) == 1
+
+    # otro worker anexa ops: la cache aplica solo la cola nueva
+    storage._anexar_journal(rutas[1], [{"op": "put", "idea": {"keyword": "Go", "titulo": "Go"}}], 1)
+    antes = storage.estadisticas_cache_ideas()["replays"]
+    assert [i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)] == ["Python", "Go"]
+    assert storage.estadisticas_cache_ideas()["replays"] == antes + 1
+
+
+def test_compactar_pliega_el_journal(rutas):
+    ruta, ruta_j = rutas
+    _sembrar()
+    for n in range(5):
+        storage.append_articulo_usuario(EMAIL, "Python", f"<h1>Art {n}</h1>")
+    esperado = _desde_disco()
+
+    assert storage.compactar_usuario(EMAIL)
+    assert not os.path.exists(ruta_j)
+    data = _leer(ruta)
+    assert data["gen"] == 2
+    assert len(data["ideas"][0]["articulos"]) == 5
+    assert _desde_disco() == esperado
+    # sin journal no hay nada que compactar
+    assert not storage.compactar_usuario(EMAIL)
+    assert storage.compactar_todos() == 0
+
+
+def test_ops_de_otra_generacion_no_se_aplican_dos_veces(rutas):
+    ruta, ruta_j = rutas
+    _sembrar()
+    storage.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    with open(ruta_j, "rb") as f:
+        journal_viejo = f.read()
+    assert storage.compactar_usuario(EMAIL)
+
+    # corte entre el snapshot nuevo y el borrado del journal: las ops quedan con g=1
+    with open(ruta_j, "wb") as f:
+        f.write(journal_viejo)
+    assert len(_desde_disco()[0]["articulos"]) == 1
+
+
+def test_linea_cortada_se_ignora(rutas):
+    _sembrar()
+    storage.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    with open(rutas[1], "ab") as f:
+        f.write(b'{"op":"del","keyword":"Python","g":1')      # sin '\n': escritura a medias
+    ideas = _desde_disco()
+    assert [i["keyword"] for i in ideas] == ["Python"]
+    assert len(ideas[0]["articulos"]) == 1
+
+
+def test_umbral_dispara_la_compactacion_de_fondo(rutas, monkeypatch):
+    ruta, ruta_j = rutas
+    monkeypatch.setattr(storage, "JOURNAL_MAX_OPS", 3)
+    _sembrar()
+    for n in range(3):
+        storage.append_articulo_usuario(EMAIL, "Python", f"<h1>Art {n}</h1>")
+
+    limite = time.monotonic() + 5
+    while os.path.exists(ruta_j) and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert not os.path.exists(ruta_j)
+    assert _leer(ruta)["gen"] == 2
+    assert len(_desde_disco()[0]["articulos"]) == 3
+
+
+def test_journal_apagado_escribe_snapshot(rutas, monkeypatch):
+    ruta, ruta_j = rutas
+    monkeypatch.setattr(storage, "JOURNAL_ENABLED", False)
+    _sembrar()
+    storage.append_articulo_usuario(EMAIL, "Python", "<h1>Uno</h1>")
+    assert not os.path.exists(ruta_j)
+    assert _leer(ruta)["gen"] == 2
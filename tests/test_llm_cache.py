@@ -0,0 +1,104 @@
+# tests/test_llm_cache.py
+# Cache persistente de respuestas del LLM: hit/miss por clave, TTL, LRU
+# acotado y que ideas.py no vuelva a llamar a la API por la misma keyword.
+from types import SimpleNamespace
+
+import pytest
+
+import ideas
+import llm_cache
+
+CLAVE = llm_cache.clave("ideas", "Python", "Argentina", "modelo", 0.5, "v1")
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_schema_ok", False)   # llm_cache.db nueva en cada test
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+
+
+def test_clave_normaliza_y_versiona():
+    assert llm_cache.clave("ideas", "  PYTHON ", "argentina", "modelo", 0.5, "v1") == CLAVE
+    assert llm_cache.clave("ideas", "Python", "Chile", "modelo", 0.5, "v1") != CLAVE
+    assert llm_cache.clave("ideas", "Python", "Argentina", "modelo", 0.7, "v1") != CLAVE
+    assert llm_cache.clave("ideas", "Python", "Argentina", "modelo", 0.5, "v2") != CLAVE
+    assert llm_cache.version_prompt("a", "b") != llm_cache.version_prompt("ab")
+
+
+def test_guardar_y_obtener():
+    assert llm_cache.obtener(CLAVE) is None
+    llm_cache.guardar(CLAVE, "ideas", [{"keyword": "Python", "titulo": "ñ"}])
+    assert llm_cache.obtener(CLAVE) == [{"keyword": "Python", "titulo": "ñ"}]
+    assert llm_cache.obtener(CLAVE, sin_cache=True) is None
+    stats = llm_cache.estadisticas()
+    assert stats["size"] == 1 and stats["hits"] >= 1 and stats["bypass"] >= 1
+
+
+def test_entrada_vencida_es_miss(monkeypatch):
+    llm_cache.guardar(CLAVE, "ideas", ["x"])
+    monkeypatch.setattr(llm_cache, "CACHE_TTL_S", 60)
+    ahora = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: ahora + 61)
+    assert llm_cache.obtener(CLAVE) is None
+    assert llm_cache.estadisticas()["size"] == 0
+
+
+def test_lru_saca_las_menos_usadas(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX", 2)
+    reloj = iter(range(100, 10000, 100))     # más que CACHE_TOUCH_S entre lecturas
+    monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(reloj)))
+    llm_cache.guardar("a", "ideas", 1)
+    llm_cache.guardar("b", "ideas", 2)
+    assert llm_cache.obtener("a") == 1      # "a" pasa a ser la más reciente
+    llm_cache.guardar("c", "ideas", 3)
+    assert llm_cache.obtener("b") is None
+    assert llm_cache.obtener("a") == 1 and llm_cache.obtener("c") == 3
+
+
+def test_hit_escribe_la_marca_de_uso_solo_si_es_vieja(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_TOUCH_S", 60)
+    ahora = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: ahora[0])
+
+    def _marca():
+        with llm_cache._conexion() as conn:
+            return conn.execute("SELECT usado, hits FROM respuestas WHERE clave = ?", (CLAVE,)).fetchone()
+
+    llm_cache.guardar(CLAVE, "ideas", ["x"])
+    for t in (1010.0, 1030.0, 1059.0):
+        ahora[0] = t
+        assert llm_cache.obtener(CLAVE) == ["x"]
+    assert _marca() == (1000.0, 0)           # lecturas seguidas: ningún UPDATE
+
+    ahora[0] = 1061.0
+    assert llm_cache.obtener(CLAVE) == ["x"]
+    assert _marca() == (1061.0, 1)
+    ahora[0] = 1062.0
+    assert llm_cache.obtener(CLAVE) == ["x"]
+    assert _marca() == (1061.0, 1)
+
+
+def test_desactivada(monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", False)
+    llm_cache.guardar(CLAVE, "ideas", ["x"])
+    assert llm_cache.obtener(CLAVE) is None
+
+
+def test_ideas_usa_la_cache(monkeypatch):
+    llamadas = []
+    contenido = ('[{"keyword": "Python", "titulo": "Uno"}, {"keyword": "Python 2", "titulo": "Dos"},'
+                 ' {"keyword": "Python 3", "titulo": "Tres"}]')
+
+    def _create(**kw):
+        llamadas.append(kw)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=contenido))])
+
+    monkeypatch.setattr(ideas, "client", SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=_create))))
+
+    primera = ideas.generar_ideas_para_keyword("Python", "Argentina")
+    assert [i["titulo"] for i in primera] == ["Uno", "Dos", "Tres"]
+    assert ideas.generar_ideas_para_keyword("python", "argentina") == primera
+    assert len(llamadas) == 1
+    ideas.generar_ideas_para_keyword("Python", "Argentina", sin_cache=True)
+    assert len(llamadas) == 2
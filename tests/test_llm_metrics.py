@@ -0,0 +1,144 @@
+# tests/test_llm_metrics.py
+# llm_metrics: agregación por operación (resultados, latencia, tokens,
+# percentiles), ventana de tiempo, sinks y medir().
+import json
+import time
+
+import pytest
+
+import ideas
+import llm_metrics
+
+
+@pytest.fixture(autouse=True)
+def limpio():
+    llm_metrics.reiniciar()
+    yield
+    llm_metrics.reiniciar()
+
+
+def _ev(resultado="ok", ms=100.0, op="ideas", **extra) -> dict:
+    ev = {"operacion": op, "modelo": "m", "resultado": resultado, "duracion_ms": ms,
+          "tokens_prompt": 100, "tokens_respuesta": 300}
+    ev.update(extra)
+    return ev
+
+
+def test_agrega_resultados_latencia_y_tokens():
+    for ms in (40, 80, 200, 900):
+        llm_metrics.registrar(_ev(ms=ms))
+    llm_metrics.registrar(_ev("error_fallback", ms=3000))
+    llm_metrics.registrar(_ev(ms=1, cache_hit=True))
+    llm_metrics.registrar(_ev("offline", ms=0))
+    llm_metrics.registrar(_ev(ms=500, op="articulo"))
+
+    ops = llm_metrics.resumen()["operaciones"]
+    assert set(ops) == {"ideas", "articulo"}
+    r = ops["ideas"]
+    assert r["llamadas"] == 7
+    assert r["resultados"]["ok"] == 5 and r["resultados"]["error_fallback"] == 1 and r["resultados"]["offline"] == 1
+    assert r["cache_hits"] == 1 and r["cache_hit_rate"] == round(1 / 7, 4)
+    assert r["fallback_rate"] == round(1 / 7, 4)
+
+    # latencia y tokens solo de las 5 que fueron a la API
+    lat = r["latencia_ms"]
+    assert lat["media"] == round((40 + 80 + 200 + 900 + 3000) / 5, 1)
+    assert lat["max"] == 3000
+    assert sum(lat["histograma"].values()) == 5
+    assert lat["histograma"]["<=50ms"] == 1 and lat["histograma"]["<=5000ms"] == 1
+    assert lat["p50"] == 250 and lat["p99"] == 3000    # límite del bucket, sin pasar del máximo
+    assert r["tokens"]["prompt"] == 500 and r["tokens"]["respuesta"] == 1500
+    assert r["tokens"]["por_llamada"] == 400.0
+    assert r["tokens"]["histograma"]["<=500"] == 5
+
+
+def test_sin_llamadas_a_la_api():
+    llm_metrics.registrar(_ev("offline", ms=0))
+    lat = llm_metrics.resumen()["operaciones"]["ideas"]["latencia_ms"]
+    assert lat["media"] is None and lat["p50"] is None
+
+
+def test_ventana_descarta_lo_viejo(monkeypatch):
+    llm_metrics.registrar(_ev(ts=time.time() - llm_metrics._ventana.ventana_s - 120))
+    llm_metrics.registrar(_ev())
+    assert llm_metrics.resumen()["operaciones"]["ideas"]["llamadas"] == 1
+
+
+def test_sinks_y_sus_errores():
+    recibidos = []
+
+    def _roto(ev):
+        raise RuntimeError("sink caído")
+
+    llm_metrics.agregar_sink(_roto)
+    llm_metrics.agregar_sink(recibidos.append)
+    try:
+        llm_metrics.registrar(_ev())
+    finally:
+        llm_metrics.quitar_sink(_roto)
+        llm_metrics.quitar_sink(recibidos.append)
+    assert len(recibidos) == 1 and "ts" in recibidos[0] and recibidos[0]["cache_hit"] is False
+    llm_metrics.registrar(_ev())
+    assert len(recibidos) == 1
+
+
+def test_medir_marca_el_resultado():
+    with llm_metrics.medir("articulo", "m") as m:
+        m.sumar_uso({"prompt_tokens": 10, "completion_tokens": 20})
+    with pytest.raises(ValueError):
+        with llm_metrics.medir("articulo", "m"):
+            raise ValueError()
+
+    def _stream():
+        with llm_metrics.medir("articulo", "m"):
+            yield 1
+            yield 2
+
+    g = _stream()
+    next(g)
+    g.close()                                # el cliente cortó el stream
+
+    r = llm_metrics.resumen()["operaciones"]["articulo"]
+    assert r["resultados"]["ok"] == 1 and r["resultados"]["error_fallback"] == 1
+    assert r["resultados"]["cancelado"] == 1
+    assert r["tokens"]["prompt"] == 10 and r["tokens"]["respuesta"] == 20
+
+
+def test_sink_jsonl_y_resumen_del_archivo(tmp_path, monkeypatch, capsys):
+    ruta = str(tmp_path / "m" / "llm.jsonl")
+    sink = llm_metrics._sink_configurado(f"jsonl:{ruta}")
+    sink(_ev(ms=120))
+    sink(_ev("parse_fallback", ms=700))
+    assert llm_metrics._sink_configurado("nada") is None
+    assert "desconocido" in capsys.readouterr().out
+
+    monkeypatch.setattr("sys.argv", ["llm_metrics.py", "--jsonl", ruta])
+    llm_metrics.main()
+    salida = json.loads(capsys.readouterr().out)
+    assert salida["ideas"]["llamadas"] == 2 and salida["ideas"]["resultados"]["parse_fallback"] == 1
+
+
+def test_ideas_registra_offline_y_cache(monkeypatch):
+    monkeypatch.setattr(ideas, "client", None)
+    ideas.generar_ideas_para_keyword("Python", "Argentina")
+    ideas.generar_articulo_para_keyword("Python")
+    assert [t for t, _ in ideas.generar_articulo_stream("Python")] == ["delta", "html"]
+    ops = llm_metrics.resumen()["operaciones"]
+    assert ops["ideas"]["resultados"]["offline"] == 1
+    assert ops["articulo"]["resultados"]["offline"] == 1
+    assert ops["articulo_stream"]["resultados"]["offline"] == ops["articulo_stream"]["llamadas"] == 1
+
+
+def test_api_llm_metrics(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+    c = app_mod.app.test_client()
+    assert c.get("/api/llm-metrics").status_code == 401
+    llm_metrics.registrar(_ev())
+    with c.session_transaction() as s:
+        s["email"] = "metricas@scidata.test"
+    datos = c.get("/api/llm-metrics").get_json()
+    assert datos["operaciones"]["ideas"]["llamadas"] == 1
+    assert datos["circuito"] in ("cerrado", "abierto", "semiabierto")
+    assert "size" in datos["cache"]
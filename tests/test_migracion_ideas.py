@@ -0,0 +1,129 @@
+# tests/test_migracion_ideas.py
+# Store de ideas legacy (v1: lista pelada con 'articulo'; v2: 'articulos' con
+# HTML embebido) -> índice v3 con blobs: lectura transparente sin escribir
+# blobs, ids estables y migrar_store_ideas (con el journal del archivo legacy).
+import json
+import os
+
+import pytest
+
+import storage
+
+EMAIL = "legacy@scidata.test"
+HTML = "<article><h1>Guía de Python</h1><p>Texto del artículo.</p></article>"
+
+
+def _escribir_legacy(version: int = 1, email: str = EMAIL) -> str:
+    ruta = storage._ruta_json_usuario(email)
+    if version == 1:
+        datos = [
+            {"keyword": "Python", "titulo": "Python", "articulo": HTML},
+            {"keyword": "Rust", "titulo": "Rust", "articulo": ""},
+        ]
+    else:
+        datos = {"schema_version": 2, "ideas": [
+            {"keyword": "Python", "titulo": "Python", "articulos": [
+                {"id": "111", "html": HTML, "estado": "revisado"},
+            ]},
+            {"keyword": "Rust", "titulo": "Rust", "articulos": []},
+        ]}
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    return ruta
+
+
+def _por_keyword(email: str = EMAIL) -> dict:
+    return {i["keyword"]: i for i in storage.cargar_ideas_usuario(email)}
+
+
+def test_lectura_de_un_archivo_legacy():
+    _escribir_legacy()
+    ideas = _por_keyword()
+    assert set(ideas) == {"Python", "Rust"}
+    arts = ideas["Python"]["articulos"]
+    assert len(arts) == 1 and arts[0]["estado"] == "borrador"
+    assert ideas["Python"]["articulo"] == HTML
+    assert not ideas["Rust"].get("articulos")
+    assert storage.contar_articulos_usuario(EMAIL) == 1
+
+
+def test_migrar_store_ideas_es_idempotente():
+    ruta = _escribir_legacy()
+    assert storage._version_archivo(ruta) == 1
+
+    res = storage.migrar_store_ideas(max_workers=1)
+    assert res == {"total": 1, "migrados": 1, "al_dia": 0, "errores": 0}
+    assert storage._version_archivo(ruta) == storage.IDEAS_SCHEMA_VERSION
+    assert storage.migrar_store_ideas(max_workers=1) == {"total": 1, "migrados": 0, "al_dia": 1, "errores": 0}
+
+    storage.invalidar_cache_ideas()
+    ideas = _por_keyword()
+    assert set(ideas) == {"Python", "Rust"}
+    assert ideas["Python"]["articulo"] == HTML
+
+
+def test_migracion_en_paralelo():
+    emails = [f"u{n}@scidata.test" for n in range(4)]
+    for e in emails:
+        _escribir_legacy(email=e)
+    res = storage.migrar_store_ideas(max_workers=2)
+    assert res == {"total": 4, "migrados": 4, "al_dia": 0, "errores": 0}
+    for e in emails:
+        assert storage._version_archivo(storage._ruta_json_usuario(e)) == storage.IDEAS_SCHEMA_VERSION
+        assert _por_keyword(e)["Python"]["articulo"] == HTML
+
+
+def _blobs_escritos() -> list:
+    return [n for _, _, archivos in os.walk(storage.BLOBS_DIR) for n in archivos]
+
+
+def _id_articulo(keyword: str) -> str:
+    ideas, _ = storage.listar_ideas_usuario(EMAIL, 0, 10)
+    idea = next(i for i in ideas if i["keyword"] == keyword)
+    return idea["articulos"][0]["id"]
+
+
+def test_lectura_legacy_da_el_mismo_id_y_no_escribe_blobs():
+    _escribir_legacy()
+    primero = _id_articulo("Python")
+    storage.invalidar_cache_ideas()   # como otro worker o tras una expulsión de la LRU
+    assert _id_articulo("Python") == primero
+
+    art = storage.obtener_articulo_usuario(EMAIL, primero)
+    assert art["html"] == HTML
+    assert art["blob"] == storage._ref_blob(HTML)
+    assert _blobs_escritos() == []
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_migrar_conserva_ids_y_html(version):
+    ruta = _escribir_legacy(version)
+    antes = _id_articulo("Python")
+
+    storage.migrar_store_ideas(max_workers=1)
+    storage.invalidar_cache_ideas()
+
+    assert _id_articulo("Python") == antes
+    assert storage.obtener_articulo_usuario(EMAIL, antes)["html"] == HTML
+    assert len(_blobs_escritos()) == 1
+    # el índice en disco no lleva el HTML
+    with open(ruta, "rb") as f:
+        indice = json.dumps(storage._decodificar_store(f.read()), ensure_ascii=False)
+    assert HTML not in indice
+
+
+def test_cambios_antes_de_migrar_no_se_pierden():
+    _escribir_legacy()
+    art_id = _id_articulo("Python")
+    assert storage.update_estado_articulo(EMAIL, "Python", art_id, "publicado")
+    assert storage.agregar_ideas_usuario(EMAIL, [{"keyword": "Go", "titulo": "Go"}])
+
+    storage.migrar_store_ideas(max_workers=1)
+    storage.invalidar_cache_ideas()
+
+    ideas = _por_keyword()
+    assert set(ideas) == {"Python", "Rust", "Go"}
+    assert ideas["Python"]["articulos"][0]["id"] == art_id
+    assert ideas["Python"]["articulos"][0]["estado"] == "publicado"
+    assert ideas["Python"]["articulo"] == HTML
+    assert not os.path.exists(storage._ruta_journal(storage._ruta_json_usuario(EMAIL)))
@@ -0,0 +1,95 @@
+# tests/test_migraciones.py
+# migraciones.py: corre una sola vez cada migración, pone al día bases de
+# antes de schema_version y revierte todo si una falla.
+import sqlite3
+
+import pytest
+
+import db
+import migraciones
+
+
+def _columnas(ruta: str, tabla: str) -> set:
+    with db.conexion(ruta) as conn:
+        return {r[1] for r in conn.execute(f"PRAGMA table_info({tabla})")}
+
+
+def test_base_nueva_e_idempotente(tmp_path):
+    ruta = str(tmp_path / "nueva.db")
+    assert migraciones.version_actual(ruta) == 0
+    assert migraciones.aplicar_migraciones(ruta) == [v for v, _, _ in migraciones.MIGRACIONES]
+    assert migraciones.version_actual(ruta) == migraciones.MIGRACIONES[-1][0]
+    assert migraciones.aplicar_migraciones(ruta) == []
+    assert {"ideas_generadas", "articulos_generados"} <= _columnas(ruta, "usuarios")
+    assert _columnas(ruta, "agregados_usuario") and _columnas(ruta, "articulos")
+
+
+def test_base_vieja_consolida_los_totales(tmp_path):
+    ruta = str(tmp_path / "vieja.db")
+    # como la dejaban crear_db.py + models.ensure_counter_columns, sin schema_version
+    conn = sqlite3.connect(ruta)
+    conn.executescript("""
+        CREATE TABLE usuarios (
+          id INTEGER PRIMARY KEY AUTOINCREMENT, nombre TEXT NOT NULL, email TEXT UNIQUE NOT NULL,
+          password_hash TEXT NOT NULL, articulos_generados INTEGER DEFAULT 0,
+          fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+          total_ideas INTEGER DEFAULT 0, total_articulos INTEGER DEFAULT 0);
+        INSERT INTO usuarios (nombre, email, password_hash, articulos_generados, total_ideas, total_articulos)
+        VALUES ('Ana', 'ana@scidata.test', 'x', 3, 7, 5);
+    """)
+    conn.close()
+
+    migraciones.aplicar_migraciones(ruta)
+    with db.conexion(ruta) as conn:
+        fila = conn.execute("SELECT ideas_generadas, articulos_generados FROM usuarios").fetchone()
+    assert fila == (7, 5)   # el mayor de cada par
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        assert not {"total_ideas", "total_articulos"} & _columnas(ruta, "usuarios")
+
+
+def test_una_falla_no_deja_nada_a_medias(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "falla.db")
+
+    def _rota(conn):
+        raise RuntimeError("migración rota")
+
+    monkeypatch.setattr(migraciones, "MIGRACIONES", migraciones.MIGRACIONES + [(99, "rota", _rota)])
+    with pytest.raises(RuntimeError):
+        migraciones.aplicar_migraciones(ruta)
+    assert migraciones.version_actual(ruta) == 0
+    assert not _columnas(ruta, "usuarios")
+
+
+def test_arranque_de_la_app_una_vez_y_no_al_importar(monkeypatch):
+    import app as app_mod
+    import jobs
+    import storage
+
+    llamadas = []
+    monkeypatch.setattr(app_mod, "_iniciada", False)
+    monkeypatch.setattr(migraciones, "aplicar_migraciones", lambda *a: llamadas.append("migraciones"))
+    monkeypatch.setattr(storage, "migrar_store_ideas", lambda *a, **k: llamadas.append("ideas") or {"migrados": 0, "errores": 0})
+    monkeypatch.setattr(jobs, "iniciar_worker", lambda: llamadas.append("worker"))
+
+    c = app_mod.app.test_client()
+    assert llamadas == []                    # nada hasta el primer request
+    c.get("/login")
+    c.get("/login")
+    app_mod.iniciar_app()
+    assert llamadas == ["migraciones", "ideas", "worker"]
+
+
+def test_models_usa_la_misma_base_que_db(monkeypatch, tmp_path):
+    import models
+
+    ruta = str(tmp_path / "otra.db")
+    migraciones.aplicar_migraciones(ruta)
+    monkeypatch.setattr(db, "DB_PATH", ruta)
+
+    assert models.crear_usuario("Ana", "ana@scidata.test", "hash")
+    models.incrementar_total_ideas("ana@scidata.test", 3)
+    models.incrementar_total_articulos("ana@scidata.test")
+    assert models.obtener_totales_usuario("ana@scidata.test") == (3, 1)
+    with db.conexion(ruta) as conn:
+        fila = conn.execute("SELECT ideas_generadas, articulos_generados FROM usuarios").fetchone()
+    assert fila == (3, 1)
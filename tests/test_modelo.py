@@ -0,0 +1,74 @@
+# tests/test_modelo.py
+# storage.UserIdeas: índices por keyword y por id de artículo, y copias
+# copy-on-write que nunca tocan el modelo cacheado.
+import storage
+
+IDEAS = [
+    {"keyword": "Python", "titulo": "Python", "tips_seo": ["uno"], "extra_campo": {"a": 1},
+     "articulos": [{"id": "p2", "titulo": "Dos", "blob": "b2", "estado": "borrador"},
+                   {"id": "p1", "titulo": "Uno", "blob": "b1", "estado": "publicado"}]},
+    {"keyword": "Rust", "titulo": "Rust", "articulos": [{"id": "r1", "titulo": "R", "blob": "b3"}]},
+]
+
+
+def _modelo() -> storage.UserIdeas:
+    return storage.UserIdeas.desde_lista([dict(i) for i in IDEAS])
+
+
+def test_ida_y_vuelta_a_dicts():
+    m = _modelo()
+    assert m.a_lista() == IDEAS
+    # cada a_lista arma objetos nuevos
+    m.a_lista()[0]["tips_seo"].append("otro")
+    assert m.a_lista()[0]["tips_seo"] == ["uno"]
+
+
+def test_indices():
+    m = _modelo()
+    assert "PYTHON" in m and m.get(" python ").titulo == "Python"
+    idea, art = m.por_id("r1")
+    assert idea.keyword == "Rust" and art.titulo == "R"
+    assert m.articulo("Python", "p1")[1].estado == "publicado"
+    assert m.articulo("Rust", "p1") is None
+    assert m.por_id("nada") is None
+
+
+def test_copia_no_toca_el_original():
+    original = _modelo()
+    antes = original.a_lista()
+    c = original.copia()
+
+    assert c.cambiar_estado("Python", "p2", "publicado", "2025-01-01T00:00:00Z")
+    assert c.quitar_articulo("Python", "p1")
+    assert c.insertar_articulo("Rust", storage.Articulo.desde_dict({"id": "r2", "blob": "b4"}))
+    c.quitar("Rust")
+    c.poner(storage.Idea.nueva("Go"))
+
+    assert original.a_lista() == antes
+    assert original.por_id("p1")[0] is original.get("Python")
+    assert [i["keyword"] for i in c.a_lista()] == ["Python", "Go"]
+    assert [a["id"] for a in c.a_lista()[0]["articulos"]] == ["p2"]
+    assert c.por_id("p2")[1].estado == "publicado" and c.por_id("r1") is None
+    # la que se mutó se clonó; una que no se toca se comparte
+    assert c.get("Python") is not original.get("Python")
+    assert original.copia().get("Rust") is original.get("Rust")
+
+
+def test_insertar_es_idempotente_por_id():
+    m = _modelo()
+    assert not m.insertar_articulo("Python", storage.Articulo.desde_dict({"id": "p1", "blob": "x"}))
+    assert len(m.get("Python").articulos) == 2
+
+
+def test_transaccion_sobre_la_cache_no_la_muta():
+    email = "modelo@scidata.test"
+    storage.guardar_ideas_usuario(email, IDEAS)
+    cacheado = storage._ideas_cacheadas(email)
+    antes = cacheado.a_lista()
+
+    with storage.transaction(email) as tx:
+        assert tx.set_estado("Python", "p2", "publicado")
+        tx.remove("Rust")
+    assert cacheado.a_lista() == antes
+    assert storage._ideas_cacheadas(email) is not cacheado
+    assert [i["keyword"] for i in storage._ideas_cacheadas(email).a_lista()] == ["Python"]
@@ -0,0 +1,153 @@
+# tests/test_storage_sqlite.py
+# Backend SQLite (storage_sqlite): misma API que el JSON, transacciones todo
+# o nada que escriben solo las filas que cambiaron e importador desde los
+# JSON por usuario.
+import json
+
+import pytest
+
+import db
+import storage
+import storage_sqlite
+
+EMAIL = "sql@scidata.test"
+OTRO = "otro@scidata.test"
+
+
+class _Falla(Exception):
+    pass
+
+
+def _sembrar(email: str = EMAIL):
+    with storage_sqlite.transaction(email) as tx:
+        for kw in ("Python", "Rust", "Go"):
+            tx.upsert({"keyword": kw, "titulo": kw, "palabras_clave": [kw.lower()]})
+            tx.add_articulo(kw, {"id": f"{kw}-1", "titulo": kw, "html": f"<p>{kw}</p>", "estado": "borrador"})
+
+
+def _filas() -> dict:
+    """rowid de cada idea y artículo de la tabla (cualquier usuario)."""
+    with db.conexion(storage.DB_PATH) as conn:
+        ideas = {(e, k): pk for pk, e, k in conn.execute("SELECT id, email, keyword FROM ideas")}
+        arts = {(e, a): pk for pk, e, a in conn.execute("SELECT pk, email, id FROM articulos")}
+    return {"ideas": ideas, "articulos": arts}
+
+
+def _por_keyword(email: str = EMAIL) -> dict:
+    return {i["keyword"]: i for i in storage_sqlite.cargar_ideas_usuario(email)}
+
+
+def test_excepcion_en_el_bloque_hace_rollback():
+    _sembrar()
+    antes = (_por_keyword(), storage_sqlite.contar_agregados_usuario(EMAIL), _filas())
+
+    with pytest.raises(_Falla):
+        with storage_sqlite.transaction(EMAIL) as tx:
+            tx.upsert({"keyword": "Java", "titulo": "Java"})
+            assert tx.set_estado("Python", "Python-1", "publicado")
+            assert tx.remove("Rust")
+            tx.add_articulo("Go", {"id": "Go-2", "titulo": "Go", "html": "<p>Go 2</p>"})
+            raise _Falla()
+
+    assert (_por_keyword(), storage_sqlite.contar_agregados_usuario(EMAIL), _filas()) == antes
+    # la base quedó usable (sin transacción abierta)
+    assert storage_sqlite.update_estado_articulo(EMAIL, "Python", "Python-1", "revisado")
+
+
+def test_una_op_no_reescribe_las_otras_filas():
+    _sembrar()
+    _sembrar(OTRO)
+    antes = _filas()
+
+    with storage_sqlite.transaction(EMAIL) as tx:
+        assert tx.set_estado("Python", "Python-1", "publicado")
+
+    # mismas filas (ni DELETE + INSERT de las ideas ni de sus artículos)
+    assert _filas() == antes
+    assert _por_keyword()["Python"]["articulos"][0]["estado"] == "publicado"
+    assert _por_keyword()["Rust"]["palabras_clave"] == ["rust"]
+
+
+def test_varias_ops_tocan_solo_sus_filas():
+    _sembrar()
+    antes = _filas()
+
+    with storage_sqlite.transaction(EMAIL) as tx:
+        assert tx.remove("Rust")
+        assert tx.remove_articulo("Go", "Go-1")
+        tx.upsert({"keyword": "Java", "titulo": "Java"})
+        tx.add_articulo("Python", {"id": "Python-2", "titulo": "Python", "html": "<p>dos</p>"})
+
+    despues = _filas()
+    assert set(_por_keyword()) == {"Python", "Go", "Java"}
+    for clave in ((EMAIL, "Python"), (EMAIL, "Go")):
+        assert despues["ideas"][clave] == antes["ideas"][clave]
+    assert despues["articulos"][(EMAIL, "Python-1")] == antes["articulos"][(EMAIL, "Python-1")]
+    assert (EMAIL, "Go-1") not in despues["articulos"]
+    assert (EMAIL, "Rust-1") not in despues["articulos"]
+    assert [a["id"] for a in _por_keyword()["Python"]["articulos"]] == ["Python-2", "Python-1"]
+
+
+def test_agregados_consistentes_tras_commit():
+    _sembrar()
+    with storage_sqlite.transaction(EMAIL) as tx:
+        assert tx.set_estado("Python", "Python-1", "publicado")
+        assert tx.remove("Rust")
+
+    agg = storage_sqlite.contar_agregados_usuario(EMAIL)
+    assert agg["ideas"] == 2 and agg["articulos"] == 2
+    assert agg["publicado"] == 1 and agg["borrador"] == 1
+    resumen = storage.obtener_resumen_usuario(EMAIL)
+    for campo, n in agg.items():
+        assert resumen[campo] == n, campo
+
+
+def test_api_de_articulos():
+    _sembrar()
+    art = storage_sqlite.append_articulo_usuario(EMAIL, "Python", "<h1>Dos</h1><p>otro</p>")
+    assert storage_sqlite.contar_articulos_usuario(EMAIL) == 4
+    ideas = _por_keyword()
+    assert [a["id"] for a in ideas["Python"]["articulos"]] == [art["id"], "Python-1"]
+    assert ideas["Python"]["articulo"] == "<h1>Dos</h1><p>otro</p>"
+    assert ideas["Rust"]["palabras_clave"] == ["rust"]
+
+    assert storage_sqlite.update_estado_articulo(EMAIL, "Python", "Python-1", "publicado")
+    assert not storage_sqlite.update_estado_articulo(EMAIL, "Python", "no-existe", "publicado")
+    assert storage_sqlite.eliminar_articulo_usuario(EMAIL, "Rust", "Rust-1")
+    assert storage_sqlite.eliminar_idea_usuario(EMAIL, "Go")
+
+    ideas = _por_keyword()
+    assert set(ideas) == {"Python", "Rust"}
+    assert ideas["Python"]["articulos"][1]["estado"] == "publicado"
+    assert not ideas["Rust"].get("articulos")
+    assert storage_sqlite.contar_articulos_usuario(EMAIL) == 2
+
+
+def test_agregar_ideas_fusiona_por_keyword():
+    _sembrar()
+    assert storage_sqlite.agregar_ideas_usuario(EMAIL, [
+        {"keyword": "python", "titulo": "Otro título"},
+        {"keyword": "Java", "titulo": "Java"},
+    ]) == 1                                  # solo Java es nueva
+    ideas = _por_keyword()
+    # misma keyword sin distinguir mayúsculas: reemplaza la idea, conserva sus artículos
+    assert set(ideas) == {"python", "Rust", "Go", "Java"}
+    assert ideas["python"]["titulo"] == "Otro título"
+    assert [a["id"] for a in ideas["python"]["articulos"]] == ["Python-1"]
+    assert storage_sqlite.agregar_ideas_usuario(EMAIL, [{"keyword": "JAVA", "titulo": "Java"}]) == 0
+
+
+def test_importar_desde_json():
+    with open(storage._ruta_json_usuario(EMAIL), "w", encoding="utf-8") as f:
+        json.dump([
+            {"keyword": "Python", "titulo": "Python", "articulo": "<p>legacy</p>"},
+            {"keyword": "Rust", "titulo": "Rust", "tips_seo": ["uno"]},
+        ], f)
+    res = storage_sqlite.importar_desde_json()
+    assert res == {"usuarios": 1, "ideas": 2, "articulos": 1, "errores": 0}
+    ideas = _por_keyword()
+    assert ideas["Python"]["articulo"] == "<p>legacy</p>"
+    assert ideas["Rust"]["tips_seo"] == ["uno"]
+    # idempotente
+    assert storage_sqlite.importar_desde_json()["ideas"] == 2
+    assert len(_por_keyword()) == 2
@@ -0,0 +1,162 @@
+# tests/test_stream.py
+# /generar-articulo/stream: eventos SSE delta/done/error, el artículo guardado
+# y la Idempotency-Key completada (o liberada si no se guardó nada).
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import ideas
+import singleflight
+import storage
+
+EMAIL = "stream@scidata.test"
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import app as app_mod
+
+    monkeypatch.setattr(app_mod, "_iniciada", True)   # migraciones ya las corrió conftest; sin worker
+
+    partes = ["<article><h1>Python</h1>", "<p>uno</p>", "</article>"]
+    llamadas = []
+
+    def _stream(keyword, *a, **k):
+        llamadas.append(keyword)
+        for p in partes:
+            yield "delta", p
+        yield "html", "".join(partes)
+
+    monkeypatch.setattr(ideas, "generar_articulo_stream", _stream)
+    c = app_mod.app.test_client()
+    with c.session_transaction() as s:
+        s["email"] = EMAIL
+    c.partes, c.llamadas = partes, llamadas
+    return c
+
+
+def _eventos(resp) -> list:
+    """[(evento, datos)] del cuerpo text/event-stream."""
+    salida = []
+    for bloque in resp.get_data(as_text=True).split("\n\n"):
+        if not bloque.strip():
+            continue
+        evento, datos = bloque.split("\n")
+        salida.append((evento[len("event: "):], json.loads(datos[len("data: "):])))
+    return salida
+
+
+def _articulos() -> list:
+    storage.invalidar_cache_ideas()
+    return [a for i in storage.cargar_ideas_usuario(EMAIL) for a in i.get("articulos", [])]
+
+
+def test_deltas_y_done_con_el_articulo_guardado(cliente):
+    r = cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers={"Idempotency-Key": "s1"})
+    assert r.status_code == 200
+    assert r.mimetype == "text/event-stream"
+    assert r.headers["Cache-Control"] == "no-cache"
+
+    eventos = _eventos(r)
+    assert [e for e, _ in eventos] == ["delta"] * len(cliente.partes) + ["done"]
+    assert [d["t"] for _, d in eventos[:-1]] == cliente.partes
+    done = eventos[-1][1]
+    assert done["html"] == "".join(cliente.partes) and done["estado"] == "borrador"
+    assert [a["id"] for a in _articulos()] == [done["id"]]
+
+    # la clave quedó completada con la respuesta del done
+    assert singleflight.reclamar_idempotencia(EMAIL, "s1") == done
+
+
+def test_reintento_del_stream_repite_el_done(cliente):
+    h = {"Idempotency-Key": "s1"}
+    done = _eventos(cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers=h))[-1][1]
+    r = cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers=h)
+    assert r.headers["Idempotent-Replayed"] == "true"
+    assert _eventos(r) == [("done", done)]
+    assert cliente.llamadas == ["Python"]
+    assert len(_articulos()) == 1
+
+
+def test_falla_al_guardar_manda_error_y_libera_la_clave(cliente, monkeypatch):
+    import app as app_mod
+
+    def _falla(*a):
+        raise RuntimeError("persist_error")
+
+    monkeypatch.setattr(app_mod, "_guardar_articulo", _falla)
+    r = cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers={"Idempotency-Key": "s1"})
+    assert _eventos(r)[-1] == ("error", {"error": "persist_error"})
+    assert _articulos() == []
+    # el reintento puede generar
+    assert singleflight.reclamar_idempotencia(EMAIL, "s1") is None
+
+
+def test_stream_sin_html_manda_error_y_libera_la_clave(cliente, monkeypatch):
+    def _solo_deltas(keyword, *a, **k):
+        yield "delta", "<article>"
+
+    monkeypatch.setattr(ideas, "generar_articulo_stream", _solo_deltas)
+    r = cliente.post("/generar-articulo/stream", json={"keyword": "Python"}, headers={"Idempotency-Key": "s1"})
+    assert _eventos(r) == [("delta", {"t": "<article>"}), ("error", {"error": "generation_error"})]
+    assert _articulos() == []
+    assert singleflight.reclamar_idempotencia(EMAIL, "s1") is None
+
+
+def test_clave_completada_apenas_se_guarda(cliente, monkeypatch):
+    def _stream(keyword, *a, **k):
+        yield "html", "<article><h1>Python</h1></article>"
+        yield "delta", ""                    # algo más después del html
+
+    monkeypatch.setattr(ideas, "generar_articulo_stream", _stream)
+    r = cliente.post("/generar-articulo/stream", json={"keyword": "Python"},
+                     headers={"Idempotency-Key": "s1"}, buffered=False)
+    primero = next(iter(r.response))
+    assert primero.startswith(b"event: delta")
+    r.close()                                # el cliente corta antes del done
+
+    [articulo] = _articulos()
+    guardada = singleflight.reclamar_idempotencia(EMAIL, "s1")
+    assert guardada is not None and guardada["id"] == articulo["id"]
+
+
+def test_sin_sesion_o_sin_keyword(cliente):
+    assert cliente.post("/generar-articulo/stream", json={}).status_code == 400
+    with cliente.session_transaction() as s:
+        s.clear()
+    assert cliente.post("/generar-articulo/stream", json={"keyword": "Python"}).status_code == 401
+
+
+# ------------------------------------------------------
+# ideas.generar_articulo_stream
+# ------------------------------------------------------
+def _chunk(texto):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=texto))])
+
+
+def _cliente_falso(chunks):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **k: iter(chunks))))
+
+
+def test_stream_limpia_el_html_final(monkeypatch):
+    monkeypatch.setattr(ideas, "_limite_rpm", ideas._TokenBucket(0, 1))
+    monkeypatch.setattr(ideas, "client", _cliente_falso([_chunk("```html\n<h1>Hola</h1>"), _chunk(None), _chunk("\n```")]))
+    salida = list(ideas.generar_articulo_stream("Python"))
+    assert [t for t, _ in salida] == ["delta", "delta", "html"]
+    assert salida[-1][1] == ideas._html_articulo("```html\n<h1>Hola</h1>\n```")
+
+
+def test_stream_cortado_termina_en_el_fallback(monkeypatch):
+    def _cortado():
+        yield _chunk("<article>")
+        raise ConnectionError("cortado")
+
+    monkeypatch.setattr(ideas, "_limite_rpm", ideas._TokenBucket(0, 1))
+    monkeypatch.setattr(ideas, "client", _cliente_falso(_cortado()))
+    salida = list(ideas.generar_articulo_stream("Python"))
+    assert salida[0] == ("delta", "<article>")
+    assert salida[-1] == ("html", ideas._fallback_article("Python"))
+
+    monkeypatch.setattr(ideas, "client", None)
+    assert list(ideas.generar_articulo_stream("Python"))[-1] == ("html", ideas._fallback_article("Python"))
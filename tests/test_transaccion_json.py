@@ -0,0 +1,82 @@
+# tests/test_transaccion_json.py
+# storage.transaction con el backend JSON: todo o nada, visible desde disco
+# (no solo desde la cache del proceso).
+import os
+
+import pytest
+
+import storage
+
+EMAIL = "tx@scidata.test"
+
+
+class _Falla(Exception):
+    pass
+
+
+def _desde_disco() -> dict:
+    storage.invalidar_cache_ideas()
+    return {i["keyword"]: i for i in storage.cargar_ideas_usuario(EMAIL)}
+
+
+def _sembrar():
+    with storage.transaction(EMAIL) as tx:
+        tx.upsert({"keyword": "Python", "titulo": "Python"})
+        tx.add_articulo("Python", {"id": "1", "titulo": "Python", "html": "<p>uno</p>", "estado": "borrador"})
+
+
+def _tamanios() -> dict:
+    carpeta = storage.IDEAS_DIR
+    return {n: os.path.getsize(os.path.join(carpeta, n)) for n in sorted(os.listdir(carpeta))}
+
+
+def test_commit_de_varias_ops_se_ve_desde_disco():
+    _sembrar()
+    with storage.transaction(EMAIL) as tx:
+        tx.upsert({"keyword": "Rust", "titulo": "Rust"})
+        tx.add_articulo("Python", {"id": "2", "titulo": "Python", "html": "<p>dos</p>", "estado": "borrador"})
+        assert tx.remove_articulo("Python", "1")
+        assert tx.remove("Rust")
+        tx.upsert({"keyword": "Go", "titulo": "Go"})
+
+    ideas = _desde_disco()
+    assert set(ideas) == {"Python", "Go"}
+    assert [a["id"] for a in ideas["Python"]["articulos"]] == ["2"]
+    assert ideas["Python"]["articulo"] == "<p>dos</p>"
+
+
+def test_upsert_conserva_los_articulos():
+    _sembrar()
+    with storage.transaction(EMAIL) as tx:
+        assert not tx.upsert({"keyword": "Python", "titulo": "Python 2", "tips_seo": ["uno"]})
+    ideas = _desde_disco()
+    assert ideas["Python"]["titulo"] == "Python 2"
+    assert [a["id"] for a in ideas["Python"]["articulos"]] == ["1"]
+
+
+def test_excepcion_en_el_bloque_no_escribe_nada():
+    _sembrar()
+    antes = _tamanios()
+
+    with pytest.raises(_Falla):
+        with storage.transaction(EMAIL) as tx:
+            tx.upsert({"keyword": "Rust", "titulo": "Rust"})
+            assert tx.remove_articulo("Python", "1")
+            tx.remove("Python")
+            raise _Falla()
+
+    assert _tamanios() == antes
+    # ni en la cache del proceso ni en disco
+    assert {i["keyword"] for i in storage.cargar_ideas_usuario(EMAIL)} == {"Python"}
+    ideas = _desde_disco()
+    assert set(ideas) == {"Python"}
+    assert [a["id"] for a in ideas["Python"]["articulos"]] == ["1"]
+
+
+def test_sin_cambios_no_escribe():
+    _sembrar()
+    antes = _tamanios()
+    with storage.transaction(EMAIL) as tx:
+        assert tx.get("Python") is not None
+        assert not tx.remove("Rust")
+    assert _tamanios() == antes